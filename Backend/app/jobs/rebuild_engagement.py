@@ -0,0 +1,44 @@
+"""
+Rebuild the engagement rollups from user_posts.
+
+Backfills engagement_rollups / engagement_daily for existing posts, or
+repairs them after failed incremental updates. Run while posts are not
+being created, since concurrent increments would be lost. Daily rows are
+rebuilt for the retention period only.
+
+Incremental updates keep adding daily rows, so schedule `--prune-only`
+(e.g. daily from cron) to delete the ones past ENGAGEMENT_DAILY_RETENTION_DAYS;
+it is safe to run alongside post creation.
+
+Usage:
+    python -m app.jobs.rebuild_engagement
+    python -m app.jobs.rebuild_engagement --prune-only
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from app.db.db import AsyncSessionLocal
+from app.services.engagement import DAILY_RETENTION_DAYS, prune_daily, rebuild_rollups
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main(prune_only: bool):
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        if not prune_only:
+            await rebuild_rollups(session)
+            logger.info("Engagement rollups rebuilt in %.1fs", time.perf_counter() - started)
+        pruned = await prune_daily(session)
+    logger.info("Pruned %d daily rows older than %d days", pruned, DAILY_RETENTION_DAYS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the engagement rollups")
+    parser.add_argument("--prune-only", action="store_true",
+                        help="only delete daily rows past the retention period")
+    args = parser.parse_args()
+    asyncio.run(main(args.prune_only))
@@ -0,0 +1,209 @@
+"""
+Full recompute of creator_sponsorship_matches.
+
+Scores every creator against every sponsorship. Sponsorships are split into
+shards and scored on a process pool; every worker receives the creator
+matrix once at start-up. Matches are streamed back to the database in bulk
+upserts while the other shards are still being scored. Pairs that were not
+refreshed by this run are deleted and the match cache is flushed at the end.
+
+The app runs it once at start-up when the match table is empty (a fresh
+deploy), loading and scoring on worker threads instead of a process pool so
+the event loop keeps serving requests; run it by hand after bulk changes
+made outside the API.
+
+Usage:
+    python -m app.jobs.recompute_matches --workers 8 --shard-size 256
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db.db import AsyncSessionLocal
+from app.models.models import CreatorSponsorshipMatch
+from app.services.db_service import fetch_all, SPONSORSHIP_COLUMNS
+from app.services.matching_engine import CreatorMatrix, MATCH_THRESHOLD
+from app.services.match_store import match_cache
+from app.services.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_LOCK = "match:backfill"
+# Sponsorships scored per matrix product, bounding the score array's size
+SCORE_BLOCK_SIZE = 64
+
+MatchRow = Tuple[str, str, str, int]  # sponsorship_id, creator_id, audience_id, score
+
+_creators: CreatorMatrix | None = None
+
+
+def _init_worker(creators: CreatorMatrix):
+    global _creators
+    _creators = creators
+
+
+def _score_shard(sponsorships: List[Dict[str, Any]]) -> Tuple[List[MatchRow], int]:
+    """Score one shard in a worker; returns the matching pairs and the pairs scored."""
+    records = _creators.records
+    # One pair per creator and sponsorship, scored with the creator's current row
+    current = _creators.current_mask()[:, None]
+    rows: List[MatchRow] = []
+    for start in range(0, len(sponsorships), SCORE_BLOCK_SIZE):
+        block = sponsorships[start : start + SCORE_BLOCK_SIZE]
+        scores = _creators.score_many(block)
+        positions, columns = np.nonzero((scores >= MATCH_THRESHOLD) & current)
+        for pos, col in zip(positions.tolist(), columns.tolist()):
+            rows.append((
+                block[col]["id"],
+                records[pos]["user_id"],
+                records[pos]["id"],
+                int(scores[pos, col]),
+            ))
+    return rows, len(_creators) * len(sponsorships)
+
+
+async def _write(rows: List[MatchRow], run_started: datetime, batch_size: int):
+    stmt = insert(CreatorSponsorshipMatch.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["sponsorship_id", "creator_id"],
+        set_={
+            "audience_id": stmt.excluded.audience_id,
+            "match_score": stmt.excluded.match_score,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    async with AsyncSessionLocal() as session:
+        for start in range(0, len(rows), batch_size):
+            await session.execute(
+                stmt,
+                [
+                    {
+                        "sponsorship_id": sponsorship_id,
+                        "creator_id": creator_id,
+                        "audience_id": audience_id,
+                        "match_score": score,
+                        "updated_at": run_started,
+                    }
+                    for sponsorship_id, creator_id, audience_id, score in rows[
+                        start : start + batch_size
+                    ]
+                ],
+            )
+        await session.commit()
+
+
+async def _delete_stale(run_started: datetime) -> int:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            delete(CreatorSponsorshipMatch).where(
+                CreatorSponsorshipMatch.updated_at < run_started
+            )
+        )
+        await session.commit()
+        return result.rowcount
+
+
+def _load() -> Tuple[CreatorMatrix, List[Dict[str, Any]]]:
+    creators = CreatorMatrix(fetch_all("audience_insights"))
+    return creators, fetch_all("sponsorships", columns=SPONSORSHIP_COLUMNS)
+
+
+async def recompute_matches(workers: int, shard_size: int, batch_size: int, processes: bool = True):
+    """Score everything on `workers` processes, or threads when `processes` is False."""
+    run_started = datetime.now(timezone.utc)
+    started = time.perf_counter()
+
+    # Blocking fetches and the matrix build stay off the event loop
+    creators, sponsorships = await asyncio.to_thread(_load)
+    shards = [
+        sponsorships[start : start + shard_size]
+        for start in range(0, len(sponsorships), shard_size)
+    ]
+    logger.info(
+        "Loaded %d creators and %d sponsorships (%d shards) in %.1fs",
+        len(creators), len(sponsorships), len(shards), time.perf_counter() - started,
+    )
+
+    loop = asyncio.get_running_loop()
+    scored = written = 0
+    scoring_started = time.perf_counter()
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor(
+        max_workers=workers, initializer=_init_worker, initargs=(creators,)
+    ) as pool:
+        # Keep a bounded number of shards in flight so results are written
+        # while the remaining shards are still being scored
+        pending = set()
+        queue = iter(shards)
+        for shard in queue:
+            pending.add(loop.run_in_executor(pool, _score_shard, shard))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                rows, pairs = future.result()
+                await _write(rows, run_started, batch_size)
+                scored += pairs
+                written += len(rows)
+                next_shard = next(queue, None)
+                if next_shard is not None:
+                    pending.add(loop.run_in_executor(pool, _score_shard, next_shard))
+            elapsed = time.perf_counter() - scoring_started
+            logger.info(
+                "%d pairs scored (%.0f pairs/s), %d matches written (%.0f rows/s)",
+                scored, scored / elapsed, written, written / elapsed,
+            )
+
+    removed = await _delete_stale(run_started)
+    await match_cache.clear()
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Recompute finished in %.1fs: %d pairs scored, %d matches (threshold %d), "
+        "%d stale pairs removed, %.0f pairs/s overall",
+        elapsed, scored, written, MATCH_THRESHOLD, removed, scored / elapsed if elapsed else 0,
+    )
+    return {"pairs_scored": scored, "matches": written, "removed": removed, "seconds": elapsed}
+
+
+async def recompute_if_empty(threads: int, shard_size: int = 256, batch_size: int = 5000):
+    """Fill an empty match table; one worker of the deployment does it, the rest skip.
+
+    Runs inside the API process, so it scores on `threads` threads rather
+    than forking a process pool under the server.
+    """
+    async with AsyncSessionLocal() as session:
+        has_rows = (
+            await session.execute(select(CreatorSponsorshipMatch.sponsorship_id).limit(1))
+        ).first()
+    if has_rows or not await redis_client.set(BACKFILL_LOCK, "1", nx=True, ex=3600):
+        return None
+    logger.info("Match table is empty, running a full recompute")
+    try:
+        return await recompute_matches(threads, shard_size, batch_size, processes=False)
+    finally:
+        await redis_client.delete(BACKFILL_LOCK)
+
+
+def main():
+    # Only for the CLI: the app imports this module for the start-up backfill
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Recompute all creator-sponsorship matches")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=256, help="sponsorships per task")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per bulk upsert")
+    args = parser.parse_args()
+    asyncio.run(recompute_matches(args.workers, args.shard_size, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,28 @@ from fastapi.middleware.cors import CORSMiddleware
 from .db.db import engine
 from .db.seed import seed_db
 from .models import models, chat
+from .services.match_sql import create_match_indexes
+from .services.pagination import create_page_indexes
+from .services.search import create_search_columns
+from .services.chat_services import create_chat_indexes
+from .services.match_store import match_cache
+from .services.user_cache import user_cache
+from .services.presence import presence
+from .services.chat_pubsub import dispatcher
+from .services.chat_writer import group_committer, stream_consumer, CHAT_WRITE_MODE
+from .services.clients import init_clients, close_clients
+from .jobs.recompute_matches import recompute_if_empty
 from .routes.post import router as post_router
 from .routes.chat import router as chat_router
 from .routes.match import router as match_router
+from .routes.engagement import router as engagement_router
+from .routes.search import router as search_router
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 import os
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
+import asyncio
 from app.routes import ai
 
 # Load environment variables
@@ -23,6 +37,10 @@ async def create_tables():
         async with engine.begin() as conn:
             await conn.run_sync(models.Base.metadata.create_all)
             await conn.run_sync(chat.Base.metadata.create_all)
+            await conn.run_sync(create_match_indexes)
+            await conn.run_sync(create_page_indexes)
+            await conn.run_sync(create_search_columns)
+            await conn.run_sync(create_chat_indexes)
         print("✅ Tables created successfully or already exist.")
     except SQLAlchemyError as e:
         print(f"❌ Error creating tables: {e}")
@@ -32,10 +50,31 @@ async def create_tables():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("App is starting...")
+    await init_clients()
     await create_tables()
     await seed_db()
+    cache_listener = asyncio.create_task(match_cache.listen_for_invalidations())
+    user_cache_listener = asyncio.create_task(user_cache.listen_for_invalidations())
+    match_backfill = asyncio.create_task(
+        recompute_if_empty(int(os.getenv("MATCH_BACKFILL_THREADS", "1")))
+    )
+    presence_heartbeat = asyncio.create_task(presence.run_heartbeats())
+    chat_dispatcher = asyncio.create_task(dispatcher.run())
+    chat_writer = None
+    if CHAT_WRITE_MODE == "group":
+        chat_writer = asyncio.create_task(group_committer.run())
+    elif CHAT_WRITE_MODE == "stream":
+        chat_writer = asyncio.create_task(stream_consumer.run())
     yield
     print("App is shutting down...")
+    cache_listener.cancel()
+    user_cache_listener.cancel()
+    match_backfill.cancel()
+    presence_heartbeat.cancel()
+    chat_dispatcher.cancel()
+    if chat_writer:
+        chat_writer.cancel()
+    await close_clients()
 
 
 # Initialize FastAPI
@@ -54,6 +93,8 @@ app.add_middleware(
 app.include_router(post_router)
 app.include_router(chat_router)
 app.include_router(match_router)
+app.include_router(engagement_router)
+app.include_router(search_router)
 app.include_router(ai.router)
 app.include_router(ai.youtube_router)
 
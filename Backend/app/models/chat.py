@@ -52,3 +52,14 @@ class ChatMessage(Base):
     )
     chat_list_id = Column(String, ForeignKey("chat_list.id"), nullable=False)
     chat = relationship("ChatList", backref="messages")
+
+
+class ChatReadWatermark(Base):
+    """How far each participant has read a chat; only ever moves forward."""
+
+    __tablename__ = "chat_read_watermarks"
+
+    chat_list_id = Column(String, ForeignKey("chat_list.id"), primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    last_read_at = Column(DateTime(timezone=True), nullable=False)
+    message_id = Column(String, ForeignKey("chat_messages.id"), nullable=False)
@@ -2,6 +2,8 @@ from sqlalchemy import (
     Column,
     String,
     Integer,
+    BigInteger,
+    Date,
     ForeignKey,
     Float,
     Text,
@@ -10,9 +12,12 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     TIMESTAMP,
+    Index,
+    Computed,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
-from datetime import datetime
+from datetime import datetime, timezone
 from app.db.db import Base
 import uuid
 
@@ -21,6 +26,11 @@ def generate_uuid():
     return str(uuid.uuid4())
 
 
+def public_columns(model):
+    """Column names for `select`, leaving out internal ones such as search vectors."""
+    return [c.name for c in model.__table__.columns if not c.info.get("internal")]
+
+
 # User Table (Creators & Brands)
 class User(Base):
     __tablename__ = "users"
@@ -87,6 +97,16 @@ class Sponsorship(Base):
     created_at = Column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    # Full-text search document, maintained by Postgres
+    search_vector = Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        info={"internal": True},
+    )
 
     brand = relationship("User", back_populates="sponsorships")
     applications = relationship("SponsorshipApplication", back_populates="sponsorship")
@@ -106,6 +126,17 @@ class UserPost(Base):
     created_at = Column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    # Full-text search document, maintained by Postgres
+    search_vector = Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(category, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(content, '')), 'C')",
+            persisted=True,
+        ),
+        info={"internal": True},
+    )
 
     user = relationship("User", back_populates="posts")
 
@@ -160,3 +191,49 @@ class SponsorshipPayment(Base):
     brand = relationship(
         "User", foreign_keys=[brand_id], back_populates="brand_payments"
     )
+
+
+# Creator-Sponsorship Match Table (materialized match scores)
+class CreatorSponsorshipMatch(Base):
+    __tablename__ = "creator_sponsorship_matches"
+
+    sponsorship_id = Column(String, ForeignKey("sponsorships.id"), primary_key=True)
+    creator_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    audience_id = Column(String, ForeignKey("audience_insights.id"), nullable=False)
+    match_score = Column(Integer, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (
+        Index("ix_creator_sponsorship_matches_creator_id", "creator_id"),
+    )
+
+
+# Engagement rollups over user_posts.engagement_metrics, kept up to date
+# incrementally on post creation (scope is "user" or "category")
+class EngagementRollup(Base):
+    __tablename__ = "engagement_rollups"
+
+    scope = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    post_count = Column(BigInteger, nullable=False, default=0)
+    likes = Column(BigInteger, nullable=False, default=0)
+    comments = Column(BigInteger, nullable=False, default=0)
+    shares = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+
+# Per-day buckets of the same counters, for recent-window stats
+class EngagementDaily(Base):
+    __tablename__ = "engagement_daily"
+
+    scope = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    post_count = Column(BigInteger, nullable=False, default=0)
+    likes = Column(BigInteger, nullable=False, default=0)
+    comments = Column(BigInteger, nullable=False, default=0)
+    shares = Column(BigInteger, nullable=False, default=0)
@@ -1,12 +1,12 @@
 # FastAPI router for AI-powered endpoints, including trending niches
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from datetime import date
 import os
 import requests
 import json
-from supabase import create_client, Client
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from ..services.clients import supabase, get_http_session
+from ..services.response_cache import cached_response
 
 # Initialize router
 router = APIRouter()
@@ -20,25 +20,13 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 if not all([SUPABASE_URL, SUPABASE_KEY, GEMINI_API_KEY]):
     raise ValueError("Missing required environment variables: SUPABASE_URL, SUPABASE_KEY, GEMINI_API_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 def fetch_from_gemini():
     prompt = (
         "List the top 6 trending content niches for creators and brands this week. For each, provide: name (the niche), insight (a short qualitative reason why it's trending), and global_activity (a number from 1 to 5, where 5 means very high global activity in this category, and 1 means low).Return as a JSON array of objects with keys: name, insight, global_activity."
     )
     url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-lite:generateContent?key={GEMINI_API_KEY}"
-    # Set up retry strategy
-    retry_strategy = Retry(
-        total=3,
-        backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["POST"],
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    http = requests.Session()
-    http.mount("https://", adapter)
-    http.mount("http://", adapter)
-    resp = http.post(url, json={"contents": [{"parts": [{"text": prompt}]}]}, timeout=(3.05, 10))
+    # Shared pooled session (retries 429/5xx with backoff), see services/clients.py
+    resp = get_http_session().post(url, json={"contents": [{"parts": [{"text": prompt}]}]}, timeout=(3.05, 10))
     resp.raise_for_status()
     print("Gemini raw response:", resp.text)
     data = resp.json()
@@ -52,15 +40,7 @@ def fetch_from_gemini():
         text = text.strip()
     return json.loads(text)
 
-@router.get("/api/trending-niches")
-def trending_niches():
-    """
-    API endpoint to get trending niches for the current day.
-    - If today's data exists in Supabase, return it.
-    - Otherwise, fetch from Gemini, store in Supabase, and return the new data.
-    - If Gemini fails, fallback to the most recent data available.
-    """
-    today = str(date.today())
+def load_trending_niches(today: str):
     # Check if today's data exists in Supabase
     result = supabase.table("trending_niches").select("*").eq("fetched_at", today).execute()
     if not result.data:
@@ -81,6 +61,27 @@ def trending_niches():
             result = supabase.table("trending_niches").select("*").order("fetched_at", desc=True).limit(6).execute()
     return result.data
 
+@router.get("/api/trending-niches")
+async def trending_niches(request: Request):
+    """
+    API endpoint to get trending niches for the current day.
+    - If today's data exists in Supabase, return it.
+    - Otherwise, fetch from Gemini, store in Supabase, and return the new data.
+    - If Gemini fails, fallback to the most recent data available.
+    Today's list is served from the response cache; a fallback list is not
+    cached so the next request retries Gemini.
+    """
+    today = str(date.today())
+    return await cached_response(
+        request,
+        "trending_niches",
+        lambda: run_in_threadpool(load_trending_niches, today),
+        vary=today,
+        cacheable=lambda niches: bool(niches) and all(
+            str(niche.get("fetched_at")) == today for niche in niches
+        ),
+    )
+
 youtube_router = APIRouter(prefix="/youtube", tags=["YouTube"])
 
 @youtube_router.get("/channel-info")
@@ -94,7 +95,7 @@ def get_youtube_channel_info(channelId: str = Query(..., description="YouTube Ch
         raise HTTPException(status_code=500, detail="YouTube API key not configured on server.")
     url = f"https://www.googleapis.com/youtube/v3/channels?part=snippet,statistics&id={channelId}&key={api_key}"
     try:
-        resp = requests.get(url, timeout=10)
+        resp = get_http_session().get(url, timeout=10)
         resp.raise_for_status()
         return resp.json()
     except requests.RequestException as e:
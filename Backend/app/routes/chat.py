@@ -11,8 +11,8 @@ from ..db.db import get_db
 from ..services.chat_services import chat_service
 from redis.asyncio import Redis
 from ..services.redis_client import get_redis
-import asyncio
-from ..services.chat_pubsub import listen_to_channel
+from ..services.chat_pubsub import dispatcher
+from ..services.chat_writer import group_committer, stream_consumer
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
@@ -24,9 +24,9 @@ async def websocket_endpoint(
     redis: Redis = Depends(get_redis),
     db: AsyncSession = Depends(get_db),
 ):
-    await chat_service.connect(user_id, websocket, db)
+    connection_id = await chat_service.connect(user_id, websocket, db, redis)
 
-    listener_task = asyncio.create_task(listen_to_channel(user_id, websocket, redis))
+    await dispatcher.register(user_id, websocket)
 
     try:
         while True:
@@ -41,16 +41,31 @@ async def websocket_endpoint(
                 )
 
     except WebSocketDisconnect:
-        listener_task.cancel()
-        await chat_service.disconnect(user_id, redis, db)
+        await dispatcher.unregister(user_id, websocket)
+        await chat_service.disconnect(user_id, connection_id, redis, db)
 
     except Exception as e:
-        listener_task.cancel()
-        await chat_service.disconnect(user_id, redis, db)
+        await dispatcher.unregister(user_id, websocket)
+        await chat_service.disconnect(user_id, connection_id, redis, db)
         # Optionally log the error
         print(f"Error in websocket for user {user_id}: {e}")
 
 
+@router.get("/pubsub/stats")
+async def get_pubsub_stats():
+    return dispatcher.stats()
+
+
+@router.get("/writer/stats")
+async def get_writer_stats():
+    return group_committer.stats()
+
+
+@router.get("/stream/stats")
+async def get_stream_stats():
+    return await stream_consumer.stats()
+
+
 @router.get("/user_name/{user_id}")
 async def get_user_name(user_id: str, db: AsyncSession = Depends(get_db)):
     return await chat_service.get_user_name(user_id, db)
@@ -84,6 +99,20 @@ async def get_chat_history(
     return await chat_service.get_chat_history(user_id, chat_list_id, last_fetched, db)
 
 
+@router.put("/read_up_to/{user_id}/{chat_list_id}/{message_id}")
+async def mark_read_up_to(
+    user_id: str,
+    chat_list_id: str,
+    message_id: str,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+):
+    return await chat_service.mark_read_up_to(
+        user_id, chat_list_id, message_id, db, redis
+    )
+
+
+# Per-message receipts from older clients; reading a message reads everything before it
 @router.put("/read/{user_id}/{chat_list_id}/{message_id}")
 async def mark_message_as_read(
     user_id: str,
@@ -95,7 +124,7 @@ async def mark_message_as_read(
     if not message_id:
         raise HTTPException(status_code=400, detail="message_id is required")
 
-    return await chat_service.mark_message_as_read(
+    return await chat_service.mark_read_up_to(
         user_id, chat_list_id, message_id, db, redis
     )
 
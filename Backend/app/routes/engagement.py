@@ -0,0 +1,39 @@
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db.db import get_db
+from ..services.engagement import get_rollup, top_rollups
+
+router = APIRouter(prefix="/engagement", tags=["Engagement"])
+
+Metric = Literal["post_count", "likes", "comments", "shares"]
+
+@router.get("/users/{user_id}")
+async def get_user_engagement(user_id: str, db: AsyncSession = Depends(get_db)):
+    rollup = await get_rollup(db, "user", user_id)
+    if rollup is None:
+        raise HTTPException(status_code=404, detail="No posts found for this user.")
+    return rollup
+
+@router.get("/categories/{category}")
+async def get_category_engagement(category: str, db: AsyncSession = Depends(get_db)):
+    rollup = await get_rollup(db, "category", category)
+    if rollup is None:
+        raise HTTPException(status_code=404, detail="No posts found in this category.")
+    return rollup
+
+@router.get("/top/users")
+async def get_top_users(
+    metric: Metric = "likes",
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    return {"results": await top_rollups(db, "user", metric, limit)}
+
+@router.get("/top/categories")
+async def get_top_categories(
+    metric: Metric = "likes",
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    return {"results": await top_rollups(db, "category", metric, limit)}
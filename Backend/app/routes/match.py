@@ -1,8 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
-from ..services.db_service import match_creators_for_brand, match_brands_for_creator
+from ..db.db import get_db
+from ..services.match_store import cached_creators_for_brand, cached_brands_for_creator, match_cache
+from ..services.match_sql import match_creators_for_brand_sql, match_brands_for_creator_sql
+from ..services.db_service import (
+    rank_creators_for_brand, rank_brands_for_creator,
+    match_creators_for_brands, match_brands_for_creators
+)
+from ..schemas.schema import SponsorshipMatchBatch, CreatorMatchBatch
+from ..services.cursor import encode_cursor, decode_cursor
 
 # Load environment variables
 # load_dotenv()
@@ -13,17 +22,92 @@ from ..services.db_service import match_creators_for_brand, match_brands_for_cre
 router = APIRouter(prefix="/match", tags=["Matching"])
 
 @router.get("/creators-for-brand/{sponsorship_id}")
-def get_creators_for_brand(sponsorship_id: str):
-    matches = match_creators_for_brand(sponsorship_id)
+async def get_creators_for_brand(sponsorship_id: str):
+    matches = await cached_creators_for_brand(sponsorship_id)
     if not matches:
         raise HTTPException(status_code=404, detail="No matching creators found.")
     return {"matches": matches}
 
 @router.get("/brands-for-creator/{creator_id}")
-def get_brands_for_creator(creator_id: str):
-    matches = match_brands_for_creator(creator_id)
+async def get_brands_for_creator(creator_id: str):
+    matches = await cached_brands_for_creator(creator_id)
     if not matches:
         raise HTTPException(status_code=404, detail="No matching brand campaigns found.")
     return {"matches": matches}
 
+@router.get("/cache/stats")
+def get_match_cache_stats():
+    return match_cache.stats()
+
+@router.post("/batch/creators-for-brands")
+def get_creators_for_brands(batch: SponsorshipMatchBatch):
+    return {"results": match_creators_for_brands(list(dict.fromkeys(batch.sponsorship_ids)))}
+
+@router.post("/batch/brands-for-creators")
+def get_brands_for_creators(batch: CreatorMatchBatch):
+    return {"results": match_brands_for_creators(list(dict.fromkeys(batch.creator_ids)))}
+
+@router.get("/sql/creators-for-brand/{sponsorship_id}")
+async def get_creators_for_brand_sql(sponsorship_id: str, db: AsyncSession = Depends(get_db)):
+    matches = await match_creators_for_brand_sql(sponsorship_id, db)
+    if not matches:
+        raise HTTPException(status_code=404, detail="No matching creators found.")
+    return {"matches": matches}
+
+@router.get("/sql/brands-for-creator/{creator_id}")
+async def get_brands_for_creator_sql(creator_id: str, db: AsyncSession = Depends(get_db)):
+    matches = await match_brands_for_creator_sql(creator_id, db)
+    if not matches:
+        raise HTTPException(status_code=404, detail="No matching brand campaigns found.")
+    return {"matches": matches}
+
+def ranking_weights(
+    w_age: float = Query(1.0, ge=0),
+    w_location: float = Query(1.0, ge=0),
+    w_engagement: float = Query(1.0, ge=0),
+    w_price: float = Query(1.0, ge=0),
+):
+    return {"age": w_age, "location": w_location, "engagement": w_engagement, "price": w_price}
+
+def ranking_cursor(cursor: str | None = None):
+    if not cursor:
+        return None
+    rank_score, item_id = decode_cursor(cursor, 2)
+    if not isinstance(rank_score, (int, float)) or not isinstance(item_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return (float(rank_score), item_id)
+
+def ranked_page(ranked, limit: int):
+    # One extra item is selected to know whether another page exists
+    page = ranked[:limit]
+    next_cursor = None
+    if len(ranked) > limit:
+        rank_score, item_id, _ = page[-1]
+        next_cursor = encode_cursor([rank_score, item_id])
+    return {"matches": [item for _, _, item in page], "next_cursor": next_cursor}
+
+@router.get("/ranked/creators-for-brand/{sponsorship_id}")
+def get_ranked_creators_for_brand(
+    sponsorship_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    after: tuple | None = Depends(ranking_cursor),
+    weights: dict = Depends(ranking_weights),
+):
+    ranked = rank_creators_for_brand(sponsorship_id, limit + 1, weights, after)
+    if ranked is None:
+        raise HTTPException(status_code=404, detail="Sponsorship not found.")
+    return ranked_page(ranked, limit)
+
+@router.get("/ranked/brands-for-creator/{creator_id}")
+def get_ranked_brands_for_creator(
+    creator_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    after: tuple | None = Depends(ranking_cursor),
+    weights: dict = Depends(ranking_weights),
+):
+    ranked = rank_brands_for_creator(creator_id, limit + 1, weights, after)
+    if ranked is None:
+        raise HTTPException(status_code=404, detail="Audience insights not found.")
+    return ranked_page(ranked, limit)
+
 # Placeholder for endpoints, logic to be added next 
\ No newline at end of file
@@ -11,19 +11,23 @@ from ..schemas.schema import (
     SponsorshipApplicationCreate, SponsorshipPaymentCreate, CollaborationCreate
 )
 
-from fastapi import APIRouter, HTTPException
-import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
+from fastapi import APIRouter, Body, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from postgrest.types import ReturnMethod
+from supabase import AsyncClient
+from ..services.clients import get_supabase
+from ..services.pagination import PageParams, list_rows
+from ..services.bulk import bulk_insert, MAX_BULK_ITEMS
+from ..services import response_cache
+from ..services.engagement import record_posts
+from ..services.user_cache import invalidate_user
+from ..services.match_store import (
+    refresh_creator_matches, refresh_sponsorship_matches, invalidate_matches
+)
+from typing import List, Optional
 import uuid
 from datetime import datetime, timezone
 
-# Load environment variables
-load_dotenv()
-url: str = os.getenv("SUPABASE_URL")
-key: str = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
-
 # Define Router
 router = APIRouter()
 
@@ -36,11 +40,11 @@ def current_timestamp():
 
 # ========== USER ROUTES ==========
 @router.post("/users/")
-async def create_user(user: UserCreate):
+async def create_user(user: UserCreate, supabase: AsyncClient = Depends(get_supabase)):
     user_id = generate_uuid()
     t = current_timestamp()
 
-    response = supabase.table("users").insert({
+    response = await supabase.table("users").insert({
         "id": user_id,
         "username": user.username,
         "email": user.email,
@@ -49,22 +53,27 @@ async def create_user(user: UserCreate):
         "bio": user.bio,
         "created_at": t
     }).execute()
+    await response_cache.invalidate("users")
+    await invalidate_user(user_id, user.username)
 
     return response
 
 @router.get("/users/")
-async def get_users():
-    result = supabase.table("users").select("*").execute()
-    return result
+async def get_users(
+    request: Request,
+    role: Optional[str] = None,
+    page: PageParams = Depends(),
+    supabase: AsyncClient = Depends(get_supabase),
+):
+    return await list_rows(
+        request, supabase, "users", User, page,
+        filters={"role": role},
+    )
 
 # ========== AUDIENCE INSIGHTS ROUTES ==========
-@router.post("/audience-insights/")
-async def create_audience_insights(insights: AudienceInsightsCreate):
-    insight_id = generate_uuid()
-    t = current_timestamp()
-
-    response = supabase.table("audience_insights").insert({
-        "id": insight_id,
+def audience_insights_row(insights: AudienceInsightsCreate, t: str):
+    return {
+        "id": generate_uuid(),
         "user_id": insights.user_id,
         "audience_age_group": insights.audience_age_group,
         "audience_location": insights.audience_location,
@@ -73,48 +82,117 @@ async def create_audience_insights(insights: AudienceInsightsCreate):
         "time_of_attention": insights.time_of_attention,
         "price_expectation": insights.price_expectation,
         "created_at": t
-    }).execute()
+    }
+
+async def refresh_creators(rows):
+    # One scoring pass, upsert and cache invalidation for the whole batch
+    if not rows:
+        return
+    affected = await run_in_threadpool(refresh_creator_matches, rows)
+    await invalidate_matches((), (row["user_id"] for row in rows), affected)
+
+@router.post("/audience-insights/")
+async def create_audience_insights(insights: AudienceInsightsCreate, supabase: AsyncClient = Depends(get_supabase)):
+    t = current_timestamp()
+
+    response = await supabase.table("audience_insights").insert(
+        audience_insights_row(insights, t)
+    ).execute()
+    await refresh_creators(response.data)
+    await response_cache.invalidate("audience_insights")
 
     return response
 
+@router.post("/audience-insights/bulk")
+async def create_audience_insights_bulk(
+    insights: List[AudienceInsightsCreate] = Body(..., min_length=1, max_length=MAX_BULK_ITEMS),
+    supabase: AsyncClient = Depends(get_supabase),
+):
+    t = current_timestamp()
+    rows, results = await bulk_insert(
+        supabase, "audience_insights", [audience_insights_row(item, t) for item in insights]
+    )
+    await refresh_creators(rows)
+    if rows:
+        await response_cache.invalidate("audience_insights")
+    return {"created": len(rows), "failed": len(insights) - len(rows), "results": results}
+
 @router.get("/audience-insights/")
-async def get_audience_insights():
-    result = supabase.table("audience_insights").select("*").execute()
-    return result
+async def get_audience_insights(
+    request: Request,
+    user_id: Optional[str] = None,
+    page: PageParams = Depends(),
+    supabase: AsyncClient = Depends(get_supabase),
+):
+    return await list_rows(
+        request, supabase, "audience_insights", AudienceInsights, page,
+        filters={"user_id": user_id},
+    )
 
 # ========== SPONSORSHIP ROUTES ==========
-@router.post("/sponsorships/")
-async def create_sponsorship(sponsorship: SponsorshipCreate):
-    sponsorship_id = generate_uuid()
-    t = current_timestamp()
-
-    response = supabase.table("sponsorships").insert({
-        "id": sponsorship_id,
+def sponsorship_row(sponsorship: SponsorshipCreate, t: str):
+    return {
+        "id": generate_uuid(),
         "brand_id": sponsorship.brand_id,
         "title": sponsorship.title,
         "description": sponsorship.description,
         "required_audience": sponsorship.required_audience,
         "budget": sponsorship.budget,
         "engagement_minimum": sponsorship.engagement_minimum,
-        "status": sponsorship.status,
+        "status": "open",
         "created_at": t
-    }).execute()
+    }
 
-    return response
+async def refresh_sponsorships(rows):
+    # One scoring pass, upsert and cache invalidation for the whole batch
+    if not rows:
+        return
+    affected = await run_in_threadpool(refresh_sponsorship_matches, rows)
+    await invalidate_matches((row["id"] for row in rows), (), affected)
 
-@router.get("/sponsorships/")
-async def get_sponsorships():
-    result = supabase.table("sponsorships").select("*").execute()
-    return result
+@router.post("/sponsorships/")
+async def create_sponsorship(sponsorship: SponsorshipCreate, supabase: AsyncClient = Depends(get_supabase)):
+    t = current_timestamp()
 
-# ========== USER POST ROUTES ==========
-@router.post("/posts/")
-async def create_post(post: UserPostCreate):
-    post_id = generate_uuid()
+    # return=minimal keeps the generated search_vector out of the response
+    row = sponsorship_row(sponsorship, t)
+    await supabase.table("sponsorships").insert(row, returning=ReturnMethod.minimal).execute()
+    await refresh_sponsorships([row])
+    await response_cache.invalidate("sponsorships")
+
+    return {"data": [row], "count": None}
+
+@router.post("/sponsorships/bulk")
+async def create_sponsorships_bulk(
+    sponsorships: List[SponsorshipCreate] = Body(..., min_length=1, max_length=MAX_BULK_ITEMS),
+    supabase: AsyncClient = Depends(get_supabase),
+):
     t = current_timestamp()
+    rows, results = await bulk_insert(
+        supabase, "sponsorships", [sponsorship_row(item, t) for item in sponsorships]
+    )
+    await refresh_sponsorships(rows)
+    if rows:
+        await response_cache.invalidate("sponsorships")
+    return {"created": len(rows), "failed": len(sponsorships) - len(rows), "results": results}
+
+@router.get("/sponsorships/")
+async def get_sponsorships(
+    request: Request,
+    brand_id: Optional[str] = None,
+    status: Optional[str] = None,
+    page: PageParams = Depends(),
+    supabase: AsyncClient = Depends(get_supabase),
+):
+    return await list_rows(
+        request, supabase, "sponsorships", Sponsorship, page,
+        filters={"brand_id": brand_id, "status": status},
+    )
 
-    response = supabase.table("user_posts").insert({
-        "id": post_id,
+# ========== USER POST ROUTES ==========
+def post_row(post: UserPostCreate, t: str):
+    return {
+        "id": generate_uuid(),
         "user_id": post.user_id,
         "title": post.title,
         "content": post.content,
@@ -122,22 +200,52 @@ async def create_post(post: UserPostCreate):
         "category": post.category,
         "engagement_metrics": post.engagement_metrics,
         "created_at": t
-    }).execute()
+    }
 
-    return response
+@router.post("/posts/")
+async def create_post(post: UserPostCreate, supabase: AsyncClient = Depends(get_supabase)):
+    t = current_timestamp()
+
+    # return=minimal keeps the generated search_vector out of the response
+    row = post_row(post, t)
+    await supabase.table("user_posts").insert(row, returning=ReturnMethod.minimal).execute()
+    await record_posts([row])
+    await response_cache.invalidate("user_posts")
+
+    return {"data": [row], "count": None}
+
+@router.post("/posts/bulk")
+async def create_posts_bulk(
+    posts: List[UserPostCreate] = Body(..., min_length=1, max_length=MAX_BULK_ITEMS),
+    supabase: AsyncClient = Depends(get_supabase),
+):
+    t = current_timestamp()
+    rows, results = await bulk_insert(supabase, "user_posts", [post_row(item, t) for item in posts])
+    await record_posts(rows)
+    if rows:
+        await response_cache.invalidate("user_posts")
+    return {"created": len(rows), "failed": len(posts) - len(rows), "results": results}
 
 @router.get("/posts/")
-async def get_posts():
-    result = supabase.table("user_posts").select("*").execute()
-    return result
+async def get_posts(
+    request: Request,
+    user_id: Optional[str] = None,
+    category: Optional[str] = None,
+    page: PageParams = Depends(),
+    supabase: AsyncClient = Depends(get_supabase),
+):
+    return await list_rows(
+        request, supabase, "user_posts", UserPost, page,
+        filters={"user_id": user_id, "category": category},
+    )
 
 # ========== SPONSORSHIP APPLICATION ROUTES ==========
 @router.post("/sponsorship-applications/")
-async def create_sponsorship_application(application: SponsorshipApplicationCreate):
+async def create_sponsorship_application(application: SponsorshipApplicationCreate, supabase: AsyncClient = Depends(get_supabase)):
     application_id = generate_uuid()
     t = current_timestamp()
 
-    response = supabase.table("sponsorship_applications").insert({
+    response = await supabase.table("sponsorship_applications").insert({
         "id": application_id,
         "creator_id": application.creator_id,
         "sponsorship_id": application.sponsorship_id,
@@ -146,21 +254,32 @@ async def create_sponsorship_application(application: SponsorshipApplicationCrea
         "status": application.status,
         "applied_at": t
     }).execute()
+    await response_cache.invalidate("sponsorship_applications")
 
     return response
 
 @router.get("/sponsorship-applications/")
-async def get_sponsorship_applications():
-    result = supabase.table("sponsorship_applications").select("*").execute()
-    return result
+async def get_sponsorship_applications(
+    request: Request,
+    creator_id: Optional[str] = None,
+    sponsorship_id: Optional[str] = None,
+    status: Optional[str] = None,
+    page: PageParams = Depends(),
+    supabase: AsyncClient = Depends(get_supabase),
+):
+    return await list_rows(
+        request, supabase, "sponsorship_applications", SponsorshipApplication, page,
+        sort_column="applied_at",
+        filters={"creator_id": creator_id, "sponsorship_id": sponsorship_id, "status": status},
+    )
 
 # ========== SPONSORSHIP PAYMENT ROUTES ==========
 @router.post("/sponsorship-payments/")
-async def create_sponsorship_payment(payment: SponsorshipPaymentCreate):
+async def create_sponsorship_payment(payment: SponsorshipPaymentCreate, supabase: AsyncClient = Depends(get_supabase)):
     payment_id = generate_uuid()
     t = current_timestamp()
 
-    response = supabase.table("sponsorship_payments").insert({
+    response = await supabase.table("sponsorship_payments").insert({
         "id": payment_id,
         "creator_id": payment.creator_id,
         "sponsorship_id": payment.sponsorship_id,
@@ -168,21 +287,33 @@ async def create_sponsorship_payment(payment: SponsorshipPaymentCreate):
         "status": payment.status,
         "payment_date": t
     }).execute()
+    await response_cache.invalidate("sponsorship_payments")
 
     return response
 
 @router.get("/sponsorship-payments/")
-async def get_sponsorship_payments():
-    result = supabase.table("sponsorship_payments").select("*").execute()
-    return result
+async def get_sponsorship_payments(
+    request: Request,
+    creator_id: Optional[str] = None,
+    brand_id: Optional[str] = None,
+    sponsorship_id: Optional[str] = None,
+    status: Optional[str] = None,
+    page: PageParams = Depends(),
+    supabase: AsyncClient = Depends(get_supabase),
+):
+    return await list_rows(
+        request, supabase, "sponsorship_payments", SponsorshipPayment, page,
+        sort_column="transaction_date",
+        filters={"creator_id": creator_id, "brand_id": brand_id, "sponsorship_id": sponsorship_id, "status": status},
+    )
 
 # ========== COLLABORATION ROUTES ==========
 @router.post("/collaborations/")
-async def create_collaboration(collab: CollaborationCreate):
+async def create_collaboration(collab: CollaborationCreate, supabase: AsyncClient = Depends(get_supabase)):
     collaboration_id = generate_uuid()
     t = current_timestamp()
 
-    response = supabase.table("collaborations").insert({
+    response = await supabase.table("collaborations").insert({
         "id": collaboration_id,
         "creator_1_id": collab.creator_1_id,
         "creator_2_id": collab.creator_2_id,
@@ -190,10 +321,20 @@ async def create_collaboration(collab: CollaborationCreate):
         "status": collab.status,
         "created_at": t
     }).execute()
+    await response_cache.invalidate("collaborations")
 
     return response
 
 @router.get("/collaborations/")
-async def get_collaborations():
-    result = supabase.table("collaborations").select("*").execute()
-    return result
+async def get_collaborations(
+    request: Request,
+    creator_1_id: Optional[str] = None,
+    creator_2_id: Optional[str] = None,
+    status: Optional[str] = None,
+    page: PageParams = Depends(),
+    supabase: AsyncClient = Depends(get_supabase),
+):
+    return await list_rows(
+        request, supabase, "collaborations", Collaboration, page,
+        filters={"creator_1_id": creator_1_id, "creator_2_id": creator_2_id, "status": status},
+    )
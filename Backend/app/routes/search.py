@@ -0,0 +1,33 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db.db import get_db
+from ..services.search import search
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+@router.get("/sponsorships")
+async def search_sponsorships(
+    q: str = Query(..., min_length=1, max_length=200),
+    status: Optional[str] = None,
+    brand_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    return await search(
+        db, "sponsorships", q, limit, cursor, filters={"status": status, "brand_id": brand_id}
+    )
+
+@router.get("/posts")
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    user_id: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    return await search(
+        db, "posts", q, limit, cursor, filters={"user_id": user_id, "category": category}
+    )
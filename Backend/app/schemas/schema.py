@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List
 from datetime import datetime
 
 class UserCreate(BaseModel):
@@ -51,3 +51,9 @@ class CollaborationCreate(BaseModel):
     creator_1_id: str
     creator_2_id: str
     collaboration_details: str
+
+class SponsorshipMatchBatch(BaseModel):
+    sponsorship_ids: List[str] = Field(..., min_length=1, max_length=200)
+
+class CreatorMatchBatch(BaseModel):
+    creator_ids: List[str] = Field(..., min_length=1, max_length=200)
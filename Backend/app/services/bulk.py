@@ -0,0 +1,79 @@
+"""
+Chunked multi-row inserts with per-item results.
+
+Rows are written BULK_CHUNK_SIZE at a time, one INSERT per chunk. A chunk
+that fails on a row-level error (a broken foreign key or unique constraint,
+a bad value) is split in half and retried until the offending rows are
+isolated, so a bad item costs a few extra round trips instead of failing its
+whole chunk. Splitting stops after BULK_MAX_SPLITS per chunk, and errors
+that would hit every row alike (permissions, a missing table, a dropped
+connection or timeout) are not split at all: the rows left are reported as
+failed with that error. Inserts ask for no rows back (`return=minimal`):
+callers build complete rows, ids included, so the request rows are reported
+as inserted and generated columns such as search vectors never travel back
+over the wire.
+"""
+from typing import Any, Dict, List, Tuple
+import os
+from postgrest.types import ReturnMethod
+from postgrest.exceptions import APIError
+from supabase import AsyncClient
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+MAX_BULK_ITEMS = int(os.getenv("MAX_BULK_ITEMS", "5000"))
+BULK_MAX_SPLITS = int(os.getenv("BULK_MAX_SPLITS", "32"))
+
+
+def _row_level(error: Exception) -> bool:
+    # Integrity (23xxx) and data (22xxx) errors come from particular rows
+    return isinstance(error, APIError) and (error.code or "").startswith(("22", "23"))
+
+
+async def _insert_chunk(
+    supabase: AsyncClient, table: str, rows: List[Tuple[int, Dict[str, Any]]]
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], Dict[int, str]]:
+    inserted: List[Tuple[int, Dict[str, Any]]] = []
+    errors: Dict[int, str] = {}
+    splits = BULK_MAX_SPLITS
+    # Depth first, left half on top, so rows come back in input order
+    pending = [rows]
+    while pending:
+        part = pending.pop()
+        try:
+            await supabase.table(table).insert(
+                [row for _, row in part], returning=ReturnMethod.minimal
+            ).execute()
+        except Exception as e:
+            if len(part) > 1 and splits > 0 and _row_level(e):
+                splits -= 1
+                middle = len(part) // 2
+                pending += [part[middle:], part[:middle]]
+                continue
+            message = (e.message if isinstance(e, APIError) else None) or str(e) or type(e).__name__
+            errors.update((index, message) for index, _ in part)
+            continue
+        inserted.extend(part)
+    return inserted, errors
+
+
+async def bulk_insert(
+    supabase: AsyncClient, table: str, rows: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Insert `rows`; returns the inserted rows and one result per input item, in order."""
+    inserted: List[Tuple[int, Dict[str, Any]]] = []
+    errors: Dict[int, str] = {}
+    indexed = list(enumerate(rows))
+    for start in range(0, len(indexed), BULK_CHUNK_SIZE):
+        chunk_rows, chunk_errors = await _insert_chunk(
+            supabase, table, indexed[start : start + BULK_CHUNK_SIZE]
+        )
+        inserted.extend(chunk_rows)
+        errors.update(chunk_errors)
+
+    results = [
+        {"index": index, "status": "error", "error": errors[index]}
+        if index in errors
+        else {"index": index, "status": "created", "id": row["id"]}
+        for index, row in indexed
+    ]
+    return [row for _, row in inserted], results
@@ -0,0 +1,292 @@
+"""
+Two-tier cache: an in-process LRU in front of Redis.
+
+Values must be JSON-serializable. Invalidations delete the Redis entry and
+are broadcast on a `<namespace>:invalidate` channel so every worker drops
+its local copy too; `listen_for_invalidations` runs that subscriber.
+
+Every invalidation also bumps a namespace generation counter. A read-through
+caller takes `generation()` before loading a value and stores it with
+`set_if_current`, which refuses the write if an invalidation ran in between,
+so a value loaded before a write is never cached after it.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_CLEAR_ALL = "*"
+
+# SET KEYS[2] only while the generation in KEYS[1] still equals ARGV[1]
+_SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[1]) or '0') == ARGV[1] then
+    redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# The same for KEYS[2..n], values in ARGV[3..], TTL in ARGV[2]
+_SET_MANY_IF_GENERATION = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+for i = 2, #KEYS do
+    redis.call('SET', KEYS[i], ARGV[i + 1], 'EX', ARGV[2])
+end
+return 1
+"""
+
+
+class LRUCache:
+    """Bounded in-process LRU with a per-entry TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 300):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str, default: Any = _MISSING) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class TieredCache:
+    """LRU + Redis cache for one namespace, with hit/miss counters."""
+
+    def __init__(
+        self,
+        namespace: str,
+        redis: Redis,
+        maxsize: int = 1024,
+        ttl_seconds: float = 300,
+    ):
+        self.namespace = namespace
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUCache(maxsize, ttl_seconds)
+        self.channel = f"{namespace}:invalidate"
+        # Outside the `<namespace>:*` pattern so `clear` does not reset it
+        self.generation_key = f"generation:{namespace}"
+        self.counters = {"local_hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0}
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key)
+        if value is not _MISSING:
+            self.counters["local_hits"] += 1
+            return value
+        try:
+            raw = await self.redis.get(self._redis_key(key))
+        except RedisError as e:
+            logger.warning(f"Cache {self.namespace}: Redis get failed: {e}")
+            raw = None
+        if raw is not None:
+            self.counters["redis_hits"] += 1
+            value = json.loads(raw)
+            self.local.set(key, value)
+            return value
+        self.counters["misses"] += 1
+        return default
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Look up several keys with at most one Redis round trip; misses are left out."""
+        found: Dict[str, Any] = {}
+        remote = []
+        for key in dict.fromkeys(keys):
+            value = self.local.get(key)
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        self.counters["local_hits"] += len(found)
+        if not remote:
+            return found
+        try:
+            raws = await self.redis.mget([self._redis_key(key) for key in remote])
+        except RedisError as e:
+            logger.warning(f"Cache {self.namespace}: Redis mget failed: {e}")
+            raws = [None] * len(remote)
+        for key, raw in zip(remote, raws):
+            if raw is None:
+                self.counters["misses"] += 1
+                continue
+            self.counters["redis_hits"] += 1
+            found[key] = json.loads(raw)
+            self.local.set(key, found[key])
+        return found
+
+    async def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        try:
+            await self.redis.set(
+                self._redis_key(key), json.dumps(value, default=str), ex=int(self.ttl_seconds)
+            )
+        except RedisError as e:
+            logger.warning(f"Cache {self.namespace}: Redis set failed: {e}")
+
+    async def generation(self) -> Optional[str]:
+        """Current invalidation generation, or None if Redis is unavailable."""
+        try:
+            return await self.redis.get(self.generation_key) or "0"
+        except RedisError as e:
+            logger.warning(f"Cache {self.namespace}: Redis generation read failed: {e}")
+            return None
+
+    async def set_if_current(self, key: str, value: Any, generation: Optional[str]) -> bool:
+        """`set`, unless the namespace was invalidated since `generation` was read."""
+        if generation is None:
+            return False
+        try:
+            stored = await self.redis.eval(
+                _SET_IF_GENERATION,
+                2,
+                self.generation_key,
+                self._redis_key(key),
+                generation,
+                json.dumps(value, default=str),
+                int(self.ttl_seconds),
+            )
+        except RedisError as e:
+            logger.warning(f"Cache {self.namespace}: Redis set failed: {e}")
+            return False
+        if stored:
+            self.local.set(key, value)
+        return bool(stored)
+
+    async def set_many_if_current(self, values: Dict[str, Any], generation: Optional[str]) -> bool:
+        """`set_many`, all or nothing, unless the namespace was invalidated since `generation`."""
+        if not values or generation is None:
+            return False
+        try:
+            stored = await self.redis.eval(
+                _SET_MANY_IF_GENERATION,
+                1 + len(values),
+                self.generation_key,
+                *(self._redis_key(key) for key in values),
+                generation,
+                int(self.ttl_seconds),
+                *(json.dumps(value, default=str) for value in values.values()),
+            )
+        except RedisError as e:
+            logger.warning(f"Cache {self.namespace}: Redis set_many failed: {e}")
+            return False
+        if stored:
+            for key, value in values.items():
+                self.local.set(key, value)
+        return bool(stored)
+
+    async def set_many(self, values: Dict[str, Any]):
+        if not values:
+            return
+        for key, value in values.items():
+            self.local.set(key, value)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    pipe.set(
+                        self._redis_key(key), json.dumps(value, default=str), ex=int(self.ttl_seconds)
+                    )
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Cache {self.namespace}: Redis set_many failed: {e}")
+
+    async def invalidate(self, *keys: str):
+        """Drop `keys` here, in Redis and in every other worker's LRU."""
+        keys = [key for key in keys if key]
+        if not keys:
+            return
+        self.counters["invalidations"] += len(keys)
+        for key in keys:
+            self.local.pop(key)
+        try:
+            # Bumped first: a read-through set racing this call either lands
+            # before the delete below or is refused
+            await self.redis.incr(self.generation_key)
+            await self.redis.delete(*(self._redis_key(key) for key in keys))
+            await self.redis.publish(self.channel, json.dumps(keys))
+        except RedisError as e:
+            logger.warning(f"Cache {self.namespace}: Redis invalidate failed: {e}")
+
+    async def clear(self):
+        """Drop the whole namespace, e.g. after a bulk recompute."""
+        self.local.clear()
+        try:
+            await self.redis.incr(self.generation_key)
+            batch: List[str] = []
+            async for redis_key in self.redis.scan_iter(match=f"{self.namespace}:*"):
+                batch.append(redis_key)
+                if len(batch) >= 500:
+                    await self.redis.delete(*batch)
+                    batch = []
+            if batch:
+                await self.redis.delete(*batch)
+            await self.redis.publish(self.channel, json.dumps(_CLEAR_ALL))
+        except RedisError as e:
+            logger.warning(f"Cache {self.namespace}: Redis clear failed: {e}")
+
+    def apply_invalidation(self, payload: str):
+        """Apply an invalidation message published by any worker."""
+        keys = json.loads(payload)
+        if keys == _CLEAR_ALL:
+            self.local.clear()
+            return
+        for key in keys:
+            self.local.pop(key)
+
+    async def listen_for_invalidations(self):
+        """Keep this worker's LRU in sync; run as a background task."""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.apply_invalidation(message["data"])
+            except RedisError as e:
+                # Entries may have been missed while disconnected
+                logger.warning(f"Cache {self.namespace}: invalidation listener failed: {e}")
+                self.local.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["local_hits"] + self.counters["redis_hits"] + self.counters["misses"]
+        hits = self.counters["local_hits"] + self.counters["redis_hits"]
+        return {
+            **self.counters,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "local_size": len(self.local),
+        }
@@ -1,16 +1,152 @@
+"""
+Per-worker Redis pub/sub dispatcher for chat events.
+
+One pub/sub connection per worker carries every `to_user:<user_id>`
+channel that has a socket on this worker. Channels are subscribed when
+their first local socket registers and unsubscribed when the last one
+leaves. Incoming messages are routed through an in-memory channel -> sockets
+map into a small per-socket queue, and a writer task per socket drains it,
+so one slow client cannot stall delivery to the others. On a Redis error
+the connection is rebuilt and every live channel resubscribed.
+"""
+from collections import deque
+from typing import Any, Dict
+import asyncio
+import json
+import logging
+import os
+import time
 from fastapi import WebSocket
 from redis.asyncio import Redis
-import json
+from redis.exceptions import RedisError
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+SOCKET_QUEUE_SIZE = int(os.getenv("CHAT_SOCKET_QUEUE_SIZE", "256"))
+LATENCY_SAMPLES = 1024
+# Always subscribed, so the connection exists before the first user joins
+_CONTROL_CHANNEL = "chat:dispatcher"
+
+
+class _LocalSocket:
+    def __init__(self, websocket: WebSocket, dispatcher: "PubSubDispatcher"):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SOCKET_QUEUE_SIZE)
+        self.writer = asyncio.create_task(self._write(dispatcher))
+
+    async def _write(self, dispatcher: "PubSubDispatcher"):
+        while True:
+            payload, received_at = await self.queue.get()
+            try:
+                await self.websocket.send_json(payload)
+            except Exception as e:
+                dispatcher.counters["send_errors"] += 1
+                logger.info(f"Dropping chat event for closed socket: {e}")
+                return
+            dispatcher.latencies.append((time.perf_counter() - received_at) * 1000)
+
+
+class PubSubDispatcher:
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.pubsub = None
+        self.channels: Dict[str, Dict[WebSocket, _LocalSocket]] = {}
+        self.latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self.counters = {
+            "subscribes": 0,
+            "unsubscribes": 0,
+            "messages": 0,
+            "deliveries": 0,
+            "dropped": 0,
+            "send_errors": 0,
+            "reconnects": 0,
+        }
+        self._ready = asyncio.Event()
+
+    @staticmethod
+    def channel(user_id: str) -> str:
+        return f"to_user:{user_id}"
+
+    async def register(self, user_id: str, websocket: WebSocket):
+        channel = self.channel(user_id)
+        sockets = self.channels.setdefault(channel, {})
+        sockets[websocket] = _LocalSocket(websocket, self)
+        if len(sockets) == 1:
+            self.counters["subscribes"] += 1
+            # Before the connection is up, run() subscribes everything in the map
+            if self._ready.is_set():
+                try:
+                    await self.pubsub.subscribe(channel)
+                except RedisError as e:
+                    logger.warning(f"Subscribe to {channel} failed, retried on reconnect: {e}")
+
+    async def unregister(self, user_id: str, websocket: WebSocket):
+        channel = self.channel(user_id)
+        sockets = self.channels.get(channel, {})
+        local = sockets.pop(websocket, None)
+        if local is not None:
+            local.writer.cancel()
+        if not sockets and self.channels.pop(channel, None) is not None:
+            self.counters["unsubscribes"] += 1
+            if not self._ready.is_set():
+                return
+            try:
+                await self.pubsub.unsubscribe(channel)
+            except RedisError as e:
+                # The channel is no longer in the map, so a resubscribe after reconnect skips it
+                logger.warning(f"Unsubscribe from {channel} failed: {e}")
+
+    def _dispatch(self, channel: str, data: str):
+        received_at = time.perf_counter()
+        self.counters["messages"] += 1
+        sockets = self.channels.get(channel)
+        if not sockets:
+            return
+        payload = json.loads(data)
+        for local in sockets.values():
+            try:
+                local.queue.put_nowait((payload, received_at))
+                self.counters["deliveries"] += 1
+            except asyncio.QueueFull:
+                self.counters["dropped"] += 1
+
+    async def run(self):
+        """Own the worker's pub/sub connection; run as a background task."""
+        while True:
+            self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                self._ready.set()
+                await self.pubsub.subscribe(_CONTROL_CHANNEL, *self.channels)
+                while True:
+                    message = await self.pubsub.get_message(timeout=None)
+                    if message and message["type"] == "message":
+                        self._dispatch(message["channel"], message["data"])
+            except RedisError as e:
+                logger.warning(f"Chat pub/sub connection lost, reconnecting: {e}")
+                self._ready.clear()
+                self.counters["reconnects"] += 1
+                await asyncio.sleep(1)
+            finally:
+                await self.pubsub.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(pct: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * pct))] if latencies else 0.0
 
+        return {
+            **self.counters,
+            "channels": len(self.channels),
+            "sockets": sum(len(sockets) for sockets in self.channels.values()),
+            "dispatch_latency_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": latencies[-1] if latencies else 0.0,
+            },
+        }
 
-async def listen_to_channel(user_id: str, websocket: WebSocket, redis_client: Redis):
-    pubsub = redis_client.pubsub()
-    await pubsub.subscribe(f"to_user:{user_id}")
 
-    try:
-        async for message in pubsub.listen():
-            if message["type"] == "message":
-                await websocket.send_json(json.loads(message["data"]))
-    finally:
-        await pubsub.unsubscribe(f"to_user:{user_id}")
-        await pubsub.close()
+dispatcher = PubSubDispatcher(redis_client)
@@ -1,10 +1,22 @@
 from fastapi import WebSocket, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Index, case, func, true, update
 from sqlalchemy.sql import select
+from sqlalchemy.dialects.postgresql import insert
+from collections import defaultdict
 from datetime import datetime, timezone
+from typing import Any, Dict
 from app.models.models import User
-from app.models.chat import ChatList, ChatMessage, MessageStatus
-from typing import Dict
+from app.models.chat import (
+    ChatList,
+    ChatMessage,
+    ChatReadWatermark,
+    MessageStatus,
+    generate_uuid,
+)
+from .chat_writer import new_chat_list_id, pending_message, record_pending_read, write_message
+from .user_cache import get_profile, get_user_id_by_username
+from .presence import presence
 from redis.asyncio import Redis
 import logging
 import json
@@ -12,42 +24,112 @@ import json
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Latest message per chat, and unread messages per (chat, receiver)
+CHAT_INDEXES = [
+    Index(
+        "ix_chat_messages_chat_list_id_created_at",
+        ChatMessage.chat_list_id,
+        ChatMessage.created_at,
+    ),
+    Index(
+        "ix_chat_messages_unread",
+        ChatMessage.chat_list_id,
+        ChatMessage.receiver_id,
+        postgresql_where=ChatMessage.status != MessageStatus.SEEN,
+    ),
+]
+
+
+def create_chat_indexes(sync_conn):
+    """Create the chat indexes; `create_all` skips indexes of existing tables."""
+    for index in CHAT_INDEXES:
+        index.create(sync_conn, checkfirst=True)
+
+
+def _check_reader(user_id: str, chat_list_id: str, message_chat_list_id: str, *participants: str):
+    # The message must belong to the specified chat list and the user must be in it
+    if message_chat_list_id != chat_list_id or user_id not in participants:
+        raise HTTPException(
+            status_code=403, detail="Not authorized to mark this message as read"
+        )
+
+
+async def notify(redis: Redis, events: Dict[str, Dict[str, Any]]):
+    """Publish one event per recipient to those who are online, in one pipeline."""
+    if not events:
+        return
+    online = await presence.online(events)
+    if not online:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for recipient_id in online:
+            pipe.publish(f"to_user:{recipient_id}", json.dumps(events[recipient_id]))
+        await pipe.execute()
 
-class ChatService:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
 
+class ChatService:
     async def connect(
         self,
         user_id: str,
         websocket: WebSocket,
         db: AsyncSession,
-    ):
-        """Accept WebSocket connection and update user status to online."""
+        redis: Redis,
+    ) -> str | None:
+        """Accept WebSocket connection and update user status to online.
+
+        Returns the presence connection id to pass to `disconnect`.
+        """
         await websocket.accept()
         # Mark user as online
         user = await db.get(User, user_id)
         if user:
-            self.active_connections[user_id] = websocket
+            connection_id = await presence.connect(user_id)
             user.is_online = True
-            await db.commit()
 
-            query = select(ChatMessage).where(
-                (ChatMessage.receiver_id == user_id)
-                & (ChatMessage.status == MessageStatus.SENT)
+            # Everything sent while they were away is delivered now
+            delivered = await db.execute(
+                update(ChatMessage)
+                .where(
+                    (ChatMessage.receiver_id == user_id)
+                    & (ChatMessage.status == MessageStatus.SENT)
+                )
+                .values(status=MessageStatus.DELIVERED)
+                .returning(ChatMessage.id, ChatMessage.sender_id, ChatMessage.chat_list_id)
+                .execution_options(synchronize_session=False)
             )
-            messages = (await db.execute(query)).scalars().all()
-            # mark as delivered
-            for message in messages:
-                message.status = MessageStatus.DELIVERED
+            by_sender = defaultdict(lambda: defaultdict(list))
+            for row in delivered:
+                by_sender[row.sender_id][row.chat_list_id].append(row.id)
             await db.commit()
+
+            await notify(
+                redis,
+                {
+                    sender_id: {
+                        "eventType": "MESSAGES_DELIVERED",
+                        "chats": [
+                            {"chatListId": chat_list_id, "messageIds": message_ids}
+                            for chat_list_id, message_ids in chats.items()
+                        ],
+                    }
+                    for sender_id, chats in by_sender.items()
+                }
+            )
+            return connection_id
         else:
             logger.warning(f"User {user_id} not found in the database.")
             await websocket.close()
+            return None
 
-    async def disconnect(self, user_id: str, redis: Redis, db: AsyncSession):
-        """Remove connection and update last seen."""
-        self.active_connections.pop(user_id, None)
+    async def disconnect(
+        self, user_id: str, connection_id: str | None, redis: Redis, db: AsyncSession
+    ):
+        """Remove connection and, if it was the user's last one, update last seen."""
+        if connection_id is None:
+            return
+        if await presence.disconnect(user_id, connection_id):
+            # Still connected from another tab/device, possibly on another worker
+            return
 
         # Mark user as offline and update last seen
         user = await db.get(User, user_id)
@@ -76,58 +158,64 @@ class ChatService:
                 status_code=400, detail="Cannot send message to yourself"
             )
 
-        # Find or create chat list
-        chat_list = await db.execute(
-            select(ChatList).where(
-                ((ChatList.user1_id == sender_id) & (ChatList.user2_id == receiver_id))
-                | (
-                    (ChatList.user1_id == receiver_id)
-                    & (ChatList.user2_id == sender_id)
+        chat_list_id = (
+            await db.execute(
+                select(ChatList.id).where(
+                    ((ChatList.user1_id == sender_id) & (ChatList.user2_id == receiver_id))
+                    | (
+                        (ChatList.user1_id == receiver_id)
+                        & (ChatList.user2_id == sender_id)
+                    )
                 )
             )
-        )
-        chat_list = chat_list.scalar_one_or_none()
+        ).scalar_one_or_none()
+        is_chat_list_exists = chat_list_id is not None
 
-        is_chat_list_exists = chat_list is not None
+        # Decide delivery before the insert so the row is written once
+        online = await presence.online([sender_id, receiver_id])
+        now = datetime.now(timezone.utc)
 
-        if not chat_list:
-            chat_list = ChatList(user1_id=sender_id, user2_id=receiver_id)
-            db.add(chat_list)
-            await db.commit()
-
-        # Store message in DB
-        new_message = ChatMessage(
-            sender_id=sender_id,
-            receiver_id=receiver_id,
-            chat_list_id=chat_list.id,
-            message=message_text,
-            status=MessageStatus.SENT,
-        )
-        db.add(new_message)
-        await db.commit()
-
-        # Update last message time
-        chat_list.last_message_time = datetime.now(timezone.utc)
-        await db.commit()
+        new_chat_list = None
+        if not is_chat_list_exists:
+            chat_list_id, is_chat_list_exists = await new_chat_list_id(
+                redis, sender_id, receiver_id
+            )
+            new_chat_list = {
+                "id": chat_list_id,
+                "user1_id": sender_id,
+                "user2_id": receiver_id,
+                "last_message_time": now,
+            }
+        new_message = {
+            "id": generate_uuid(),
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "chat_list_id": chat_list_id,
+            "message": message_text,
+            "status": (
+                MessageStatus.DELIVERED
+                if receiver_id in online
+                else MessageStatus.SENT
+            ),
+            "created_at": now,
+        }
+        await write_message(db, new_chat_list, new_message)
 
         receiver_channel = f"to_user:{receiver_id}"
         sender_channel = f"to_user:{sender_id}"
 
         # Send message to receiver if online
-        if receiver_id in self.active_connections:
-            new_message.status = MessageStatus.DELIVERED
-            await db.commit()
-
-            if sender_id in self.active_connections:
+        if receiver_id in online:
+            if sender_id in online:
                 await redis.publish(
                     sender_channel,
                     json.dumps(
                         {
                             "eventType": "NEW_MESSAGE_DELIVERED",
-                            "chatListId": chat_list.id,
-                            "id": new_message.id,
+                            "chatListId": chat_list_id,
+                            "id": new_message["id"],
                             "message": message_text,
-                            "createdAt": new_message.created_at.isoformat(),
+                            "createdAt": now.isoformat(),
                             "isSent": True,
                             "status": "delivered",
                             "senderId": sender_id,
@@ -141,10 +229,10 @@ class ChatService:
                 json.dumps(
                     {
                         "eventType": "NEW_MESSAGE_RECEIVED",
-                        "chatListId": chat_list.id,
-                        "id": new_message.id,
+                        "chatListId": chat_list_id,
+                        "id": new_message["id"],
                         "message": message_text,
-                        "createdAt": new_message.created_at.isoformat(),
+                        "createdAt": now.isoformat(),
                         "isSent": False,
                         "senderId": sender_id,
                     }
@@ -152,17 +240,17 @@ class ChatService:
             )
 
         else:
-            if sender_id in self.active_connections:
+            if sender_id in online:
                 # Send delivered message to sender
                 await redis.publish(
                     sender_channel,
                     json.dumps(
                         {
                             "eventType": "NEW_MESSAGE_SENT",
-                            "chatListId": chat_list.id,
-                            "id": new_message.id,
+                            "chatListId": chat_list_id,
+                            "id": new_message["id"],
                             "message": message_text,
-                            "createdAt": new_message.created_at.isoformat(),
+                            "createdAt": now.isoformat(),
                             "isSent": True,
                             "status": "sent",
                             "senderId": receiver_id,
@@ -172,7 +260,7 @@ class ChatService:
 
         # used in create_new_chat_message
         return {
-            "chatListId": chat_list.id,
+            "chatListId": chat_list_id,
             "isChatListExists": is_chat_list_exists,
         }
 
@@ -221,7 +309,7 @@ class ChatService:
 
         return formatted_messages
 
-    async def mark_message_as_read(
+    async def mark_read_up_to(
         self,
         user_id: str,
         chat_list_id: str,
@@ -229,82 +317,170 @@ class ChatService:
         db: AsyncSession,
         redis: Redis,
     ):
-        """Mark a specific message as read and notify sender."""
-        # Get the specific message
-        message = await db.get(ChatMessage, message_id)
+        """Move the user's read watermark in a chat forward to a message.
+
+        Every message they received in the chat up to it is marked seen in the
+        same transaction, and the sender gets one MESSAGE_READ event for all of
+        them. A read behind the stored watermark does not move it, but still
+        marks seen whatever is at or behind it and not seen yet (messages
+        persisted after the watermark moved, say). In stream mode the message
+        may still be queued; the read is then recorded and applied when the
+        messages are persisted.
+        """
+        message = (
+            await db.execute(
+                select(
+                    ChatMessage.chat_list_id,
+                    ChatMessage.sender_id,
+                    ChatMessage.receiver_id,
+                    ChatMessage.created_at,
+                ).where(ChatMessage.id == message_id)
+            )
+        ).one_or_none()
 
         if not message:
-            raise HTTPException(status_code=404, detail="Message not found")
+            pending = await pending_message(redis, message_id)
+            if pending is None:
+                raise HTTPException(status_code=404, detail="Message not found")
+            _check_reader(
+                user_id, chat_list_id, pending["chat_list_id"],
+                pending["sender_id"], pending["receiver_id"],
+            )
+            return await self._mark_pending_read(
+                user_id, chat_list_id, message_id, pending, db, redis
+            )
 
-        # Verify the message belongs to the specified chat list and user is the receiver
-        if message.chat_list_id != chat_list_id or message.receiver_id != user_id:
-            raise HTTPException(
-                status_code=403, detail="Not authorized to mark this message as read"
+        _check_reader(
+            user_id, chat_list_id, message.chat_list_id,
+            message.sender_id, message.receiver_id,
+        )
+
+        watermark = ChatReadWatermark.__table__
+        stmt = insert(watermark).values(
+            chat_list_id=chat_list_id,
+            user_id=user_id,
+            last_read_at=message.created_at,
+            message_id=message_id,
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[watermark.c.chat_list_id, watermark.c.user_id],
+                set_={
+                    "last_read_at": stmt.excluded.last_read_at,
+                    "message_id": stmt.excluded.message_id,
+                },
+                where=watermark.c.last_read_at < stmt.excluded.last_read_at,
+            )
+        )
+        read_up_to = (
+            await db.execute(
+                select(watermark.c.last_read_at).where(
+                    (watermark.c.chat_list_id == chat_list_id)
+                    & (watermark.c.user_id == user_id)
+                )
             )
+        ).scalar_one()
 
-        # Update message status
-        if message.status != MessageStatus.SEEN:
-            message.status = MessageStatus.SEEN
-            await db.commit()
+        result = await db.execute(
+            update(ChatMessage)
+            .where(
+                (ChatMessage.chat_list_id == chat_list_id)
+                & (ChatMessage.receiver_id == user_id)
+                & (ChatMessage.status != MessageStatus.SEEN)
+                & (ChatMessage.created_at <= read_up_to)
+            )
+            .values(status=MessageStatus.SEEN)
+            .returning(ChatMessage.id, ChatMessage.sender_id)
+            .execution_options(synchronize_session=False)
+        )
+        seen = result.all()
+        await db.commit()
 
-        # Notify sender if they're online
-        if message.sender_id in self.active_connections:
-            # Send message read notification to sender
-            await redis.publish(
-                f"to_user:{message.sender_id}",
-                json.dumps(
-                    {
+        if seen:
+            await notify(
+                redis,
+                {
+                    seen[0].sender_id: {
                         "eventType": "MESSAGE_READ",
                         "chatListId": chat_list_id,
                         "messageId": message_id,
+                        "messageIds": [row.id for row in seen],
+                        "readUpTo": read_up_to.isoformat(),
                     }
-                ),
+                },
             )
 
-        return True
+        return {"chatListId": chat_list_id, "seen": len(seen)}
+
+    async def _mark_pending_read(
+        self,
+        user_id: str,
+        chat_list_id: str,
+        message_id: str,
+        pending: Dict[str, Any],
+        db: AsyncSession,
+        redis: Redis,
+    ):
+        """Read up to a message the stream consumer has not persisted yet."""
+        await db.rollback()
+        await record_pending_read(
+            redis, chat_list_id, user_id, pending["created_at"], message_id
+        )
+        # Persisted in the meantime: its batch may have missed the read, so apply it here
+        persisted = (
+            await db.execute(select(ChatMessage.id).where(ChatMessage.id == message_id))
+        ).scalar_one_or_none()
+        if persisted is not None:
+            return await self.mark_read_up_to(user_id, chat_list_id, message_id, db, redis)
+
+        if pending["receiver_id"] == user_id:
+            await notify(
+                redis,
+                {
+                    pending["sender_id"]: {
+                        "eventType": "MESSAGE_READ",
+                        "chatListId": chat_list_id,
+                        "messageId": message_id,
+                        "messageIds": [message_id],
+                        "readUpTo": pending["created_at"].isoformat(),
+                    }
+                },
+            )
+        return {"chatListId": chat_list_id, "seen": 0, "pending": True}
 
     async def mark_chat_as_read(
         self, user_id: str, chat_list_id: str, db: AsyncSession, redis: Redis
     ):
         """Mark messages as read and notify sender."""
+        # Messages still queued in stream mode are marked seen when persisted
+        await record_pending_read(
+            redis, chat_list_id, user_id, datetime.now(timezone.utc)
+        )
         result = await db.execute(
-            select(ChatMessage).where(
-                (
-                    (ChatMessage.sender_id == user_id)
-                    | (ChatMessage.receiver_id == user_id)
-                )
-                & (ChatMessage.chat_list_id == chat_list_id)
+            update(ChatMessage)
+            .where(
+                (ChatMessage.chat_list_id == chat_list_id)
+                & (ChatMessage.receiver_id == user_id)
                 & (ChatMessage.status != MessageStatus.SEEN)
             )
+            .values(status=MessageStatus.SEEN)
+            .returning(ChatMessage.id, ChatMessage.sender_id)
+            .execution_options(synchronize_session=False)
         )
-        messages = result.scalars().all()
-
-        for message in messages:
-            if message.sender_id == user_id:
-                message.status = MessageStatus.SEEN
-
+        seen = result.all()
         await db.commit()
 
-        receiver_id = (
-            (
-                messages[0].receiver_id
-                if messages[0].sender_id == user_id
-                else messages[0].sender_id
-            )
-            if len(messages)
-            else None
-        )
-
-        # Notify receiver
-        if receiver_id and (receiver_id in self.active_connections):
-            await redis.publish(
-                f"to_user:{receiver_id}",
-                json.dumps(
-                    {
+        # Notify the other participant once for the whole chat
+        if seen:
+            await notify(
+                redis,
+                {
+                    seen[0].sender_id: {
                         "eventType": "CHAT_MESSAGES_READ",
                         "chatListId": chat_list_id,
+                        "messageIds": [row.id for row in seen],
                     }
-                ),
+                }
             )
 
         return {"message": "Messages marked as read"}
@@ -313,7 +489,7 @@ class ChatService:
         self, target_user_id: str, redis: Redis, db: AsyncSession
     ):
         """Check if user is online. If not, send their last seen time."""
-        is_online = target_user_id in self.active_connections
+        is_online = await presence.is_online(target_user_id)
         if not is_online:
             last_seen = await redis.get(f"user:{target_user_id}:last_seen")
             if not last_seen:
@@ -337,55 +513,107 @@ class ChatService:
     async def get_user_chat_list(
         self, user_id: str, last_message_time: str | None, db: AsyncSession
     ):
-        """Get all chat lists for a user."""
+        """Get a page of chats with receiver, last message and unread count, in one query."""
         limit = 20
         last_message_date = (
             datetime.fromisoformat(last_message_time)
             if last_message_time
             else datetime.now(timezone.utc)
         )
-        chat_lists = await db.execute(
-            select(ChatList)
+        # Pick the page of chats first so the lateral/count only run for those rows
+        page = (
+            select(
+                ChatList.id,
+                ChatList.last_message_time,
+                case(
+                    (ChatList.user1_id == user_id, ChatList.user2_id),
+                    else_=ChatList.user1_id,
+                ).label("receiver_id"),
+            )
             .where(
                 ((ChatList.user1_id == user_id) | (ChatList.user2_id == user_id))
                 & (ChatList.last_message_time < last_message_date)
             )
             .order_by(ChatList.last_message_time.desc())
             .limit(limit)
+            .subquery("page")
         )
-        chat_lists = chat_lists.scalars().all()
-
-        formatted_chat_lists = []
-        for chat_list in chat_lists:
-            receiver_id = (
-                chat_list.user1_id
-                if chat_list.user2_id == user_id
-                else chat_list.user2_id
+        last_message = (
+            select(
+                ChatMessage.id,
+                ChatMessage.message,
+                ChatMessage.status,
+                ChatMessage.sender_id,
+                ChatMessage.created_at,
+            )
+            .where(ChatMessage.chat_list_id == page.c.id)
+            .order_by(ChatMessage.created_at.desc())
+            .limit(1)
+            .lateral("last_message")
+        )
+        unread_count = (
+            select(func.count())
+            .where(
+                ChatMessage.chat_list_id == page.c.id,
+                ChatMessage.receiver_id == user_id,
+                ChatMessage.status != MessageStatus.SEEN,
             )
+            .scalar_subquery()
+        )
+        rows = await db.execute(
+            select(
+                page.c.id.label("chat_list_id"),
+                page.c.last_message_time,
+                page.c.receiver_id,
+                User.username,
+                User.profile_image,
+                last_message.c.id.label("message_id"),
+                last_message.c.message,
+                last_message.c.status,
+                last_message.c.sender_id,
+                last_message.c.created_at,
+                unread_count.label("unread_count"),
+            )
+            .select_from(page)
+            .join(User, User.id == page.c.receiver_id)
+            .outerjoin(last_message, true())
+            .order_by(page.c.last_message_time.desc())
+        )
 
-            receiver = await db.get(User, receiver_id)
-            if not receiver:
-                continue
+        formatted_chat_lists = []
+        for row in rows:
             formatted_chat_list = {
-                "chatListId": chat_list.id,
-                "lastMessageTime": chat_list.last_message_time.isoformat(),
+                "chatListId": row.chat_list_id,
+                "lastMessageTime": row.last_message_time.isoformat(),
                 "receiver": {
-                    "id": receiver.id,
-                    "username": receiver.username,
-                    "profileImage": receiver.profile_image,
+                    "id": row.receiver_id,
+                    "username": row.username,
+                    "profileImage": row.profile_image,
                 },
+                "lastMessage": (
+                    {
+                        "id": row.message_id,
+                        "message": row.message,
+                        "status": row.status.value,
+                        "createdAt": row.created_at.isoformat(),
+                        "isSent": row.sender_id == user_id,
+                    }
+                    if row.message_id
+                    else None
+                ),
+                "unreadCount": row.unread_count,
             }
             formatted_chat_lists.append(formatted_chat_list)
         return formatted_chat_lists
 
     async def get_user_name(self, user_id: str, db: AsyncSession):
         """Get the username of a user."""
-        user = await db.get(User, user_id)
+        user = await get_profile(user_id, db)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return {
-            "username": user.username,
-            "profileImage": user.profile_image,
+            "username": user["username"],
+            "profileImage": user["profileImage"],
         }
 
     async def create_new_chat_message(
@@ -400,29 +628,28 @@ class ChatService:
         if not message_text:
             raise HTTPException(status_code=400, detail="Message text is required")
 
-        receiver = await db.execute(select(User).where(User.username == username))
-
-        receiver = receiver.scalar_one_or_none()
-        if not receiver:
+        receiver_id = await get_user_id_by_username(username, db)
+        if not receiver_id:
             raise HTTPException(status_code=404, detail="Receiver not found")
-        if receiver.id == user_id:
+        if receiver_id == user_id:
             raise HTTPException(
                 status_code=400, detail="Cannot send message to yourself"
             )
 
         chat_list = await db.execute(
             select(ChatList).where(
-                ((ChatList.user1_id == user_id) & (ChatList.user2_id == receiver.id))
-                | ((ChatList.user1_id == receiver.id) & (ChatList.user2_id == user_id))
+                ((ChatList.user1_id == user_id) & (ChatList.user2_id == receiver_id))
+                | ((ChatList.user1_id == receiver_id) & (ChatList.user2_id == user_id))
             )
         )
+        chat_list = chat_list.scalar_one_or_none()
         if chat_list:
             return {
-                "chatListId": chat_list.scalar_one().id,
+                "chatListId": chat_list.id,
                 "isChatListExists": True,
             }
 
-        return await self.send_message(user_id, receiver.id, message_text, db, redis)
+        return await self.send_message(user_id, receiver_id, message_text, db, redis)
 
 
 chat_service = ChatService()
@@ -0,0 +1,582 @@
+"""
+Chat message write path.
+
+A message is written in one transaction: the chat list row when the chat is
+new, the message itself, and the chat's `last_message_time`. A new chat list
+that collides with an existing one for the same users resolves to the stored
+row, and messages are `ON CONFLICT DO NOTHING`, so replaying a write is
+harmless. CHAT_WRITE_MODE
+picks how that transaction is issued:
+
+- `direct` (default): on the request's session, before anything is published.
+- `group`: handed to a per-worker GroupCommitter, which collects writes from
+  concurrent senders for up to CHAT_GROUP_COMMIT_WINDOW_MS (or
+  CHAT_GROUP_COMMIT_MAX_BATCH writes) and flushes them under one commit. If
+  the database rejects a batch, its writes are retried one transaction each;
+  any other failure (say the database is unreachable) is raised to every
+  sender in the batch.
+- `stream`: appended to the `chat:messages` Redis Stream and published right
+  away; a StreamConsumer in a consumer group persists entries in batches and
+  acknowledges them only after the commit (at-least-once). Entries left
+  pending by a dead worker are taken over with XAUTOCLAIM, and entries the
+  database rejects outright go to `chat:messages:dead`. Reads (history, chat
+  list) can trail the live events by one batch in this mode.
+
+  A queued message is known to the read endpoints through a short-lived
+  `chat:pending_message:<id>` key, and reads that reach queued messages are
+  kept in `chat:pending_read:<chat>:<user>` until the rows land. The
+  consumer sets each message's status when it persists it, from the
+  receiver's presence and read position at that moment, and checks both
+  again after the commit so a connect or read racing the batch is not lost.
+"""
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from sqlalchemy import bindparam, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.db import AsyncSessionLocal
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+from app.models.chat import ChatList, ChatMessage, ChatReadWatermark, MessageStatus, generate_uuid
+from .presence import presence
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+CHAT_WRITE_MODE = os.getenv("CHAT_WRITE_MODE", "direct")
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("CHAT_GROUP_COMMIT_WINDOW_MS", "5"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("CHAT_GROUP_COMMIT_MAX_BATCH", "256"))
+STREAM_BATCH_SIZE = int(os.getenv("CHAT_STREAM_BATCH_SIZE", "500"))
+STREAM_BLOCK_MS = int(os.getenv("CHAT_STREAM_BLOCK_MS", "50"))
+STREAM_CLAIM_IDLE_MS = int(os.getenv("CHAT_STREAM_CLAIM_IDLE_MS", "30000"))
+STREAM_MAX_BACKOFF_SECONDS = 30
+LATENCY_SAMPLES = 4096
+
+MESSAGE_STREAM = "chat:messages"
+DEAD_LETTER_STREAM = "chat:messages:dead"
+PERSIST_GROUP = "chat-persisters"
+# Chats, messages and reads in stream mode that may not be persisted yet
+PENDING_CHAT_TTL_SECONDS = 3600
+PENDING_MESSAGE_KEY = "chat:pending_message:{}"
+PENDING_READ_KEY = "chat:pending_read:{}:{}"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_STATUS_RANK = {MessageStatus.SENT: 0, MessageStatus.DELIVERED: 1, MessageStatus.SEEN: 2}
+
+# Keep the later read position in hash KEYS[1]; ARGV: microseconds, message id, ttl
+_ADVANCE_READ = """
+local current = redis.call('HGET', KEYS[1], 'at')
+if current and tonumber(current) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'at', ARGV[1], 'message_id', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# (new chat list row or None, message row)
+MessageWrite = Tuple[Optional[Dict[str, Any]], Dict[str, Any]]
+
+
+async def _insert_chat_lists(session: AsyncSession, writes: List[MessageWrite]) -> Dict[str, str]:
+    """Insert the new chat lists in `writes`; maps each one's id to the id actually stored.
+
+    Two senders can each create the chat for the same pair of users. The
+    loser's id is resolved to the existing row through `unique_chat`, so its
+    messages land in that chat instead of failing the foreign key.
+    """
+    chat_lists: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for chat_list, _ in writes:
+        if chat_list is not None:
+            pair = (chat_list["user1_id"], chat_list["user2_id"])
+            # A pending chat can arrive with several of its messages; insert it once
+            chat_lists.setdefault(pair, chat_list)
+    if not chat_lists:
+        return {}
+    table = ChatList.__table__
+    stmt = insert(table).values([chat_lists[pair] for pair in sorted(chat_lists)])
+    # DO UPDATE rather than DO NOTHING so RETURNING includes the existing rows
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user1_id", "user2_id"],
+        set_={"last_message_time": func.greatest(table.c.last_message_time, stmt.excluded.last_message_time)},
+    ).returning(table.c.id, table.c.user1_id, table.c.user2_id)
+    stored = {(row.user1_id, row.user2_id): row.id for row in await session.execute(stmt)}
+    return {
+        chat_list["id"]: stored[(chat_list["user1_id"], chat_list["user2_id"])]
+        for chat_list, _ in writes
+        if chat_list is not None
+    }
+
+
+async def write_messages(session: AsyncSession, writes: List[MessageWrite]):
+    """Issue the statements for `writes`; the caller commits."""
+    chat_list_ids = await _insert_chat_lists(session, writes)
+    messages = [
+        {**message, "chat_list_id": chat_list_ids.get(message["chat_list_id"], message["chat_list_id"])}
+        for _, message in writes
+    ]
+    latest: Dict[str, datetime] = {}
+    for message in messages:
+        chat_list_id = message["chat_list_id"]
+        latest[chat_list_id] = max(latest.get(chat_list_id, message["created_at"]), message["created_at"])
+    await session.execute(insert(ChatMessage.__table__).on_conflict_do_nothing(), messages)
+
+    table = ChatList.__table__
+    # Sorted so concurrent batches lock chat rows in the same order
+    await session.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(last_message_time=func.greatest(table.c.last_message_time, bindparam("b_time"))),
+        [{"b_id": chat_list_id, "b_time": latest[chat_list_id]} for chat_list_id in sorted(latest)],
+    )
+
+
+def _micros(moment: datetime) -> int:
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+async def _record_reads(session: AsyncSession, reads: Dict[Tuple[str, str], Dict[str, str]]):
+    """Move the stored watermarks up to pending reads whose message is now persisted."""
+    watermark = ChatReadWatermark.__table__
+    for (_, user_id), read in sorted(reads.items()):
+        if not read.get("message_id"):
+            continue
+        stmt = insert(watermark).from_select(
+            ["chat_list_id", "user_id", "last_read_at", "message_id"],
+            select(
+                ChatMessage.chat_list_id, literal(user_id), ChatMessage.created_at, ChatMessage.id
+            ).where(ChatMessage.id == read["message_id"]),
+        )
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[watermark.c.chat_list_id, watermark.c.user_id],
+                set_={
+                    "last_read_at": stmt.excluded.last_read_at,
+                    "message_id": stmt.excluded.message_id,
+                },
+                where=watermark.c.last_read_at < stmt.excluded.last_read_at,
+            )
+        )
+
+
+async def _mark_seen_by_watermark(session: AsyncSession, message_ids: List[str]):
+    """Mark the given messages seen where they are at or behind the receiver's watermark."""
+    watermark = ChatReadWatermark.__table__
+    await session.execute(
+        update(ChatMessage)
+        .where(
+            ChatMessage.id.in_(message_ids),
+            ChatMessage.status != MessageStatus.SEEN,
+            watermark.c.chat_list_id == ChatMessage.chat_list_id,
+            watermark.c.user_id == ChatMessage.receiver_id,
+            ChatMessage.created_at <= watermark.c.last_read_at,
+        )
+        .values(status=MessageStatus.SEEN)
+        .execution_options(synchronize_session=False)
+    )
+
+
+class GroupCommitter:
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        window_ms: float = GROUP_COMMIT_WINDOW_MS,
+        max_batch: int = GROUP_COMMIT_MAX_BATCH,
+    ):
+        self.session_factory = session_factory
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self.counters = {"messages": 0, "batches": 0, "failed": 0, "fallbacks": 0}
+        self.started_at = time.perf_counter()
+
+    async def submit(self, write: MessageWrite):
+        """Queue one write and wait until its batch is committed."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((write, future, time.perf_counter()))
+        await future
+
+    async def run(self):
+        """Collect and flush batches; run as a background task."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        try:
+            async with self.session_factory() as session:
+                await write_messages(session, [write for write, _, _ in batch])
+                await session.commit()
+        except SQLAlchemyError as e:
+            logger.warning(f"Group commit of {len(batch)} messages failed, retrying singly: {e}")
+            self.counters["fallbacks"] += 1
+            for item in batch:
+                await self._flush_one(item)
+        except Exception as e:
+            # Not the data (say the database is unreachable): retrying singly would not help
+            logger.error(f"Group commit of {len(batch)} messages failed: {e}")
+            for item in batch:
+                self._fail(item, e)
+        else:
+            for item in batch:
+                self._resolve(item)
+        self.counters["batches"] += 1
+
+    async def _flush_one(self, item):
+        write, _, _ = item
+        try:
+            async with self.session_factory() as session:
+                await write_messages(session, [write])
+                await session.commit()
+        except Exception as e:
+            self._fail(item, e)
+            return
+        self._resolve(item)
+
+    def _fail(self, item, error: Exception):
+        _, future, _ = item
+        self.counters["failed"] += 1
+        if not future.done():
+            future.set_exception(error)
+
+    def _resolve(self, item):
+        _, future, submitted_at = item
+        self.counters["messages"] += 1
+        self.latencies.append((time.perf_counter() - submitted_at) * 1000)
+        if not future.done():
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(pct: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * pct))] if latencies else 0.0
+
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "mode": CHAT_WRITE_MODE,
+            "avg_batch_size": self.counters["messages"] / batches if batches else 0.0,
+            "messages_per_second": self.counters["messages"] / (time.perf_counter() - self.started_at),
+            "commit_latency_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": latencies[-1] if latencies else 0.0,
+            },
+        }
+
+
+def _encode(write: MessageWrite) -> Dict[str, str]:
+    chat_list, message = write
+    return {
+        "chat_list": json.dumps({**chat_list, "last_message_time": chat_list["last_message_time"].isoformat()}) if chat_list else "",
+        "message": json.dumps({**message, "status": message["status"].value, "created_at": message["created_at"].isoformat()}),
+    }
+
+
+def _decode(fields: Dict[str, str]) -> MessageWrite:
+    chat_list = json.loads(fields["chat_list"]) if fields.get("chat_list") else None
+    if chat_list:
+        chat_list["last_message_time"] = datetime.fromisoformat(chat_list["last_message_time"])
+    message = json.loads(fields["message"])
+    message["status"] = MessageStatus(message["status"])
+    message["created_at"] = datetime.fromisoformat(message["created_at"])
+    return chat_list, message
+
+
+class StreamConsumer:
+    def __init__(
+        self,
+        redis: Redis,
+        session_factory=AsyncSessionLocal,
+        batch_size: int = STREAM_BATCH_SIZE,
+        block_ms: int = STREAM_BLOCK_MS,
+        claim_idle_ms: int = STREAM_CLAIM_IDLE_MS,
+    ):
+        self.redis = redis
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}-{generate_uuid()[:8]}"
+        self.counters = {
+            "appended": 0,
+            "persisted": 0,
+            "batches": 0,
+            "claimed": 0,
+            "dead_lettered": 0,
+            "retries": 0,
+        }
+        self._group_ready = False
+
+    async def append(self, write: MessageWrite):
+        _, message = write
+        pending = {
+            "chat_list_id": message["chat_list_id"],
+            "sender_id": message["sender_id"],
+            "receiver_id": message["receiver_id"],
+            "created_at": message["created_at"].isoformat(),
+        }
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xadd(MESSAGE_STREAM, _encode(write))
+            pipe.set(PENDING_MESSAGE_KEY.format(message["id"]), json.dumps(pending), ex=PENDING_CHAT_TTL_SECONDS)
+            await pipe.execute()
+        self.counters["appended"] += 1
+
+    async def run(self):
+        """Persist stream entries in batches; run as a background task."""
+        loop = asyncio.get_running_loop()
+        next_claim = 0.0
+        failures = 0
+        while True:
+            try:
+                await self._ensure_group()
+                if loop.time() >= next_claim:
+                    # Entries another consumer read but never acknowledged
+                    claimed = await self.redis.xautoclaim(
+                        MESSAGE_STREAM, PERSIST_GROUP, self.consumer,
+                        min_idle_time=self.claim_idle_ms, start_id="0-0", count=self.batch_size,
+                    )
+                    entries = claimed[1]
+                    self.counters["claimed"] += len(entries)
+                    if len(entries) < self.batch_size:
+                        next_claim = loop.time() + self.claim_idle_ms / 1000
+                    if entries:
+                        await self._persist(entries)
+                        continue
+                response = await self.redis.xreadgroup(
+                    PERSIST_GROUP, self.consumer, {MESSAGE_STREAM: ">"},
+                    count=self.batch_size, block=self.block_ms,
+                )
+                for _, entries in response or []:
+                    await self._persist(entries)
+                failures = 0
+            except RedisError as e:
+                logger.warning(f"Chat message stream unavailable: {e}")
+                # The group is gone too if Redis lost the stream
+                self._group_ready = False
+                failures += 1
+                await asyncio.sleep(min(2 ** (failures - 1), STREAM_MAX_BACKOFF_SECONDS))
+            except Exception as e:
+                # Say the database is unreachable. The batch stays pending and
+                # XAUTOCLAIM hands it out again once it has been idle long enough
+                logger.exception(f"Persisting chat messages from the stream failed: {e}")
+                failures += 1
+                await asyncio.sleep(min(2 ** (failures - 1), STREAM_MAX_BACKOFF_SECONDS))
+
+    async def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            await self.redis.xgroup_create(MESSAGE_STREAM, PERSIST_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def _current_status(self, messages: List[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, str]]:
+        """Raise each message's status to what it is now; returns the pending reads used.
+
+        Delivered if the receiver is online, seen if it is at or behind a
+        pending read of theirs. Statuses only move forward.
+        """
+        online = await presence.online(message["receiver_id"] for message in messages)
+        pairs = sorted({(message["chat_list_id"], message["receiver_id"]) for message in messages})
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for pair in pairs:
+                pipe.hgetall(PENDING_READ_KEY.format(*pair))
+            found = await pipe.execute()
+        reads = {pair: read for pair, read in zip(pairs, found) if read}
+        for message in messages:
+            status = message["status"]
+            read = reads.get((message["chat_list_id"], message["receiver_id"]))
+            if read and _micros(message["created_at"]) <= int(read["at"]):
+                status = MessageStatus.SEEN
+            elif message["receiver_id"] in online and status == MessageStatus.SENT:
+                status = MessageStatus.DELIVERED
+            if _STATUS_RANK[status] > _STATUS_RANK[message["status"]]:
+                message["status"] = status
+        return reads
+
+    async def _write(self, writes: List[MessageWrite], reads: Dict[Tuple[str, str], Dict[str, str]]):
+        async with self.session_factory() as session:
+            await write_messages(session, writes)
+            await _record_reads(session, reads)
+            await _mark_seen_by_watermark(session, [message["id"] for _, message in writes])
+            await session.commit()
+
+    async def _settle(self, messages: List[Dict[str, Any]], reads: Dict[Tuple[str, str], Dict[str, str]]):
+        """Apply connects and reads that happened while the batch was being written.
+
+        Best effort: the batch is already committed, so a failure here is
+        logged and the entries are still acknowledged.
+        """
+        before = {message["id"]: message["status"] for message in messages}
+        try:
+            current = await self._current_status(messages)
+            changed = [message for message in messages if message["status"] != before[message["id"]]]
+            new_reads = {pair: read for pair, read in current.items() if reads.get(pair) != read}
+            if not changed and not new_reads:
+                return
+            async with self.session_factory() as session:
+                for status, earlier in (
+                    (MessageStatus.DELIVERED, [MessageStatus.SENT]),
+                    (MessageStatus.SEEN, [MessageStatus.SENT, MessageStatus.DELIVERED]),
+                ):
+                    ids = [message["id"] for message in changed if message["status"] == status]
+                    if ids:
+                        await session.execute(
+                            update(ChatMessage)
+                            .where(ChatMessage.id.in_(ids), ChatMessage.status.in_(earlier))
+                            .values(status=status)
+                            .execution_options(synchronize_session=False)
+                        )
+                await _record_reads(session, new_reads)
+                await _mark_seen_by_watermark(session, list(before))
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Updating the status of {len(messages)} persisted chat messages failed: {e}")
+
+    async def _persist(self, entries):
+        # Deleted entries come back from XAUTOCLAIM without fields
+        writes = [(entry_id, _decode(fields)) for entry_id, fields in entries if fields]
+        done = [entry_id for entry_id, fields in entries if not fields]
+        messages = [message for _, (_, message) in writes]
+        reads = await self._current_status(messages) if writes else {}
+        try:
+            await self._write([write for _, write in writes], reads)
+            done.extend(entry_id for entry_id, _ in writes)
+            self.counters["persisted"] += len(writes)
+        except SQLAlchemyError as e:
+            logger.warning(f"Persisting {len(writes)} chat messages failed, retrying singly: {e}")
+            self.counters["retries"] += 1
+            for entry_id, write in writes:
+                if await self._persist_one(entry_id, write, reads):
+                    done.append(entry_id)
+        self.counters["batches"] += 1
+        if writes:
+            await self._settle(messages, reads)
+        if done:
+            finished = set(done)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.xack(MESSAGE_STREAM, PERSIST_GROUP, *done)
+                pipe.xdel(MESSAGE_STREAM, *done)
+                for entry_id, (_, message) in writes:
+                    if entry_id in finished:
+                        pipe.delete(PENDING_MESSAGE_KEY.format(message["id"]))
+                await pipe.execute()
+
+    async def _persist_one(
+        self, entry_id: str, write: MessageWrite, reads: Dict[Tuple[str, str], Dict[str, str]]
+    ) -> bool:
+        """Whether the entry is finished with (persisted or dead-lettered)."""
+        try:
+            await self._write([write], reads)
+        except (IntegrityError, DataError) as e:
+            # The database will never accept this entry; park it instead of retrying forever
+            logger.error(f"Dead-lettering chat message {entry_id}: {e}")
+            await self.redis.xadd(DEAD_LETTER_STREAM, {**_encode(write), "error": str(e)[:500]})
+            self.counters["dead_lettered"] += 1
+            return True
+        except Exception as e:
+            # Left pending; XAUTOCLAIM retries it once it has been idle long enough
+            logger.warning(f"Chat message {entry_id} not persisted, will retry: {e}")
+            return False
+        self.counters["persisted"] += 1
+        return True
+
+    async def stats(self) -> Dict[str, Any]:
+        try:
+            pending = (await self.redis.xpending(MESSAGE_STREAM, PERSIST_GROUP))["pending"]
+            backlog = await self.redis.xlen(MESSAGE_STREAM)
+        except (RedisError, TypeError):
+            pending = backlog = None
+        return {**self.counters, "mode": CHAT_WRITE_MODE, "pending": pending, "backlog": backlog}
+
+
+group_committer = GroupCommitter()
+stream_consumer = StreamConsumer(redis_client)
+
+
+async def new_chat_list_id(redis: Redis, user1_id: str, user2_id: str) -> Tuple[str, bool]:
+    """Id for a chat not found in the database, and whether it is already pending.
+
+    In stream mode a new chat is only persisted with its first batch, so the
+    next message in the same chat must reuse the id handed out before.
+    """
+    chat_list_id = generate_uuid()
+    if CHAT_WRITE_MODE != "stream":
+        return chat_list_id, False
+    key = f"chat:pending_list:{':'.join(sorted((user1_id, user2_id)))}"
+    if await redis.set(key, chat_list_id, nx=True, ex=PENDING_CHAT_TTL_SECONDS):
+        return chat_list_id, False
+    return await redis.get(key) or chat_list_id, True
+
+
+async def pending_message(redis: Redis, message_id: str) -> Optional[Dict[str, Any]]:
+    """Chat, sender, receiver and creation time of a message still queued in the stream."""
+    if CHAT_WRITE_MODE != "stream":
+        return None
+    pending = await redis.get(PENDING_MESSAGE_KEY.format(message_id))
+    if not pending:
+        return None
+    pending = json.loads(pending)
+    pending["created_at"] = datetime.fromisoformat(pending["created_at"])
+    return pending
+
+
+async def record_pending_read(
+    redis: Redis, chat_list_id: str, user_id: str, read_at: datetime, message_id: Optional[str] = None
+):
+    """Remember that `user_id` read the chat up to `read_at`, for messages still queued.
+
+    The stream consumer marks queued messages at or before it seen when it
+    persists them, and moves the stored watermark to `message_id` once that
+    message is written. No-op outside stream mode.
+    """
+    if CHAT_WRITE_MODE != "stream":
+        return
+    await redis.eval(
+        _ADVANCE_READ,
+        1,
+        PENDING_READ_KEY.format(chat_list_id, user_id),
+        _micros(read_at),
+        message_id or "",
+        PENDING_CHAT_TTL_SECONDS,
+    )
+
+
+async def write_message(db: AsyncSession, chat_list: Optional[Dict[str, Any]], message: Dict[str, Any]):
+    """Persist one message (and its new chat list) in a single transaction."""
+    if CHAT_WRITE_MODE == "stream":
+        # Persisted later by the stream consumer; the caller publishes immediately
+        await db.rollback()
+        await stream_consumer.append((chat_list, message))
+        return
+    if CHAT_WRITE_MODE == "group":
+        # End the read-only transaction so the connection is free while the batch forms
+        await db.rollback()
+        await group_committer.submit((chat_list, message))
+        return
+    await write_messages(db, [(chat_list, message)])
+    await db.commit()
@@ -0,0 +1,126 @@
+"""
+Shared outbound clients.
+
+One sync and one async Supabase client for the whole process, with their
+PostgREST sessions swapped for pooled keep-alive httpx clients (HTTP/2 when
+`h2` is installed), and one pooled `requests` session for third-party APIs.
+The async client and the HTTP session are opened in the FastAPI lifespan and
+closed on shutdown; the sync client is built at import because module-level
+code and the batch jobs use it outside the app. Pool sizes and timeouts come
+from the environment.
+"""
+import asyncio
+import os
+import httpx
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from supabase import acreate_client, create_client, AsyncClient, Client
+from urllib3.util.retry import Retry
+
+load_dotenv()
+url: str = os.getenv("SUPABASE_URL")
+key: str = os.getenv("SUPABASE_KEY")
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = os.getenv("HTTP2", "true").lower() == "true"
+except ImportError:
+    HTTP2 = False
+
+_limits = httpx.Limits(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+)
+_timeout = httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def _pooled(session, client_class):
+    # Keep the base URL and auth headers supabase set up, change only the pooling
+    return client_class(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=_timeout,
+        limits=_limits,
+        http2=HTTP2,
+        follow_redirects=True,
+    )
+
+
+def _create_supabase() -> Client:
+    client = create_client(url, key)
+    postgrest = client.postgrest
+    postgrest.session.close()
+    postgrest.session = _pooled(postgrest.session, httpx.Client)
+    return client
+
+
+async def _create_async_supabase() -> AsyncClient:
+    client = await acreate_client(url, key)
+    postgrest = client.postgrest
+    await postgrest.session.aclose()
+    postgrest.session = _pooled(postgrest.session, httpx.AsyncClient)
+    return client
+
+
+def _create_http_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST"],
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_MAX_KEEPALIVE, pool_maxsize=HTTP_MAX_CONNECTIONS, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+supabase: Client = _create_supabase()
+async_supabase: AsyncClient | None = None
+http_session: requests.Session | None = None
+_client_lock = asyncio.Lock()
+
+
+async def init_clients():
+    global async_supabase, http_session
+    async with _client_lock:
+        if async_supabase is None:
+            async_supabase = await _create_async_supabase()
+    if http_session is None:
+        http_session = _create_http_session()
+
+
+async def close_clients():
+    global async_supabase, http_session
+    if async_supabase is not None:
+        await async_supabase.postgrest.session.aclose()
+        async_supabase = None
+    if http_session is not None:
+        http_session.close()
+        http_session = None
+
+
+async def get_supabase() -> AsyncClient:
+    """The shared async Supabase client; opened on first use outside the app lifespan."""
+    if async_supabase is None:
+        await init_clients()
+    return async_supabase
+
+
+def get_http_session() -> requests.Session:
+    global http_session
+    if http_session is None:
+        http_session = _create_http_session()
+    return http_session
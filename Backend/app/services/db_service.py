@@ -1,85 +1,140 @@
-from supabase import create_client, Client
 import os
-from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from .matching_engine import MatchingEngine, DEFAULT_WEIGHTS, latest_audiences
+from .clients import supabase
+from app.models.models import Sponsorship, public_columns
 
-# Load environment variables
-load_dotenv()
-url: str = os.getenv("SUPABASE_URL")
-key: str = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+# Explicit list so the generated search_vector column is not fetched
+SPONSORSHIP_COLUMNS = ",".join(public_columns(Sponsorship))
+
+
+def fetch_all(
+    table: str,
+    columns: str = "*",
+    filters: Dict[str, Any] | None = None,
+    order: str = "id",
+    page_size: int = 1000,
+    since: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    # PostgREST caps a single response, so page through the table
+    rows = []
+    start = 0
+    while True:
+        query = supabase.table(table).select(columns)
+        for column, value in (filters or {}).items():
+            query = query.eq(column, value)
+        if since is not None:
+            query = query.gte("created_at", since)
+        resp = query.order(order).range(start, start + page_size - 1).execute()
+        rows.extend(resp.data)
+        if len(resp.data) < page_size:
+            return rows
+        start += page_size
+
+
+def fetch_by_ids(
+    table: str,
+    ids: List[str],
+    column: str = "id",
+    chunk_size: int = 200,
+    columns: str = "*",
+) -> List[Dict[str, Any]]:
+    # Chunk the id list so the `in` filter stays within URL length limits
+    rows = []
+    for start in range(0, len(ids), chunk_size):
+        resp = (
+            supabase.table(table)
+            .select(columns)
+            .in_(column, ids[start : start + chunk_size])
+            .execute()
+        )
+        rows.extend(resp.data)
+    return rows
+
+
+# Creator and sponsorship arrays shared by every request in this worker
+matching_engine = MatchingEngine(
+    load_creators=lambda: fetch_all("audience_insights"),
+    load_sponsorships=lambda: fetch_all("sponsorships", columns=SPONSORSHIP_COLUMNS),
+    ttl_seconds=float(os.getenv("MATCH_ENGINE_TTL_SECONDS", "300")),
+    load_creators_since=lambda since: fetch_all("audience_insights", since=since),
+    load_sponsorships_since=lambda since: fetch_all(
+        "sponsorships", columns=SPONSORSHIP_COLUMNS, since=since
+    ),
+)
+
+
+def current_audience(creator_id: str) -> Optional[Dict[str, Any]]:
+    """The creator's current audience_insights row: the latest by created_at, then id."""
+    audience_resp = (
+        supabase.table("audience_insights")
+        .select("*")
+        .eq("user_id", creator_id)
+        .order("created_at", desc=True, nullsfirst=False)
+        .order("id", desc=True)
+        .limit(1)
+        .execute()
+    )
+    return audience_resp.data[0] if audience_resp.data else None
 
 
 def match_creators_for_brand(sponsorship_id: str) -> List[Dict[str, Any]]:
     # Fetch sponsorship details
-    sponsorship_resp = supabase.table("sponsorships").select("*").eq("id", sponsorship_id).execute()
+    sponsorship_resp = supabase.table("sponsorships").select(SPONSORSHIP_COLUMNS).eq("id", sponsorship_id).execute()
     if not sponsorship_resp.data:
         return []
     sponsorship = sponsorship_resp.data[0]
 
-    # Fetch all audience insights (for creators)
-    audience_resp = supabase.table("audience_insights").select("*").execute()
-    creators = []
-    for audience in audience_resp.data:
-        # Basic matching logic: audience, engagement, price, etc.
-        match_score = 0
-        # Audience age group overlap
-        if 'required_audience' in sponsorship and 'audience_age_group' in audience:
-            required_ages = sponsorship['required_audience'].get('age_group', [])
-            creator_ages = audience.get('audience_age_group', {})
-            overlap = sum([creator_ages.get(age, 0) for age in required_ages])
-            if overlap > 0:
-                match_score += 1
-        # Audience location overlap
-        if 'required_audience' in sponsorship and 'audience_location' in audience:
-            required_locs = sponsorship['required_audience'].get('location', [])
-            creator_locs = audience.get('audience_location', {})
-            overlap = sum([creator_locs.get(loc, 0) for loc in required_locs])
-            if overlap > 0:
-                match_score += 1
-        # Engagement rate
-        if audience.get('engagement_rate', 0) >= sponsorship.get('engagement_minimum', 0):
-            match_score += 1
-        # Price expectation
-        if audience.get('price_expectation', 0) <= sponsorship.get('budget', 0):
-            match_score += 1
-        if match_score >= 2:  # Threshold for a match
-            creators.append({"user_id": audience["user_id"], "match_score": match_score, **audience})
-    return creators
+    # Score every creator's audience insights in one vectorized pass
+    return matching_engine.match_creators(sponsorship)
 
 
 def match_brands_for_creator(creator_id: str) -> List[Dict[str, Any]]:
-    # Fetch creator's audience insights
-    audience_resp = supabase.table("audience_insights").select("*").eq("user_id", creator_id).execute()
-    if not audience_resp.data:
+    audience = current_audience(creator_id)
+    if audience is None:
         return []
-    audience = audience_resp.data[0]
-
-    # Fetch all sponsorships
-    sponsorships_resp = supabase.table("sponsorships").select("*").execute()
-    matches = []
-    for sponsorship in sponsorships_resp.data:
-        match_score = 0
-        # Audience age group overlap
-        if 'required_audience' in sponsorship and 'audience_age_group' in audience:
-            required_ages = sponsorship['required_audience'].get('age_group', [])
-            creator_ages = audience.get('audience_age_group', {})
-            overlap = sum([creator_ages.get(age, 0) for age in required_ages])
-            if overlap > 0:
-                match_score += 1
-        # Audience location overlap
-        if 'required_audience' in sponsorship and 'audience_location' in audience:
-            required_locs = sponsorship['required_audience'].get('location', [])
-            creator_locs = audience.get('audience_location', {})
-            overlap = sum([creator_locs.get(loc, 0) for loc in required_locs])
-            if overlap > 0:
-                match_score += 1
-        # Engagement rate
-        if audience.get('engagement_rate', 0) >= sponsorship.get('engagement_minimum', 0):
-            match_score += 1
-        # Price expectation
-        if audience.get('price_expectation', 0) <= sponsorship.get('budget', 0):
-            match_score += 1
-        if match_score >= 2:  # Threshold for a match
-            matches.append({"sponsorship_id": sponsorship["id"], "match_score": match_score, **sponsorship})
-    return matches
+
+    # Score every sponsorship in one vectorized pass
+    return matching_engine.match_sponsorships(audience)
+
+
+def match_creators_for_brands(sponsorship_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    # One fetch for all requested sponsorships, one scoring pass against the creators
+    sponsorships = fetch_by_ids("sponsorships", sponsorship_ids, columns=SPONSORSHIP_COLUMNS)
+    results = {sponsorship_id: [] for sponsorship_id in sponsorship_ids}
+    results.update(matching_engine.match_creators_many(sponsorships))
+    return results
+
+
+def match_brands_for_creators(creator_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    # Current audience_insights row per creator, as in match_brands_for_creator
+    audiences = latest_audiences(fetch_by_ids("audience_insights", creator_ids, column="user_id"))
+    results = {creator_id: [] for creator_id in creator_ids}
+    results.update(matching_engine.match_sponsorships_many(audiences))
+    return results
+
+
+def rank_creators_for_brand(
+    sponsorship_id: str,
+    limit: int,
+    weights: Dict[str, float] = DEFAULT_WEIGHTS,
+    after: Optional[Tuple[float, str]] = None,
+) -> Optional[List[Tuple[float, str, Dict[str, Any]]]]:
+    sponsorship_resp = supabase.table("sponsorships").select(SPONSORSHIP_COLUMNS).eq("id", sponsorship_id).execute()
+    if not sponsorship_resp.data:
+        return None
+    return matching_engine.rank_creators(
+        sponsorship_resp.data[0], limit, weights=weights, after=after
+    )
+
+
+def rank_brands_for_creator(
+    creator_id: str,
+    limit: int,
+    weights: Dict[str, float] = DEFAULT_WEIGHTS,
+    after: Optional[Tuple[float, str]] = None,
+) -> Optional[List[Tuple[float, str, Dict[str, Any]]]]:
+    audience = current_audience(creator_id)
+    if audience is None:
+        return None
+    return matching_engine.rank_sponsorships(audience, limit, weights=weights, after=after)
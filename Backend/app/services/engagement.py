@@ -0,0 +1,216 @@
+"""
+Engagement rollups.
+
+`engagement_rollups` keeps running totals of the likes / comments / shares in
+`user_posts.engagement_metrics` per creator and per category, and
+`engagement_daily` the same counters per day for recent-window stats. New
+posts are folded in with `INSERT ... ON CONFLICT DO UPDATE SET x = x + ...`,
+so a dashboard reads one row instead of parsing every post. Days are UTC
+calendar days. Daily rows older than DAILY_RETENTION_DAYS are only kept
+until the next `prune_daily` (run by `jobs.rebuild_engagement`).
+`rebuild_rollups` recomputes both tables from `user_posts` (backfill, or to
+repair drift after a failed incremental update).
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.db import AsyncSessionLocal
+from app.models.models import EngagementRollup, EngagementDaily
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("likes", "comments", "shares")
+COUNTERS = ("post_count", *METRICS)
+WINDOWS = (7, 30)
+# Never below the longest window get_rollup reads
+DAILY_RETENTION_DAYS = max(int(os.getenv("ENGAGEMENT_DAILY_RETENTION_DAYS", "90")), max(WINDOWS))
+# Rows per upsert statement: 7 bind parameters each, well under Postgres's 32767
+INCREMENT_CHUNK_SIZE = 1000
+
+
+def _metric(metrics: Any, name: str) -> int:
+    try:
+        return int((metrics or {}).get(name) or 0)
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+
+def _post_day(post: Dict[str, Any]) -> date:
+    created_at = post.get("created_at")
+    if isinstance(created_at, str):
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except ValueError:
+            created_at = None
+    if isinstance(created_at, datetime):
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc)
+        return created_at.date()
+    return datetime.now(timezone.utc).date()
+
+
+def _scopes(post: Dict[str, Any]) -> Iterable[Tuple[str, str]]:
+    yield "user", post["user_id"]
+    if post.get("category"):
+        yield "category", post["category"]
+
+
+def aggregate(posts: Iterable[Dict[str, Any]]):
+    """Sum a batch of post rows into rollup and daily deltas."""
+    totals: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    daily: Dict[Tuple[str, str, date], Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for post in posts:
+        delta = {"post_count": 1, **{name: _metric(post.get("engagement_metrics"), name) for name in METRICS}}
+        day = _post_day(post)
+        for scope, key in _scopes(post):
+            for counter, value in delta.items():
+                totals[(scope, key)][counter] += value
+                daily[(scope, key, day)][counter] += value
+    return totals, daily
+
+
+def _increment(model, index_elements: List[str], rows: List[Dict[str, Any]], extra: Dict[str, Any]):
+    """One upsert per INCREMENT_CHUNK_SIZE rows."""
+    for start in range(0, len(rows), INCREMENT_CHUNK_SIZE):
+        stmt = insert(model.__table__).values(rows[start : start + INCREMENT_CHUNK_SIZE])
+        yield stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={
+                **{counter: getattr(model.__table__.c, counter) + stmt.excluded[counter] for counter in COUNTERS},
+                **extra,
+            },
+        )
+
+
+async def record_posts(posts: List[Dict[str, Any]]):
+    """Fold newly created post rows into the rollups; failures are logged, not raised."""
+    if not posts:
+        return
+    totals, daily = aggregate(posts)
+    # Rows are sorted so concurrent batches lock conflicting keys in the same order
+    now = datetime.now(timezone.utc)
+    try:
+        async with AsyncSessionLocal() as session:
+            for stmt in _increment(
+                EngagementRollup,
+                ["scope", "key"],
+                [{"scope": scope, "key": key, "updated_at": now, **counts} for (scope, key), counts in sorted(totals.items())],
+                {"updated_at": now},
+            ):
+                await session.execute(stmt)
+            for stmt in _increment(
+                EngagementDaily,
+                ["scope", "key", "day"],
+                [{"scope": scope, "key": key, "day": day, **counts} for (scope, key, day), counts in sorted(daily.items())],
+                {},
+            ):
+                await session.execute(stmt)
+            await session.commit()
+    except SQLAlchemyError as e:
+        logger.error("Engagement rollup update failed for %d posts: %s", len(posts), e)
+
+
+def _summary(counts: Dict[str, int]) -> Dict[str, Any]:
+    posts = counts["post_count"]
+    return {
+        **counts,
+        **{f"avg_{name}": counts[name] / posts if posts else 0.0 for name in METRICS},
+    }
+
+
+async def get_rollup(db: AsyncSession, scope: str, key: str) -> Optional[Dict[str, Any]]:
+    rollup = await db.get(EngagementRollup, (scope, key))
+    if rollup is None:
+        return None
+
+    today = datetime.now(timezone.utc).date()
+    since = today - timedelta(days=max(WINDOWS) - 1)
+    result = await db.execute(
+        select(EngagementDaily).where(
+            EngagementDaily.scope == scope,
+            EngagementDaily.key == key,
+            EngagementDaily.day >= since,
+        )
+    )
+    buckets = result.scalars().all()
+    windows = {}
+    for days in WINDOWS:
+        start = today - timedelta(days=days - 1)
+        counts = dict.fromkeys(COUNTERS, 0)
+        for bucket in buckets:
+            if bucket.day >= start:
+                for counter in COUNTERS:
+                    counts[counter] += getattr(bucket, counter)
+        windows[f"last_{days}_days"] = _summary(counts)
+
+    return {
+        "scope": scope,
+        "key": key,
+        "totals": _summary({counter: getattr(rollup, counter) for counter in COUNTERS}),
+        "windows": windows,
+        "updated_at": rollup.updated_at,
+    }
+
+
+async def top_rollups(db: AsyncSession, scope: str, metric: str, limit: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        select(EngagementRollup)
+        .where(EngagementRollup.scope == scope)
+        .order_by(getattr(EngagementRollup, metric).desc(), EngagementRollup.key)
+        .limit(limit)
+    )
+    return [
+        {"key": rollup.key, **_summary({counter: getattr(rollup, counter) for counter in COUNTERS})}
+        for rollup in result.scalars()
+    ]
+
+
+def _metric_sql(name: str) -> str:
+    return (
+        f"COALESCE(SUM(CASE WHEN (engagement_metrics->>'{name}') ~ '^-?[0-9]+$' "
+        f"THEN (engagement_metrics->>'{name}')::bigint END), 0)"
+    )
+
+
+_SCOPE_COLUMNS = {"user": "user_id", "category": "category"}
+
+
+def _retention_start() -> date:
+    return datetime.now(timezone.utc).date() - timedelta(days=DAILY_RETENTION_DAYS - 1)
+
+
+async def prune_daily(db: AsyncSession) -> int:
+    """Delete daily rows older than the retention period; returns the rows deleted."""
+    result = await db.execute(delete(EngagementDaily).where(EngagementDaily.day < _retention_start()))
+    await db.commit()
+    return result.rowcount
+
+
+async def rebuild_rollups(db: AsyncSession):
+    """Recompute both rollup tables from user_posts in the database."""
+    # Same UTC day as _post_day, whatever the session time zone
+    day = "(COALESCE(created_at, now()) AT TIME ZONE 'UTC')::date"
+    sums = ", ".join(_metric_sql(name) for name in METRICS)
+    columns = ", ".join(COUNTERS)
+    await db.execute(delete(EngagementRollup))
+    await db.execute(delete(EngagementDaily))
+    for scope, column in _SCOPE_COLUMNS.items():
+        await db.execute(text(f"""
+            INSERT INTO engagement_rollups (scope, key, {columns}, updated_at)
+            SELECT '{scope}', {column}, COUNT(*), {sums}, now()
+            FROM user_posts WHERE {column} IS NOT NULL
+            GROUP BY {column}
+        """))
+        await db.execute(text(f"""
+            INSERT INTO engagement_daily (scope, key, day, {columns})
+            SELECT '{scope}', {column}, {day}, COUNT(*), {sums}
+            FROM user_posts WHERE {column} IS NOT NULL AND {day} >= :since
+            GROUP BY {column}, {day}
+        """), {"since": _retention_start()})
+    await db.commit()
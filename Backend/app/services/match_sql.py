@@ -0,0 +1,176 @@
+"""
+SQL-side matching.
+
+Runs the four-criterion match rule inside Postgres over the JSON columns of
+`audience_insights` and `sponsorships`, so only matched rows leave the
+database. The WHERE clause mirrors the candidate pruning of the in-memory
+engine (age or location key overlap, or both numeric checks) so Postgres can
+answer it from the GIN / B-tree indexes in `MATCH_INDEXES`; the exact score
+is then computed for those candidates only.
+"""
+from typing import Any, Dict, List
+from sqlalchemy import Index, cast, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import AudienceInsights, Sponsorship, public_columns
+from .matching_engine import MATCH_THRESHOLD
+
+MATCH_INDEXES = [
+    Index(
+        "ix_audience_insights_age_group_gin",
+        cast(AudienceInsights.audience_age_group, JSONB),
+        postgresql_using="gin",
+    ),
+    Index(
+        "ix_audience_insights_location_gin",
+        cast(AudienceInsights.audience_location, JSONB),
+        postgresql_using="gin",
+    ),
+    Index("ix_audience_insights_engagement_rate", AudienceInsights.engagement_rate),
+    Index("ix_audience_insights_price_expectation", AudienceInsights.price_expectation),
+    Index(
+        "ix_sponsorships_required_age_group_gin",
+        cast(Sponsorship.required_audience, JSONB)["age_group"],
+        postgresql_using="gin",
+    ),
+    Index(
+        "ix_sponsorships_required_location_gin",
+        cast(Sponsorship.required_audience, JSONB)["location"],
+        postgresql_using="gin",
+    ),
+    Index("ix_sponsorships_engagement_minimum", Sponsorship.engagement_minimum),
+    Index("ix_sponsorships_budget", Sponsorship.budget),
+]
+
+
+def create_match_indexes(sync_conn):
+    """Create the matcher indexes; `create_all` skips indexes of existing tables."""
+    for index in MATCH_INDEXES:
+        index.create(sync_conn, checkfirst=True)
+
+
+def _columns(alias: str, model) -> str:
+    """Explicit select list, so internal columns (search vectors) stay in the database."""
+    return ", ".join(f"{alias}.{column}" for column in public_columns(model))
+
+
+def _json_array(expr: str) -> str:
+    return f"CASE WHEN jsonb_typeof({expr}) = 'array' THEN {expr} ELSE '[]'::jsonb END"
+
+
+def _json_object(expr: str) -> str:
+    return f"CASE WHEN jsonb_typeof({expr}) = 'object' THEN {expr} ELSE '{{}}'::jsonb END"
+
+
+def _overlap(distribution: str, required: str) -> str:
+    """SQL for `sum(distribution[key] for key in required) > 0`, as 0 or 1."""
+    return f"""
+        (COALESCE((
+            SELECT SUM(({distribution} -> k.key)::numeric)
+            FROM jsonb_array_elements_text({required}) AS k(key)
+            WHERE jsonb_typeof({distribution} -> k.key) = 'number'
+        ), 0) > 0)::int"""
+
+
+def _positive_keys(distribution: str) -> str:
+    return f"""
+        ARRAY(
+            SELECT d.key FROM jsonb_each({distribution}) AS d(key, value)
+            WHERE jsonb_typeof(d.value) = 'number' AND d.value::numeric > 0
+        )"""
+
+
+_REQUIRED_AGES = _json_array("CAST(required_audience AS JSONB) -> 'age_group'")
+_REQUIRED_LOCATIONS = _json_array("CAST(required_audience AS JSONB) -> 'location'")
+
+CREATORS_FOR_SPONSORSHIP = text(
+    f"""
+    WITH s AS (
+        SELECT
+            {_REQUIRED_AGES} AS ages,
+            {_REQUIRED_LOCATIONS} AS locations,
+            ARRAY(SELECT jsonb_array_elements_text({_REQUIRED_AGES})) AS age_keys,
+            ARRAY(SELECT jsonb_array_elements_text({_REQUIRED_LOCATIONS})) AS location_keys,
+            engagement_minimum,
+            budget
+        FROM sponsorships
+        WHERE id = :sponsorship_id
+    ),
+    scored AS (
+        SELECT
+            {_columns("a", AudienceInsights)},
+            {_overlap("CAST(a.audience_age_group AS JSONB)", "s.ages")}
+            + {_overlap("CAST(a.audience_location AS JSONB)", "s.locations")}
+            + COALESCE((a.engagement_rate >= s.engagement_minimum)::int, 0)
+            + COALESCE((a.price_expectation <= s.budget)::int, 0) AS match_score
+        FROM audience_insights a, s
+        WHERE CAST(a.audience_age_group AS JSONB) ?| s.age_keys
+            OR CAST(a.audience_location AS JSONB) ?| s.location_keys
+            OR (a.engagement_rate >= s.engagement_minimum
+                AND a.price_expectation <= s.budget)
+    )
+    SELECT * FROM scored WHERE match_score >= :threshold
+    """
+)
+
+SPONSORSHIPS_FOR_CREATOR = text(
+    f"""
+    WITH a AS (
+        SELECT
+            {_json_object("CAST(audience_age_group AS JSONB)")} AS ages,
+            {_json_object("CAST(audience_location AS JSONB)")} AS locations,
+            {_positive_keys(_json_object("CAST(audience_age_group AS JSONB)"))} AS age_keys,
+            {_positive_keys(_json_object("CAST(audience_location AS JSONB)"))} AS location_keys,
+            engagement_rate,
+            price_expectation
+        FROM audience_insights
+        WHERE user_id = :creator_id
+        ORDER BY created_at DESC NULLS LAST, id DESC
+        LIMIT 1
+    ),
+    scored AS (
+        SELECT
+            {_columns("s", Sponsorship)},
+            {_overlap("a.ages", "s_req.ages")}
+            + {_overlap("a.locations", "s_req.locations")}
+            + COALESCE((a.engagement_rate >= s.engagement_minimum)::int, 0)
+            + COALESCE((a.price_expectation <= s.budget)::int, 0) AS match_score
+        FROM sponsorships s
+        CROSS JOIN a
+        CROSS JOIN LATERAL (
+            SELECT
+                {_json_array("CAST(s.required_audience AS JSONB) -> 'age_group'")} AS ages,
+                {_json_array("CAST(s.required_audience AS JSONB) -> 'location'")} AS locations
+        ) AS s_req
+        WHERE (CAST(s.required_audience AS JSONB) -> 'age_group') ?| a.age_keys
+            OR (CAST(s.required_audience AS JSONB) -> 'location') ?| a.location_keys
+            OR (s.engagement_minimum <= a.engagement_rate
+                AND s.budget >= a.price_expectation)
+    )
+    SELECT * FROM scored WHERE match_score >= :threshold
+    """
+)
+
+
+async def match_creators_for_brand_sql(
+    sponsorship_id: str, db: AsyncSession, threshold: int = MATCH_THRESHOLD
+) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        CREATORS_FOR_SPONSORSHIP,
+        {"sponsorship_id": sponsorship_id, "threshold": threshold},
+    )
+    return [
+        {"user_id": row["user_id"], **row} for row in result.mappings().all()
+    ]
+
+
+async def match_brands_for_creator_sql(
+    creator_id: str, db: AsyncSession, threshold: int = MATCH_THRESHOLD
+) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        SPONSORSHIPS_FOR_CREATOR,
+        {"creator_id": creator_id, "threshold": threshold},
+    )
+    return [
+        {"sponsorship_id": row["id"], **row} for row in result.mappings().all()
+    ]
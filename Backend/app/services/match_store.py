@@ -0,0 +1,230 @@
+"""
+Materialized creator-sponsorship matches.
+
+`creator_sponsorship_matches` holds one row per (sponsorship_id, creator_id)
+pair that reaches the match threshold. Rows are refreshed incrementally when a
+sponsorship or an audience-insights row is written, so the match routes read
+an indexed table instead of rescoring everything on each request. A refresh
+first catches the engine up with rows other workers created, so no pair is
+missed until the next full recompute. The table is filled on first start-up
+by `jobs.recompute_matches.recompute_if_empty`.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from fastapi.concurrency import run_in_threadpool
+import os
+
+import numpy as np
+
+from .db_service import supabase, matching_engine, fetch_all, fetch_by_ids, SPONSORSHIP_COLUMNS
+from .matching_engine import MATCH_THRESHOLD, latest_audiences
+from .cache import TieredCache
+from .redis_client import redis_client
+
+MATCH_TABLE = "creator_sponsorship_matches"
+UPSERT_CHUNK_SIZE = 500
+
+# Lookup results per sponsorship ("creators:<id>") and per creator ("brands:<id>")
+match_cache = TieredCache(
+    "match",
+    redis_client,
+    maxsize=int(os.getenv("MATCH_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.getenv("MATCH_CACHE_TTL_SECONDS", "3600")),
+)
+
+
+PAIR_CHUNK_SIZE = 100  # pairs per `or` filter, bounded by URL length
+SCORE_BLOCK_SIZE = 64  # rows scored per matrix product, bounding the score array
+
+Pair = Tuple[str, str]  # sponsorship_id, creator_id
+
+
+def _upsert(rows: List[Dict[str, Any]]):
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        supabase.table(MATCH_TABLE).upsert(
+            rows[start : start + UPSERT_CHUNK_SIZE],
+            on_conflict="sponsorship_id,creator_id",
+        ).execute()
+
+
+def _delete(pairs: Set[Pair]):
+    pairs = sorted(pairs)
+    for start in range(0, len(pairs), PAIR_CHUNK_SIZE):
+        supabase.table(MATCH_TABLE).delete().or_(
+            ",".join(
+                f"and(sponsorship_id.eq.{sponsorship_id},creator_id.eq.{creator_id})"
+                for sponsorship_id, creator_id in pairs[start : start + PAIR_CHUNK_SIZE]
+            )
+        ).execute()
+
+
+def _existing_pairs(column: str, ids: List[str], page_size: int = 1000) -> Set[Pair]:
+    """Stored pairs whose `column` is one of `ids`, paged per chunk of ids."""
+    pairs = set()
+    for start in range(0, len(ids), PAIR_CHUNK_SIZE):
+        chunk = ids[start : start + PAIR_CHUNK_SIZE]
+        offset = 0
+        while True:
+            resp = (
+                supabase.table(MATCH_TABLE)
+                .select("sponsorship_id,creator_id")
+                .in_(column, chunk)
+                .order("sponsorship_id")
+                .order("creator_id")
+                .range(offset, offset + page_size - 1)
+                .execute()
+            )
+            pairs.update((row["sponsorship_id"], row["creator_id"]) for row in resp.data)
+            if len(resp.data) < page_size:
+                break
+            offset += page_size
+    return pairs
+
+
+def _apply(rows: Dict[Pair, Dict[str, Any]], existing: Set[Pair]) -> Set[Pair]:
+    """Write the scored pairs, delete the stored ones that no longer match, return both."""
+    stale = existing - rows.keys()
+    _upsert(list(rows.values()))
+    _delete(stale)
+    return set(rows) | stale
+
+
+def refresh_sponsorship_matches(sponsorships: List[Dict[str, Any]]) -> Set[Pair]:
+    """Apply written sponsorships to the engine and rescore them against all creators.
+
+    Returns the affected (sponsorship_id, creator_id) pairs. Blocking; call it
+    from a thread.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    # Runs in the threadpool: the engine lock can be held through a full reload
+    for sponsorship in sponsorships:
+        matching_engine.upsert_sponsorship(sponsorship)
+    matching_engine.catch_up()
+    rows: Dict[Pair, Dict[str, Any]] = {}
+    for start in range(0, len(sponsorships), SCORE_BLOCK_SIZE):
+        block = sponsorships[start : start + SCORE_BLOCK_SIZE]
+        records, scores = matching_engine.score_creators_many(block)
+        positions, columns = np.nonzero(scores >= MATCH_THRESHOLD)
+        for pos, col in zip(positions.tolist(), columns.tolist()):
+            pair = (block[col]["id"], records[pos]["user_id"])
+            rows[pair] = {
+                "sponsorship_id": pair[0],
+                "creator_id": pair[1],
+                "audience_id": records[pos]["id"],
+                "match_score": int(scores[pos, col]),
+                "updated_at": now,
+            }
+    ids = sorted({sponsorship["id"] for sponsorship in sponsorships})
+    return _apply(rows, _existing_pairs("sponsorship_id", ids))
+
+
+def refresh_creator_matches(audiences: List[Dict[str, Any]]) -> Set[Pair]:
+    """Apply written audience rows to the engine and rescore them against all sponsorships.
+
+    Returns the affected (sponsorship_id, creator_id) pairs. Blocking; call it
+    from a thread.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    # Runs in the threadpool: the engine lock can be held through a full reload
+    for audience in audiences:
+        matching_engine.upsert_creator(audience)
+    matching_engine.catch_up()
+    # The creator's current row replaces their pairs
+    latest = latest_audiences(audiences)
+    rows: Dict[Pair, Dict[str, Any]] = {}
+    for start in range(0, len(latest), SCORE_BLOCK_SIZE):
+        block = latest[start : start + SCORE_BLOCK_SIZE]
+        records, scores = matching_engine.score_sponsorships_many(block)
+        positions, columns = np.nonzero(scores >= MATCH_THRESHOLD)
+        for pos, col in zip(positions.tolist(), columns.tolist()):
+            pair = (records[pos]["id"], block[col]["user_id"])
+            rows[pair] = {
+                "sponsorship_id": pair[0],
+                "creator_id": pair[1],
+                "audience_id": block[col]["id"],
+                "match_score": int(scores[pos, col]),
+                "updated_at": now,
+            }
+    ids = sorted({audience["user_id"] for audience in latest})
+    return _apply(rows, _existing_pairs("creator_id", ids))
+
+
+def rebuild_all_matches(batch_size: int = 256):
+    """Backfill the table for existing data, a batch of sponsorships at a time."""
+    sponsorships = fetch_all("sponsorships", columns=SPONSORSHIP_COLUMNS)
+    for start in range(0, len(sponsorships), batch_size):
+        refresh_sponsorship_matches(sponsorships[start : start + batch_size])
+
+
+def lookup_creators_for_brand(sponsorship_id: str) -> List[Dict[str, Any]]:
+    pairs = fetch_all(
+        MATCH_TABLE, filters={"sponsorship_id": sponsorship_id}, order="creator_id"
+    )
+    audiences = {
+        audience["id"]: audience
+        for audience in fetch_by_ids(
+            "audience_insights", [pair["audience_id"] for pair in pairs]
+        )
+    }
+    return [
+        {
+            "user_id": pair["creator_id"],
+            "match_score": pair["match_score"],
+            **audiences[pair["audience_id"]],
+        }
+        for pair in pairs
+        if pair["audience_id"] in audiences
+    ]
+
+
+def lookup_brands_for_creator(creator_id: str) -> List[Dict[str, Any]]:
+    pairs = fetch_all(
+        MATCH_TABLE, filters={"creator_id": creator_id}, order="sponsorship_id"
+    )
+    sponsorships = {
+        sponsorship["id"]: sponsorship
+        for sponsorship in fetch_by_ids(
+            "sponsorships",
+            [pair["sponsorship_id"] for pair in pairs],
+            columns=SPONSORSHIP_COLUMNS,
+        )
+    }
+    return [
+        {
+            "sponsorship_id": pair["sponsorship_id"],
+            "match_score": pair["match_score"],
+            **sponsorships[pair["sponsorship_id"]],
+        }
+        for pair in pairs
+        if pair["sponsorship_id"] in sponsorships
+    ]
+
+
+async def cached_creators_for_brand(sponsorship_id: str) -> List[Dict[str, Any]]:
+    key = f"creators:{sponsorship_id}"
+    matches = await match_cache.get(key)
+    if matches is None:
+        generation = await match_cache.generation()
+        matches = await run_in_threadpool(lookup_creators_for_brand, sponsorship_id)
+        await match_cache.set_if_current(key, matches, generation)
+    return matches
+
+
+async def cached_brands_for_creator(creator_id: str) -> List[Dict[str, Any]]:
+    key = f"brands:{creator_id}"
+    matches = await match_cache.get(key)
+    if matches is None:
+        generation = await match_cache.generation()
+        matches = await run_in_threadpool(lookup_brands_for_creator, creator_id)
+        await match_cache.set_if_current(key, matches, generation)
+    return matches
+
+
+async def invalidate_matches(sponsorship_ids: Iterable[str], creator_ids: Iterable[str], pairs: Iterable[Pair]):
+    """Matches were refreshed: drop the lists of the written rows and of every affected pair."""
+    keys = {f"creators:{sponsorship_id}" for sponsorship_id in sponsorship_ids}
+    keys.update(f"brands:{creator_id}" for creator_id in creator_ids)
+    for sponsorship_id, creator_id in pairs:
+        keys.add(f"creators:{sponsorship_id}")
+        keys.add(f"brands:{creator_id}")
+    await match_cache.invalidate(*sorted(keys))
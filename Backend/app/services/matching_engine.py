@@ -0,0 +1,743 @@
+"""
+In-memory matching engine.
+
+Audience insights and sponsorships are kept as columnar NumPy arrays so a
+sponsorship can be scored against every creator (or a creator against every
+sponsorship) in one vectorized pass. Scores follow the same four criteria as
+the original row-by-row matcher: age overlap, location overlap, engagement
+minimum and budget.
+
+Inverted indexes from age bucket / location to rows let each pass skip the
+rows that cannot reach the match threshold.
+
+A creator may have several audience_insights rows. The live matchers score
+every row; the materialized match table and the per-creator lookups use the
+creator's current row, the latest by created_at (then id).
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import heapq
+import threading
+import time
+
+import numpy as np
+
+MATCH_THRESHOLD = 2
+# Re-read this much before the last catch-up so rows committed late are not skipped
+CATCH_UP_OVERLAP = timedelta(seconds=30)
+DEFAULT_WEIGHTS = {"age": 1.0, "location": 1.0, "engagement": 1.0, "price": 1.0}
+_NO_TIME = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _as_float(value: Any) -> float:
+    """Convert a numeric JSON value to float, using NaN for missing/invalid data."""
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _as_mapping(value: Any) -> Dict[str, float]:
+    """Normalize an `{"18-24": 70, ...}` distribution to a key -> float dict."""
+    if not isinstance(value, dict):
+        return {}
+    mapping = {}
+    for key, amount in value.items():
+        amount = _as_float(amount)
+        if not np.isnan(amount):
+            mapping[str(key)] = amount
+    return mapping
+
+
+def _as_keys(value: Any) -> List[str]:
+    """Normalize a required `["18-24", ...]` list; duplicates are kept on purpose."""
+    if not isinstance(value, (list, tuple)):
+        return []
+    return [str(key) for key in value]
+
+
+def _recency(record: Dict[str, Any]) -> Tuple[datetime, str]:
+    created_at = record.get("created_at")
+    if isinstance(created_at, str):
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except ValueError:
+            created_at = None
+    if not isinstance(created_at, datetime):
+        return _NO_TIME, str(record["id"])
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at, str(record["id"])
+
+
+def latest_audiences(audiences: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Each creator's current audience row: the latest by created_at, then id."""
+    latest: Dict[str, Dict[str, Any]] = {}
+    for audience in audiences:
+        current = latest.get(audience["user_id"])
+        if current is None or _recency(audience) > _recency(current):
+            latest[audience["user_id"]] = audience
+    return list(latest.values())
+
+
+def _required(sponsorship: Dict[str, Any], key: str) -> List[str]:
+    required_audience = sponsorship.get("required_audience") or {}
+    if not isinstance(required_audience, dict):
+        return []
+    return _as_keys(required_audience.get(key, []))
+
+
+def _share(overlap: np.ndarray, total: np.ndarray) -> np.ndarray:
+    """Fraction of an audience inside the required buckets, clipped to [0, 1]."""
+    share = np.divide(overlap, total, out=np.zeros_like(overlap), where=total > 0)
+    return np.clip(share, 0.0, 1.0)
+
+
+def _top_k(
+    items: Iterable[Tuple[float, str, int, int]],
+    limit: int,
+    after: Optional[Tuple[float, str]] = None,
+) -> List[Tuple[float, str, int, int]]:
+    """
+    Heap-select the `limit` best `(rank_score, id, position, match_score)`
+    items, ordered by score then id, both descending. `after` is the
+    `(rank_score, id)` of the last item of the previous page; only items
+    strictly below it qualify.
+    """
+    if after is not None:
+        items = (item for item in items if (item[0], item[1]) < after)
+    return heapq.nlargest(limit, items, key=lambda item: (item[0], item[1]))
+
+
+class _KeyedMatrix:
+    """Growable float matrix whose columns are named by JSON keys."""
+
+    def __init__(self):
+        self.columns: Dict[str, int] = {}
+        self.values = np.zeros((0, 0), dtype=np.float64)
+
+    def reserve(self, rows: int):
+        if rows > self.values.shape[0]:
+            self._resize(max(rows, 2 * self.values.shape[0], 64), self.values.shape[1])
+
+    def _resize(self, rows: int, cols: int):
+        values = np.zeros((rows, cols), dtype=np.float64)
+        old_rows, old_cols = self.values.shape
+        values[:old_rows, :old_cols] = self.values
+        self.values = values
+
+    def column(self, key: str) -> int:
+        col = self.columns.get(key)
+        if col is None:
+            col = len(self.columns)
+            self.columns[key] = col
+            if col >= self.values.shape[1]:
+                self._resize(self.values.shape[0], max(col + 1, 2 * self.values.shape[1], 8))
+        return col
+
+    def set_row(self, row: int, mapping: Dict[str, float]):
+        self.reserve(row + 1)
+        self.values[row, :] = 0.0
+        for key, amount in mapping.items():
+            col = self.column(key)  # may reallocate self.values
+            self.values[row, col] = amount
+
+    def column_indices(self, keys: Iterable[str]) -> np.ndarray:
+        """Column positions for `keys`; unknown keys are dropped, duplicates kept."""
+        return np.array(
+            [self.columns[key] for key in keys if key in self.columns], dtype=np.intp
+        )
+
+    def vector(self, mapping: Dict[str, float]) -> np.ndarray:
+        """Project a key -> value mapping onto this matrix's columns."""
+        vec = np.zeros(self.values.shape[1], dtype=np.float64)
+        for key, amount in mapping.items():
+            col = self.columns.get(key)
+            if col is not None:
+                vec[col] = amount
+        return vec
+
+
+class _RecordTable:
+    """Rows keyed by record id, with the original records kept for responses."""
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self.positions: Dict[str, int] = {}
+        self._scalars = np.zeros((0, 2), dtype=np.float64)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _position(self, record: Dict[str, Any]) -> int:
+        record_id = str(record["id"])
+        pos = self.positions.get(record_id)
+        if pos is None:
+            pos = len(self.records)
+            self.positions[record_id] = pos
+            self.records.append(record)
+            if pos >= self._scalars.shape[0]:
+                scalars = np.full(
+                    (max(pos + 1, 2 * self._scalars.shape[0], 64), 2), np.nan
+                )
+                scalars[: self._scalars.shape[0]] = self._scalars
+                self._scalars = scalars
+        else:
+            self.records[pos] = record
+        return pos
+
+
+class InvertedIndex:
+    """Maps a JSON key (age bucket, location) to the row positions carrying it."""
+
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self._row_keys: Dict[int, Set[str]] = {}
+
+    def update(self, pos: int, keys: Iterable[str]):
+        keys = set(keys)
+        for key in self._row_keys.get(pos, set()) - keys:
+            self.postings[key].discard(pos)
+            if not self.postings[key]:
+                del self.postings[key]
+        for key in keys:
+            self.postings[key].add(pos)
+        self._row_keys[pos] = keys
+
+    def lookup(self, keys: Iterable[str]) -> np.ndarray:
+        hits: Set[int] = set()
+        for key in set(keys):
+            hits.update(self.postings.get(key, ()))
+        return np.fromiter(hits, dtype=np.intp, count=len(hits))
+
+
+class CreatorMatrix(_RecordTable):
+    """Audience insights as arrays: age/location distributions, engagement, price."""
+
+    def __init__(self, records: Iterable[Dict[str, Any]] = ()):
+        super().__init__()
+        self.ages = _KeyedMatrix()
+        self.locations = _KeyedMatrix()
+        # Only keys with a positive share are indexed: a required key with a
+        # zero share can never make the overlap sum positive.
+        self.age_index = InvertedIndex()
+        self.location_index = InvertedIndex()
+        # Position of each creator's current row, and all of their rows
+        self.current: Dict[str, int] = {}
+        self._user_rows: Dict[str, List[int]] = defaultdict(list)
+        for record in records:
+            self.upsert(record)
+
+    @property
+    def engagement(self) -> np.ndarray:
+        return self._scalars[: len(self), 0]
+
+    @property
+    def price(self) -> np.ndarray:
+        return self._scalars[: len(self), 1]
+
+    def current_mask(self) -> np.ndarray:
+        """Boolean array marking each creator's current row."""
+        mask = np.zeros(len(self), dtype=bool)
+        mask[np.fromiter(self.current.values(), dtype=np.intp, count=len(self.current))] = True
+        return mask
+
+    def upsert(self, audience: Dict[str, Any]):
+        pos = self._position(audience)
+        rows = self._user_rows[audience["user_id"]]
+        if pos not in rows:
+            rows.append(pos)
+        self.current[audience["user_id"]] = max(rows, key=lambda row: _recency(self.records[row]))
+        ages = _as_mapping(audience.get("audience_age_group"))
+        locations = _as_mapping(audience.get("audience_location"))
+        self.ages.set_row(pos, ages)
+        self.locations.set_row(pos, locations)
+        self.age_index.update(pos, (key for key, share in ages.items() if share > 0))
+        self.location_index.update(
+            pos, (key for key, share in locations.items() if share > 0)
+        )
+        self._scalars[pos, 0] = _as_float(audience.get("engagement_rate", 0))
+        self._scalars[pos, 1] = _as_float(audience.get("price_expectation", 0))
+
+    def candidates(self, sponsorship: Dict[str, Any]) -> np.ndarray:
+        """
+        Sorted positions of creators that can reach the match threshold.
+
+        Reaching 2 of 4 needs an age or location overlap (looked up in the
+        inverted indexes), or both the engagement and budget checks, which
+        are cheap scalar comparisons.
+        """
+        if not len(self):
+            return np.zeros(0, dtype=np.intp)
+        age_hits = self.age_index.lookup(_required(sponsorship, "age_group"))
+        location_hits = self.location_index.lookup(_required(sponsorship, "location"))
+        numeric_hits = np.flatnonzero(
+            (self.engagement >= _as_float(sponsorship.get("engagement_minimum", 0)))
+            & (self.price <= _as_float(sponsorship.get("budget", 0)))
+        )
+        return np.union1d(np.union1d(age_hits, location_hits), numeric_hits)
+
+    def score(
+        self, sponsorship: Dict[str, Any], positions: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Match score (0-4) for one sponsorship of the creators at `positions` (default: all)."""
+        if positions is None:
+            positions = np.arange(len(self))
+        scores = np.zeros(len(positions), dtype=np.int8)
+        if not len(positions):
+            return scores
+        for matrix, key in ((self.ages, "age_group"), (self.locations, "location")):
+            cols = matrix.column_indices(_required(sponsorship, key))
+            if cols.size:
+                scores += matrix.values[np.ix_(positions, cols)].sum(axis=1) > 0
+        # NaN (missing data) never satisfies a comparison, so it simply scores 0
+        scores += self.engagement[positions] >= _as_float(
+            sponsorship.get("engagement_minimum", 0)
+        )
+        scores += self.price[positions] <= _as_float(sponsorship.get("budget", 0))
+        return scores
+
+    def matches(
+        self, sponsorship: Dict[str, Any], threshold: int = MATCH_THRESHOLD
+    ) -> List[Dict[str, Any]]:
+        positions = self.candidates(sponsorship)
+        scores = self.score(sponsorship, positions)
+        keep = scores >= threshold
+        return [
+            {
+                "user_id": self.records[pos]["user_id"],
+                "match_score": int(score),
+                **self.records[pos],
+            }
+            for pos, score in zip(positions[keep], scores[keep])
+        ]
+
+    def score_many(self, sponsorships: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Match scores of every creator for several sponsorships at once, as an
+        (n_creators, n_sponsorships) array. Requirements become count matrices
+        so overlaps are one matrix product per criterion.
+        """
+        n = len(self)
+        scores = np.zeros((n, len(sponsorships)), dtype=np.int8)
+        if not n or not sponsorships:
+            return scores
+        for matrix, key in ((self.ages, "age_group"), (self.locations, "location")):
+            required = np.zeros((matrix.values.shape[1], len(sponsorships)))
+            for j, sponsorship in enumerate(sponsorships):
+                for col in matrix.column_indices(_required(sponsorship, key)):
+                    required[col, j] += 1
+            scores += matrix.values[:n] @ required > 0
+        minimums = np.array([_as_float(sp.get("engagement_minimum", 0)) for sp in sponsorships])
+        budgets = np.array([_as_float(sp.get("budget", 0)) for sp in sponsorships])
+        scores += self.engagement[:, None] >= minimums[None, :]
+        scores += self.price[:, None] <= budgets[None, :]
+        return scores
+
+    def matches_many(
+        self,
+        sponsorships: List[Dict[str, Any]],
+        threshold: int = MATCH_THRESHOLD,
+        block_size: int = 64,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """`matches` for several sponsorships, scored in blocks to bound memory."""
+        results = {}
+        for start in range(0, len(sponsorships), block_size):
+            block = sponsorships[start : start + block_size]
+            scores = self.score_many(block)
+            for j, sponsorship in enumerate(block):
+                results[sponsorship["id"]] = [
+                    {
+                        "user_id": self.records[pos]["user_id"],
+                        "match_score": int(scores[pos, j]),
+                        **self.records[pos],
+                    }
+                    for pos in np.flatnonzero(scores[:, j] >= threshold)
+                ]
+        return results
+
+    def ranked(
+        self,
+        sponsorship: Dict[str, Any],
+        limit: int,
+        weights: Dict[str, float] = DEFAULT_WEIGHTS,
+        after: Optional[Tuple[float, str]] = None,
+        threshold: int = MATCH_THRESHOLD,
+    ) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """
+        Top `limit` matching creators by weighted score. Age and location count
+        with the share of the creator's audience in the required buckets;
+        engagement and budget count as 0 or 1.
+        """
+        positions = self.candidates(sponsorship)
+        scores = self.score(sponsorship, positions)
+        keep = scores >= threshold
+        positions, scores = positions[keep], scores[keep]
+        if not len(positions):
+            return []
+        rank = np.zeros(len(positions), dtype=np.float64)
+        for matrix, key, weight in (
+            (self.ages, "age_group", weights["age"]),
+            (self.locations, "location", weights["location"]),
+        ):
+            cols = np.unique(matrix.column_indices(_required(sponsorship, key)))
+            if cols.size:
+                rows = matrix.values[positions]
+                rank += weight * _share(rows[:, cols].sum(axis=1), rows.sum(axis=1))
+        rank += weights["engagement"] * (
+            self.engagement[positions] >= _as_float(sponsorship.get("engagement_minimum", 0))
+        )
+        rank += weights["price"] * (
+            self.price[positions] <= _as_float(sponsorship.get("budget", 0))
+        )
+        items = zip(
+            np.round(rank, 6).tolist(),
+            (str(self.records[pos]["id"]) for pos in positions),
+            positions.tolist(),
+            scores.tolist(),
+        )
+        # Response payloads are built for the selected page only
+        return [
+            (
+                rank_score,
+                item_id,
+                {
+                    "user_id": self.records[pos]["user_id"],
+                    "audience_id": self.records[pos]["id"],
+                    "match_score": score,
+                    "rank_score": rank_score,
+                    "engagement_rate": self.records[pos].get("engagement_rate"),
+                    "price_expectation": self.records[pos].get("price_expectation"),
+                },
+            )
+            for rank_score, item_id, pos, score in _top_k(items, limit, after)
+        ]
+
+
+class SponsorshipMatrix(_RecordTable):
+    """Sponsorship requirements as arrays: required age/location counts, minimums."""
+
+    def __init__(self, records: Iterable[Dict[str, Any]] = ()):
+        super().__init__()
+        self.ages = _KeyedMatrix()
+        self.locations = _KeyedMatrix()
+        self.age_index = InvertedIndex()
+        self.location_index = InvertedIndex()
+        # Position of each creator's current row, and all of their rows
+        self.current: Dict[str, int] = {}
+        self._user_rows: Dict[str, List[int]] = defaultdict(list)
+        for record in records:
+            self.upsert(record)
+
+    @property
+    def engagement_minimum(self) -> np.ndarray:
+        return self._scalars[: len(self), 0]
+
+    @property
+    def budget(self) -> np.ndarray:
+        return self._scalars[: len(self), 1]
+
+    def upsert(self, sponsorship: Dict[str, Any]):
+        pos = self._position(sponsorship)
+        ages = _required(sponsorship, "age_group")
+        locations = _required(sponsorship, "location")
+        self.ages.set_row(pos, Counter(ages))
+        self.locations.set_row(pos, Counter(locations))
+        self.age_index.update(pos, ages)
+        self.location_index.update(pos, locations)
+        self._scalars[pos, 0] = _as_float(sponsorship.get("engagement_minimum", 0))
+        self._scalars[pos, 1] = _as_float(sponsorship.get("budget", 0))
+
+    def candidates(self, audience: Dict[str, Any]) -> np.ndarray:
+        """Sorted positions of sponsorships that can reach the match threshold."""
+        if not len(self):
+            return np.zeros(0, dtype=np.intp)
+        ages = _as_mapping(audience.get("audience_age_group"))
+        locations = _as_mapping(audience.get("audience_location"))
+        age_hits = self.age_index.lookup(key for key, share in ages.items() if share > 0)
+        location_hits = self.location_index.lookup(
+            key for key, share in locations.items() if share > 0
+        )
+        numeric_hits = np.flatnonzero(
+            (self.engagement_minimum <= _as_float(audience.get("engagement_rate", 0)))
+            & (self.budget >= _as_float(audience.get("price_expectation", 0)))
+        )
+        return np.union1d(np.union1d(age_hits, location_hits), numeric_hits)
+
+    def score(
+        self, audience: Dict[str, Any], positions: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Match score (0-4) for one creator's audience of the sponsorships at `positions` (default: all)."""
+        if positions is None:
+            positions = np.arange(len(self))
+        scores = np.zeros(len(positions), dtype=np.int8)
+        if not len(positions):
+            return scores
+        for matrix, key in (
+            (self.ages, "audience_age_group"),
+            (self.locations, "audience_location"),
+        ):
+            vec = matrix.vector(_as_mapping(audience.get(key)))
+            if vec.size:
+                scores += matrix.values[positions] @ vec > 0
+        scores += self.engagement_minimum[positions] <= _as_float(
+            audience.get("engagement_rate", 0)
+        )
+        scores += self.budget[positions] >= _as_float(audience.get("price_expectation", 0))
+        return scores
+
+    def matches(
+        self, audience: Dict[str, Any], threshold: int = MATCH_THRESHOLD
+    ) -> List[Dict[str, Any]]:
+        positions = self.candidates(audience)
+        scores = self.score(audience, positions)
+        keep = scores >= threshold
+        return [
+            {
+                "sponsorship_id": self.records[pos]["id"],
+                "match_score": int(score),
+                **self.records[pos],
+            }
+            for pos, score in zip(positions[keep], scores[keep])
+        ]
+
+    def score_many(self, audiences: List[Dict[str, Any]]) -> np.ndarray:
+        """Match scores of every sponsorship for several creators, as an (n_sponsorships, n_creators) array."""
+        n = len(self)
+        scores = np.zeros((n, len(audiences)), dtype=np.int8)
+        if not n or not audiences:
+            return scores
+        for matrix, key in (
+            (self.ages, "audience_age_group"),
+            (self.locations, "audience_location"),
+        ):
+            distributions = np.stack(
+                [matrix.vector(_as_mapping(audience.get(key))) for audience in audiences],
+                axis=1,
+            )
+            scores += matrix.values[:n] @ distributions > 0
+        engagement = np.array([_as_float(a.get("engagement_rate", 0)) for a in audiences])
+        prices = np.array([_as_float(a.get("price_expectation", 0)) for a in audiences])
+        scores += self.engagement_minimum[:, None] <= engagement[None, :]
+        scores += self.budget[:, None] >= prices[None, :]
+        return scores
+
+    def matches_many(
+        self,
+        audiences: List[Dict[str, Any]],
+        threshold: int = MATCH_THRESHOLD,
+        block_size: int = 64,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """`matches` for several creators, keyed by creator (user) id."""
+        results = {}
+        for start in range(0, len(audiences), block_size):
+            block = audiences[start : start + block_size]
+            scores = self.score_many(block)
+            for j, audience in enumerate(block):
+                results[audience["user_id"]] = [
+                    {
+                        "sponsorship_id": self.records[pos]["id"],
+                        "match_score": int(scores[pos, j]),
+                        **self.records[pos],
+                    }
+                    for pos in np.flatnonzero(scores[:, j] >= threshold)
+                ]
+        return results
+
+    def ranked(
+        self,
+        audience: Dict[str, Any],
+        limit: int,
+        weights: Dict[str, float] = DEFAULT_WEIGHTS,
+        after: Optional[Tuple[float, str]] = None,
+        threshold: int = MATCH_THRESHOLD,
+    ) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """Top `limit` matching sponsorships by weighted score; see `CreatorMatrix.ranked`."""
+        positions = self.candidates(audience)
+        scores = self.score(audience, positions)
+        keep = scores >= threshold
+        positions, scores = positions[keep], scores[keep]
+        if not len(positions):
+            return []
+        rank = np.zeros(len(positions), dtype=np.float64)
+        for matrix, key, weight in (
+            (self.ages, "audience_age_group", weights["age"]),
+            (self.locations, "audience_location", weights["location"]),
+        ):
+            mapping = _as_mapping(audience.get(key))
+            vec = matrix.vector(mapping)
+            total = np.full(len(positions), sum(mapping.values()))
+            if vec.size:
+                required = matrix.values[positions] > 0
+                rank += weight * _share(required @ vec, total)
+        rank += weights["engagement"] * (
+            self.engagement_minimum[positions] <= _as_float(audience.get("engagement_rate", 0))
+        )
+        rank += weights["price"] * (
+            self.budget[positions] >= _as_float(audience.get("price_expectation", 0))
+        )
+        items = zip(
+            np.round(rank, 6).tolist(),
+            (str(self.records[pos]["id"]) for pos in positions),
+            positions.tolist(),
+            scores.tolist(),
+        )
+        return [
+            (
+                rank_score,
+                item_id,
+                {
+                    "sponsorship_id": self.records[pos]["id"],
+                    "match_score": score,
+                    "rank_score": rank_score,
+                    "title": self.records[pos].get("title"),
+                    "brand_id": self.records[pos].get("brand_id"),
+                    "budget": self.records[pos].get("budget"),
+                },
+            )
+            for rank_score, item_id, pos, score in _top_k(items, limit, after)
+        ]
+
+
+class MatchingEngine:
+    """
+    Process-wide holder for the creator and sponsorship matrices.
+
+    Matrices are loaded lazily through the given loaders, reloaded after
+    `ttl_seconds` so writes from other workers are picked up, and kept
+    current in between through `upsert_creator` / `upsert_sponsorship`.
+    `catch_up` folds in rows created since the last load through the
+    optional `*_since` loaders, for callers that cannot wait for the TTL.
+    """
+
+    def __init__(
+        self,
+        load_creators: Callable[[], Iterable[Dict[str, Any]]],
+        load_sponsorships: Callable[[], Iterable[Dict[str, Any]]],
+        ttl_seconds: float = 300,
+        load_creators_since: Optional[Callable[[str], Iterable[Dict[str, Any]]]] = None,
+        load_sponsorships_since: Optional[Callable[[str], Iterable[Dict[str, Any]]]] = None,
+    ):
+        self._load_creators = load_creators
+        self._load_sponsorships = load_sponsorships
+        self._load_creators_since = load_creators_since
+        self._load_sponsorships_since = load_sponsorships_since
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.RLock()
+        self._creators: Optional[CreatorMatrix] = None
+        self._sponsorships: Optional[SponsorshipMatrix] = None
+        self._creators_loaded_at = 0.0
+        self._sponsorships_loaded_at = 0.0
+        # Wall-clock time each matrix is known to be complete up to
+        self._creators_synced_at: Optional[datetime] = None
+        self._sponsorships_synced_at: Optional[datetime] = None
+
+    def _stale(self, loaded_at: float) -> bool:
+        return time.monotonic() - loaded_at > self.ttl_seconds
+
+    def creators(self) -> CreatorMatrix:
+        with self._lock:
+            if self._creators is None or self._stale(self._creators_loaded_at):
+                synced_at = datetime.now(timezone.utc)
+                self._creators = CreatorMatrix(self._load_creators())
+                self._creators_loaded_at = time.monotonic()
+                self._creators_synced_at = synced_at
+            return self._creators
+
+    def sponsorships(self) -> SponsorshipMatrix:
+        with self._lock:
+            if self._sponsorships is None or self._stale(self._sponsorships_loaded_at):
+                synced_at = datetime.now(timezone.utc)
+                self._sponsorships = SponsorshipMatrix(self._load_sponsorships())
+                self._sponsorships_loaded_at = time.monotonic()
+                self._sponsorships_synced_at = synced_at
+            return self._sponsorships
+
+    def _catch_up(self, side: str, load_since):
+        with self._lock:
+            matrix = getattr(self, f"_{side}")
+            since = getattr(self, f"_{side}_synced_at")
+        if matrix is None or since is None or load_since is None:
+            # Not loaded yet: the first use loads everything anyway
+            return
+        synced_at = datetime.now(timezone.utc)
+        rows = load_since((since - CATCH_UP_OVERLAP).isoformat())
+        with self._lock:
+            if getattr(self, f"_{side}") is matrix:
+                for row in rows:
+                    matrix.upsert(row)
+                setattr(self, f"_{side}_synced_at", synced_at)
+
+    def catch_up(self):
+        """Fold in creators and sponsorships any worker created since the last load."""
+        self._catch_up("creators", self._load_creators_since)
+        self._catch_up("sponsorships", self._load_sponsorships_since)
+
+    def match_creators(self, sponsorship: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self.creators().matches(sponsorship)
+
+    def match_sponsorships(self, audience: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self.sponsorships().matches(audience)
+
+    def match_creators_many(
+        self, sponsorships: List[Dict[str, Any]]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            return self.creators().matches_many(sponsorships)
+
+    def match_sponsorships_many(
+        self, audiences: List[Dict[str, Any]]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            return self.sponsorships().matches_many(audiences)
+
+    def score_creators_many(
+        self, sponsorships: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Creator records and their `CreatorMatrix.score_many` scores, read under one lock.
+
+        Only creators' current rows are scored; their other rows score 0.
+        """
+        with self._lock:
+            creators = self.creators()
+            scores = creators.score_many(sponsorships)
+            scores[~creators.current_mask()] = 0
+            return list(creators.records), scores
+
+    def score_sponsorships_many(
+        self, audiences: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Sponsorship records and their `SponsorshipMatrix.score_many` scores, read under one lock."""
+        with self._lock:
+            sponsorships = self.sponsorships()
+            return list(sponsorships.records), sponsorships.score_many(audiences)
+
+    def rank_creators(self, sponsorship: Dict[str, Any], limit: int, **kwargs):
+        with self._lock:
+            return self.creators().ranked(sponsorship, limit, **kwargs)
+
+    def rank_sponsorships(self, audience: Dict[str, Any], limit: int, **kwargs):
+        with self._lock:
+            return self.sponsorships().ranked(audience, limit, **kwargs)
+
+    def upsert_creator(self, audience: Dict[str, Any]):
+        """Apply a written audience_insights row; no-op until the matrix is loaded."""
+        with self._lock:
+            if self._creators is not None:
+                self._creators.upsert(audience)
+
+    def upsert_sponsorship(self, sponsorship: Dict[str, Any]):
+        """Apply a written sponsorships row; no-op until the matrix is loaded."""
+        with self._lock:
+            if self._sponsorships is not None:
+                self._sponsorships.upsert(sponsorship)
+
+    def invalidate(self):
+        with self._lock:
+            self._creators = None
+            self._sponsorships = None
@@ -0,0 +1,214 @@
+"""
+Keyset pagination for the list endpoints.
+
+Pages are ordered newest first on (<timestamp column>, id). The cursor holds
+the sort key of the last row returned, and the next page continues strictly
+after it: a `<= timestamp` bound plus the tie-break on id, so each page is a
+range scan of a (timestamp DESC NULLS LAST, id DESC) index whatever its
+depth. Rows with no timestamp sort after all the others; once the dated rows
+run out, a page is topped up from them.
+
+Clients sending `Accept: application/x-ndjson` get the whole (filtered)
+table instead, one JSON object per line, fetched and written a page at a
+time so memory stays flat whatever the table size. JSON pages go through
+the response cache, namespaced by table.
+"""
+from typing import Any, AsyncIterator, Dict, Optional, Set
+import json
+import os
+from fastapi import HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from supabase import AsyncClient
+from sqlalchemy import Index, text
+from app.models.models import (
+    User, AudienceInsights, Sponsorship, UserPost,
+    SponsorshipApplication, SponsorshipPayment, Collaboration, public_columns
+)
+from .cursor import encode_cursor, decode_cursor
+from .response_cache import cached_response
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+NDJSON = "application/x-ndjson"
+
+
+# (sort column, id) per list, plus (filter column, sort column, id) per foreign key filter,
+# declared in the exact order of the pages (sort column DESC NULLS LAST, id DESC)
+PAGE_INDEXES = [
+    Index("ix_users_created_at_id_desc", User.created_at.desc().nulls_last(), User.id.desc()),
+    Index("ix_audience_insights_created_at_id_desc", AudienceInsights.created_at.desc().nulls_last(), AudienceInsights.id.desc()),
+    Index("ix_audience_insights_user_id_created_at_desc", AudienceInsights.user_id, AudienceInsights.created_at.desc().nulls_last(), AudienceInsights.id.desc()),
+    Index("ix_sponsorships_created_at_id_desc", Sponsorship.created_at.desc().nulls_last(), Sponsorship.id.desc()),
+    Index("ix_sponsorships_brand_id_created_at_desc", Sponsorship.brand_id, Sponsorship.created_at.desc().nulls_last(), Sponsorship.id.desc()),
+    Index("ix_user_posts_created_at_id_desc", UserPost.created_at.desc().nulls_last(), UserPost.id.desc()),
+    Index("ix_user_posts_user_id_created_at_desc", UserPost.user_id, UserPost.created_at.desc().nulls_last(), UserPost.id.desc()),
+    Index("ix_sponsorship_applications_applied_at_id_desc", SponsorshipApplication.applied_at.desc().nulls_last(), SponsorshipApplication.id.desc()),
+    Index("ix_sponsorship_applications_creator_id_applied_at_desc", SponsorshipApplication.creator_id, SponsorshipApplication.applied_at.desc().nulls_last(), SponsorshipApplication.id.desc()),
+    Index("ix_sponsorship_applications_sponsorship_id_applied_at_desc", SponsorshipApplication.sponsorship_id, SponsorshipApplication.applied_at.desc().nulls_last(), SponsorshipApplication.id.desc()),
+    Index("ix_sponsorship_payments_transaction_date_id_desc", SponsorshipPayment.transaction_date.desc().nulls_last(), SponsorshipPayment.id.desc()),
+    Index("ix_sponsorship_payments_creator_id_transaction_date_desc", SponsorshipPayment.creator_id, SponsorshipPayment.transaction_date.desc().nulls_last(), SponsorshipPayment.id.desc()),
+    Index("ix_sponsorship_payments_brand_id_transaction_date_desc", SponsorshipPayment.brand_id, SponsorshipPayment.transaction_date.desc().nulls_last(), SponsorshipPayment.id.desc()),
+    Index("ix_sponsorship_payments_sponsorship_id_transaction_date_desc", SponsorshipPayment.sponsorship_id, SponsorshipPayment.transaction_date.desc().nulls_last(), SponsorshipPayment.id.desc()),
+    Index("ix_collaborations_created_at_id_desc", Collaboration.created_at.desc().nulls_last(), Collaboration.id.desc()),
+    Index("ix_collaborations_creator_1_id_created_at_desc", Collaboration.creator_1_id, Collaboration.created_at.desc().nulls_last(), Collaboration.id.desc()),
+    Index("ix_collaborations_creator_2_id_created_at_desc", Collaboration.creator_2_id, Collaboration.created_at.desc().nulls_last(), Collaboration.id.desc()),
+]
+
+
+# Earlier ascending versions of PAGE_INDEXES, which the newest-first pages could not use
+_OLD_PAGE_INDEXES = [
+    "ix_users_created_at_id",
+    "ix_audience_insights_created_at_id",
+    "ix_audience_insights_user_id_created_at",
+    "ix_sponsorships_created_at_id",
+    "ix_sponsorships_brand_id_created_at",
+    "ix_user_posts_created_at_id",
+    "ix_user_posts_user_id_created_at",
+    "ix_sponsorship_applications_applied_at_id",
+    "ix_sponsorship_applications_creator_id_applied_at",
+    "ix_sponsorship_applications_sponsorship_id_applied_at",
+    "ix_sponsorship_payments_transaction_date_id",
+    "ix_sponsorship_payments_creator_id_transaction_date",
+    "ix_sponsorship_payments_brand_id_transaction_date",
+    "ix_sponsorship_payments_sponsorship_id_transaction_date",
+    "ix_collaborations_created_at_id",
+    "ix_collaborations_creator_1_id_created_at",
+    "ix_collaborations_creator_2_id_created_at",
+]
+
+
+def create_page_indexes(sync_conn):
+    """Create the list indexes; `create_all` skips indexes of existing tables."""
+    for name in _OLD_PAGE_INDEXES:
+        sync_conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    for index in PAGE_INDEXES:
+        index.create(sync_conn, checkfirst=True)
+
+
+class PageParams:
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+
+
+def table_columns(model) -> Set[str]:
+    return set(public_columns(model))
+
+
+def _projection(fields: Optional[str], allowed: Set[str]) -> Optional[list]:
+    if not fields:
+        return None
+    columns = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [column for column in columns if column not in allowed]
+    if unknown or not columns:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(unknown) or fields}"
+        )
+    return columns
+
+
+def _quote(value: str) -> str:
+    # PostgREST needs reserved characters (",", ":", "(", ")") quoted inside or=()
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _ordered(query, sort_column: str, count: int):
+    return query.order(sort_column, desc=True, nullsfirst=False).order("id", desc=True).limit(count)
+
+
+async def fetch_page(
+    supabase: AsyncClient,
+    table: str,
+    model,
+    page: PageParams,
+    sort_column: str = "created_at",
+    filters: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Return one page of `table` as {"data": [...], "next_cursor": str | None}."""
+    columns = _projection(page.fields, table_columns(model))
+    # The sort key is always fetched so the cursor can be built, then dropped if not asked for
+    selected = public_columns(model) if columns is None else list(dict.fromkeys([*columns, sort_column, "id"]))
+
+    def base():
+        query = supabase.table(table).select(",".join(selected))
+        for column, value in (filters or {}).items():
+            if value is not None:
+                query = query.eq(column, value)
+        return query
+
+    sort_value = None
+    query = base()
+    if page.cursor:
+        sort_value, row_id = decode_cursor(page.cursor, 2)
+        if not isinstance(row_id, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if sort_value is None:
+            query = query.is_(sort_column, "null").lt("id", row_id)
+        else:
+            # The leading bound is the index range; the OR only breaks ties on id
+            value = _quote(str(sort_value))
+            query = query.lte(sort_column, str(sort_value)).or_(
+                f"{sort_column}.lt.{value},id.lt.{_quote(row_id)}"
+            )
+
+    rows = (await _ordered(query, sort_column, page.limit + 1).execute()).data
+    if page.cursor and sort_value is not None and len(rows) <= page.limit:
+        # Past the last dated row: carry on into the undated ones
+        undated = base().is_(sort_column, "null")
+        rows += (await _ordered(undated, sort_column, page.limit + 1 - len(rows)).execute()).data
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[: page.limit]
+        next_cursor = encode_cursor([rows[-1].get(sort_column), rows[-1]["id"]])
+    if columns is not None:
+        rows = [{column: row.get(column) for column in columns} for row in rows]
+    return {"data": rows, "next_cursor": next_cursor}
+
+
+async def stream_rows(
+    supabase: AsyncClient,
+    table: str,
+    model,
+    page: PageParams,
+    sort_column: str = "created_at",
+    filters: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[str]:
+    """Yield every row after `page.cursor` as NDJSON, one fetched page per chunk."""
+    batch = PageParams(limit=EXPORT_PAGE_SIZE, cursor=page.cursor, fields=page.fields)
+    while True:
+        result = await fetch_page(supabase, table, model, batch, sort_column, filters)
+        if result["data"]:
+            yield "".join(json.dumps(row, default=str) + "\n" for row in result["data"])
+        if not result["next_cursor"]:
+            break
+        batch.cursor = result["next_cursor"]
+
+
+async def list_rows(
+    request: Request,
+    supabase: AsyncClient,
+    table: str,
+    model,
+    page: PageParams,
+    sort_column: str = "created_at",
+    filters: Optional[Dict[str, Any]] = None,
+):
+    """One JSON page (served through the response cache), or the full NDJSON stream."""
+    if NDJSON not in request.headers.get("accept", ""):
+        return await cached_response(
+            request, table, lambda: fetch_page(supabase, table, model, page, sort_column, filters)
+        )
+    # Bad fields/cursor must fail before the 200 and the first chunk go out
+    _projection(page.fields, table_columns(model))
+    if page.cursor:
+        decode_cursor(page.cursor, 2)
+    return StreamingResponse(
+        stream_rows(supabase, table, model, page, sort_column, filters), media_type=NDJSON
+    )
@@ -0,0 +1,94 @@
+"""
+Cluster-wide presence registry.
+
+Each user has a sorted set `presence:<user_id>` whose members are the ids
+of their open WebSocket connections, scored by the time each one expires.
+A user is online while any member has not expired. Every worker refreshes
+the expiry of its own connections from one heartbeat task, so a connection
+whose worker dies without a clean disconnect drops out within
+PRESENCE_TTL_SECONDS.
+"""
+from typing import Dict, Iterable, Set
+import asyncio
+import logging
+import os
+import time
+import uuid
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL_SECONDS = float(os.getenv("PRESENCE_TTL_SECONDS", "30"))
+PRESENCE_HEARTBEAT_SECONDS = float(os.getenv("PRESENCE_HEARTBEAT_SECONDS", "10"))
+
+
+class PresenceRegistry:
+    def __init__(
+        self,
+        redis: Redis,
+        ttl_seconds: float = PRESENCE_TTL_SECONDS,
+        heartbeat_seconds: float = PRESENCE_HEARTBEAT_SECONDS,
+    ):
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        # Connections held by this worker: connection id -> user id
+        self.local: Dict[str, str] = {}
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"presence:{user_id}"
+
+    async def connect(self, user_id: str) -> str:
+        connection_id = uuid.uuid4().hex
+        self.local[connection_id] = user_id
+        await self._refresh({connection_id: user_id})
+        return connection_id
+
+    async def disconnect(self, user_id: str, connection_id: str) -> bool:
+        """Drop one connection; returns whether the user is still online elsewhere."""
+        self.local.pop(connection_id, None)
+        key = self._key(user_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zrem(key, connection_id)
+            pipe.zremrangebyscore(key, "-inf", time.time())
+            pipe.zcard(key)
+            _, _, remaining = await pipe.execute()
+        return remaining > 0
+
+    async def is_online(self, user_id: str) -> bool:
+        return await self.redis.zcount(self._key(user_id), time.time(), "+inf") > 0
+
+    async def online(self, user_ids: Iterable[str]) -> Set[str]:
+        """The subset of `user_ids` that is online, in one round trip."""
+        user_ids = list(dict.fromkeys(user_ids))
+        now = time.time()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.zcount(self._key(user_id), now, "+inf")
+            counts = await pipe.execute()
+        return {user_id for user_id, count in zip(user_ids, counts) if count}
+
+    async def _refresh(self, connections: Dict[str, str]):
+        expires_at = time.time() + self.ttl_seconds
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for connection_id, user_id in connections.items():
+                pipe.zadd(self._key(user_id), {connection_id: expires_at})
+                pipe.expire(self._key(user_id), int(self.ttl_seconds) + 1)
+            await pipe.execute()
+
+    async def run_heartbeats(self):
+        """Keep this worker's connections alive; run as a background task."""
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            if not self.local:
+                continue
+            try:
+                await self._refresh(dict(self.local))
+            except RedisError as e:
+                logger.warning(f"Presence heartbeat failed: {e}")
+
+
+presence = PresenceRegistry(redis_client)
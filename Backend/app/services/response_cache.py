@@ -0,0 +1,143 @@
+"""
+HTTP response cache for read-mostly GET routes.
+
+Serialized JSON bodies are stored in Redis under
+`response:<namespace>:<version>:<request hash>` together with their ETag and
+Last-Modified. Each namespace (normally a table) has a version counter that
+write handlers bump with `invalidate`, which orphans every cached response
+of that namespace at once; orphaned entries expire with their TTL. Because
+a versioned entry never changes, hits are also kept in a local LRU, so a
+repeat read costs one Redis GET for the version and no serialization.
+Conditional requests (If-None-Match / If-Modified-Since) are answered with
+304 from the cached validators.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+import hashlib
+import json
+import logging
+import os
+from .cache import LRUCache, _MISSING
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+_local = LRUCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS)
+counters = {"local_hits": 0, "redis_hits": 0, "misses": 0, "not_modified": 0, "errors": 0}
+
+
+def _version_key(namespace: str) -> str:
+    return f"response:{namespace}:version"
+
+
+def _modified_key(namespace: str) -> str:
+    return f"response:{namespace}:modified"
+
+
+def _request_hash(request: Request, vary: str) -> str:
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    return hashlib.sha1(f"{request.url.path}?{query}|{vary}".encode()).hexdigest()
+
+
+def _not_modified(request: Request, entry: Dict[str, str]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or entry["etag"] in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(entry["last_modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _respond(request: Request, entry: Dict[str, str]) -> Response:
+    headers = {
+        "ETag": entry["etag"],
+        "Last-Modified": entry["last_modified"],
+        "Cache-Control": "no-cache",
+    }
+    if _not_modified(request, entry):
+        counters["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(entry["body"], media_type="application/json", headers=headers)
+
+
+async def cached_response(
+    request: Request,
+    namespace: str,
+    produce: Callable[[], Awaitable[Any]],
+    vary: str = "",
+    cacheable: Callable[[Any], bool] = lambda data: True,
+) -> Any:
+    """
+    Serve a GET from the cache, or run `produce` and cache its JSON.
+
+    `vary` is mixed into the cache key for inputs that are not in the URL;
+    `cacheable` can veto storing a result. A `Response` returned by
+    `produce` (e.g. a stream) is passed through untouched.
+    """
+    try:
+        version = await redis_client.get(_version_key(namespace)) or "0"
+        key = f"response:{namespace}:{version}:{_request_hash(request, vary)}"
+        entry = _local.get(key)
+        if entry is not _MISSING:
+            counters["local_hits"] += 1
+            return _respond(request, entry)
+        entry = await redis_client.hgetall(key)
+        if entry:
+            counters["redis_hits"] += 1
+            _local.set(key, entry)
+            return _respond(request, entry)
+    except RedisError as e:
+        counters["errors"] += 1
+        logger.warning("Response cache unavailable, serving %s uncached: %s", namespace, e)
+        return await produce()
+
+    counters["misses"] += 1
+    data = await produce()
+    if isinstance(data, Response) or not cacheable(data):
+        return data
+    body = json.dumps(jsonable_encoder(data), separators=(",", ":"))
+    entry = {"body": body, "etag": f'"{hashlib.sha1(body.encode()).hexdigest()}"'}
+    try:
+        now = format_datetime(datetime.now(timezone.utc), usegmt=True)
+        await redis_client.set(_modified_key(namespace), now, nx=True)
+        entry["last_modified"] = await redis_client.get(_modified_key(namespace)) or now
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping=entry)
+            pipe.expire(key, RESPONSE_CACHE_TTL_SECONDS)
+            await pipe.execute()
+        _local.set(key, entry)
+    except RedisError as e:
+        counters["errors"] += 1
+        logger.warning("Could not store %s response: %s", namespace, e)
+        entry["last_modified"] = format_datetime(datetime.now(timezone.utc), usegmt=True)
+    return _respond(request, entry)
+
+
+async def invalidate(*namespaces: str):
+    """Data in `namespaces` changed: bump their versions and Last-Modified."""
+    now = format_datetime(datetime.now(timezone.utc), usegmt=True)
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for namespace in namespaces:
+                pipe.incr(_version_key(namespace))
+                pipe.set(_modified_key(namespace), now)
+            await pipe.execute()
+    except RedisError as e:
+        counters["errors"] += 1
+        logger.warning("Could not invalidate responses for %s: %s", namespaces, e)
+
+
+def stats() -> Dict[str, Any]:
+    return {**counters, "local_entries": len(_local)}
@@ -0,0 +1,70 @@
+"""
+Full-text search over sponsorships and user posts.
+
+Both tables carry a generated, stored `search_vector` tsvector (weighted
+title > category/description > content) with a GIN index, so a query is an
+index lookup plus `ts_rank_cd` over the matching rows only. Queries use
+`websearch_to_tsquery` (quoted phrases, `or`, `-term`). Results are ordered
+by (rank, id) descending and paged with a keyset cursor on the same pair.
+"""
+from typing import Any, Dict, Optional
+from fastapi import HTTPException
+from sqlalchemy import Float, Index, cast, func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Sponsorship, UserPost, public_columns
+from .cursor import encode_cursor, decode_cursor
+
+SEARCH_CONFIG = "english"
+
+SEARCH_MODELS = {"sponsorships": Sponsorship, "posts": UserPost}
+
+SEARCH_INDEXES = [
+    Index("ix_sponsorships_search_vector", Sponsorship.search_vector, postgresql_using="gin"),
+    Index("ix_user_posts_search_vector", UserPost.search_vector, postgresql_using="gin"),
+]
+
+
+def create_search_columns(sync_conn):
+    """Add the generated search columns and their indexes to existing tables."""
+    for model in SEARCH_MODELS.values():
+        column = model.__table__.c.search_vector
+        sync_conn.execute(text(
+            f"ALTER TABLE {model.__tablename__} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({column.computed.sqltext}) STORED"
+        ))
+    for index in SEARCH_INDEXES:
+        index.create(sync_conn, checkfirst=True)
+
+
+async def search(
+    db: AsyncSession,
+    kind: str,
+    q: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    model = SEARCH_MODELS[kind]
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    # float8 so the rank round-trips through the cursor exactly
+    rank = cast(func.ts_rank_cd(model.search_vector, query), Float(53)).label("rank")
+
+    stmt = select(
+        *(getattr(model, name) for name in public_columns(model)), rank
+    ).where(model.search_vector.op("@@")(query))
+    for column, value in (filters or {}).items():
+        if value is not None:
+            stmt = stmt.where(getattr(model, column) == value)
+    if cursor:
+        last_rank, last_id = decode_cursor(cursor, 2)
+        if not isinstance(last_rank, (int, float)) or not isinstance(last_id, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(tuple_(rank, model.id) < tuple_(float(last_rank), last_id))
+    stmt = stmt.order_by(rank.desc(), model.id.desc()).limit(limit + 1)
+
+    rows = [dict(row) for row in (await db.execute(stmt)).mappings()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]["rank"], rows[-1]["id"]])
+    return {"results": rows, "next_cursor": next_cursor}
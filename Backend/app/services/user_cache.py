@@ -0,0 +1,77 @@
+"""
+Read-through cache of the small user fields the chat paths need.
+
+`profile:<user_id>` holds {"id", "username", "profileImage"} and
+`username:<username>` the user id, in the two-tier cache (worker LRU in
+front of Redis). Lookups for many users go to Redis once and to Postgres
+once for whatever is still missing. Loaded values are stored with
+`set_many_if_current`, so a lookup racing a profile update never caches the
+old row. Call `invalidate_user` whenever a user's username or profile image
+changes.
+"""
+from typing import Any, Dict, Iterable, Optional
+import os
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import User
+from .cache import TieredCache
+from .redis_client import redis_client
+
+user_cache = TieredCache(
+    "user",
+    redis_client,
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "3600")),
+)
+
+
+def _profile(user) -> Dict[str, Any]:
+    return {"id": user.id, "username": user.username, "profileImage": user.profile_image}
+
+
+async def get_profiles(user_ids: Iterable[str], db: AsyncSession) -> Dict[str, Dict[str, Any]]:
+    """Profiles by user id; unknown ids are left out."""
+    user_ids = list(dict.fromkeys(user_ids))
+    cached = await user_cache.get_many([f"profile:{user_id}" for user_id in user_ids])
+    profiles = {profile["id"]: profile for profile in cached.values()}
+    missing = [user_id for user_id in user_ids if user_id not in profiles]
+    if missing:
+        generation = await user_cache.generation()
+        result = await db.execute(
+            select(User.id, User.username, User.profile_image).where(User.id.in_(missing))
+        )
+        loaded = {row.id: _profile(row) for row in result}
+        profiles.update(loaded)
+        await user_cache.set_many_if_current({
+            **{f"profile:{user_id}": profile for user_id, profile in loaded.items()},
+            **{f"username:{profile['username']}": user_id for user_id, profile in loaded.items()},
+        }, generation)
+    return profiles
+
+
+async def get_profile(user_id: str, db: AsyncSession) -> Optional[Dict[str, Any]]:
+    return (await get_profiles([user_id], db)).get(user_id)
+
+
+async def get_user_id_by_username(username: str, db: AsyncSession) -> Optional[str]:
+    user_id = await user_cache.get(f"username:{username}")
+    if user_id is not None:
+        return user_id
+    generation = await user_cache.generation()
+    result = await db.execute(
+        select(User.id, User.username, User.profile_image).where(User.username == username)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    await user_cache.set_many_if_current(
+        {f"profile:{row.id}": _profile(row), f"username:{username}": row.id}, generation
+    )
+    return row.id
+
+
+async def invalidate_user(user_id: str, *usernames: str):
+    """Drop a user's cached profile and the username mappings (old and new) given."""
+    await user_cache.invalidate(
+        f"profile:{user_id}", *(f"username:{username}" for username in usernames)
+    )
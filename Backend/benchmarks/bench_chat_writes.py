@@ -0,0 +1,183 @@
+"""
+Chat write path benchmark.
+
+Drives `services/chat_writer.py` with many concurrent senders and reports
+messages per second and commit latency percentiles, once with one
+transaction per message and once per group-commit window. The database is
+simulated: a connection pool of --pool-size, a fixed cost per statement, and
+a WAL flush of --fsync-ms per commit that commits take in turn, which is the
+cost group commit amortizes. In a running app the same numbers for live
+traffic are at GET /chat/writer/stats.
+
+Usage (from Backend/):
+    python -m benchmarks.bench_chat_writes --senders 200 --messages 20
+    python -m benchmarks.bench_chat_writes --windows 1,2,5,10 --fsync-ms 2 --json results.json
+"""
+import os
+
+# The chat models import app.db.db, which builds a (never connected) engine from these
+for name, value in (("user", "benchmark"), ("password", "benchmark"), ("host", "localhost"),
+                    ("port", "5432"), ("dbname", "benchmark")):
+    os.environ.setdefault(name, value)
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+from app.models.chat import MessageStatus
+from app.services.chat_writer import GroupCommitter, write_messages
+
+
+class SimulatedDatabase:
+    def __init__(self, pool_size: int, statement_ms: float, fsync_ms: float):
+        self.pool = asyncio.Semaphore(pool_size)
+        self.wal = asyncio.Lock()
+        self.statement_ms = statement_ms
+        self.fsync_ms = fsync_ms
+        self.commits = 0
+
+    def session(self) -> "SimulatedSession":
+        return SimulatedSession(self)
+
+
+class SimulatedSession:
+    def __init__(self, database: SimulatedDatabase):
+        self.database = database
+
+    async def __aenter__(self):
+        await self.database.pool.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.database.pool.release()
+
+    async def execute(self, statement, params=None):
+        await asyncio.sleep(self.database.statement_ms / 1000)
+
+    async def commit(self):
+        async with self.database.wal:
+            await asyncio.sleep(self.database.fsync_ms / 1000)
+            self.database.commits += 1
+
+    async def rollback(self):
+        pass
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def make_write(chat_list_id: str, sender_id: str, receiver_id: str):
+    return None, {
+        "id": str(uuid.uuid4()),
+        "sender_id": sender_id,
+        "receiver_id": receiver_id,
+        "chat_list_id": chat_list_id,
+        "message": "benchmark message",
+        "status": MessageStatus.SENT,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+async def measure(name: str, database: SimulatedDatabase, send, args) -> Dict[str, Any]:
+    timings: List[float] = []
+
+    async def sender(index: int):
+        chat_list_id = str(uuid.uuid4())
+        for _ in range(args.messages):
+            write = make_write(chat_list_id, f"sender-{index}", f"receiver-{index}")
+            started = time.perf_counter()
+            await send(write)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender(index) for index in range(args.senders)))
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        "case": name,
+        "messages": len(timings),
+        "commits": database.commits,
+        "messages_per_second": len(timings) / elapsed,
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": percentile(timings, 50),
+        "p95_ms": percentile(timings, 95),
+        "p99_ms": percentile(timings, 99),
+        "max_ms": timings[-1],
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    def new_database():
+        return SimulatedDatabase(args.pool_size, args.statement_ms, args.fsync_ms)
+
+    results = []
+    database = new_database()
+
+    async def send_direct(write):
+        async with database.session() as session:
+            await write_messages(session, [write])
+            await session.commit()
+
+    results.append(await measure("transaction per message", database, send_direct, args))
+
+    for window_ms in args.windows:
+        database = new_database()
+        committer = GroupCommitter(database.session, window_ms, args.max_batch)
+        flusher = asyncio.create_task(committer.run())
+        results.append(await measure(f"group commit, {window_ms:g} ms window", database, committer.submit, args))
+        flusher.cancel()
+
+    return {"config": vars(args), "results": results}
+
+
+def print_report(report: Dict[str, Any]):
+    config = report["config"]
+    print(
+        f"senders={config['senders']} messages={config['messages']} pool={config['pool_size']} "
+        f"statement_ms={config['statement_ms']} fsync_ms={config['fsync_ms']} max_batch={config['max_batch']}"
+    )
+    header = f"{'case':<32}{'msgs':>8}{'commits':>9}{'msg/s':>10}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in report["results"]:
+        print(
+            f"{row['case']:<32}{row['messages']:>8}{row['commits']:>9}{row['messages_per_second']:>10.0f}"
+            f"{row['mean_ms']:>9.2f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+        )
+    print("(latencies in ms, submit to commit)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chat message write path")
+    parser.add_argument("--senders", type=int, default=200, help="concurrent senders")
+    parser.add_argument("--messages", type=int, default=20, help="messages per sender")
+    parser.add_argument("--pool-size", type=int, default=15,
+                        help="connections (SQLAlchemy default pool 5 + overflow 10)")
+    parser.add_argument("--statement-ms", type=float, default=0.3, help="simulated cost per statement")
+    parser.add_argument("--fsync-ms", type=float, default=1.0, help="simulated WAL flush per commit")
+    parser.add_argument("--windows", type=lambda value: [float(v) for v in value.split(",")],
+                        default=[1.0, 5.0], help="comma-separated group commit windows in ms")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Matching benchmarks.
+
+Times both matchers in isolation (scoring only, against pre-built arrays and
+the original row-by-row loop as a reference) and end to end through
+`services/db_service.py` and `services/match_store.py` with a local
+stand-in for Supabase. Reports latency percentiles and memory use.
+
+Usage (from Backend/):
+    python -m benchmarks.bench_matching --creators 20000 --sponsorships 2000
+    python -m benchmarks.bench_matching --json results.json --latency-ms 5
+"""
+import os
+
+# db_service builds a Supabase client at import; it is swapped for the local store below
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "benchmark.local.key")
+# The ORM models import app.db.db, which builds a (never connected) engine from these
+for name, value in (("user", "benchmark"), ("password", "benchmark"), ("host", "localhost"),
+                    ("port", "5432"), ("dbname", "benchmark")):
+    os.environ.setdefault(name, value)
+
+from typing import Any, Callable, Dict, List
+import argparse
+import json
+import random
+import resource
+import statistics
+import time
+import tracemalloc
+
+from app.services import db_service, match_store
+from app.services.matching_engine import CreatorMatrix, SponsorshipMatrix, MATCH_THRESHOLD
+from benchmarks.local_store import LocalSupabase
+from benchmarks.synthetic import SyntheticDataset
+
+
+def reference_score(sponsorship: Dict[str, Any], audience: Dict[str, Any]) -> int:
+    """The original per-row rule from db_service, kept as the baseline."""
+    match_score = 0
+    required = sponsorship.get("required_audience") or {}
+    creator_ages = audience.get("audience_age_group") or {}
+    if sum(creator_ages.get(age, 0) for age in required.get("age_group", [])) > 0:
+        match_score += 1
+    creator_locs = audience.get("audience_location") or {}
+    if sum(creator_locs.get(loc, 0) for loc in required.get("location", [])) > 0:
+        match_score += 1
+    if audience.get("engagement_rate", 0) >= sponsorship.get("engagement_minimum", 0):
+        match_score += 1
+    if audience.get("price_expectation", 0) <= sponsorship.get("budget", 0):
+        match_score += 1
+    return match_score
+
+
+def reference_creators_for_brand(sponsorship, audiences):
+    return [
+        {"user_id": audience["user_id"], "match_score": score, **audience}
+        for audience in audiences
+        if (score := reference_score(sponsorship, audience)) >= MATCH_THRESHOLD
+    ]
+
+
+def reference_brands_for_creator(audience, sponsorships):
+    return [
+        {"sponsorship_id": sponsorship["id"], "match_score": score, **sponsorship}
+        for sponsorship in sponsorships
+        if (score := reference_score(sponsorship, audience)) >= MATCH_THRESHOLD
+    ]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def measure(name: str, fn: Callable[[Any], Any], inputs: List[Any]) -> Dict[str, Any]:
+    """Time `fn` over `inputs`, then rerun the first input under tracemalloc for peak memory."""
+    timings = []
+    for item in inputs:
+        started = time.perf_counter()
+        fn(item)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    tracemalloc.start()
+    fn(inputs[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "case": name,
+        "runs": len(timings),
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": percentile(timings, 50),
+        "p95_ms": percentile(timings, 95),
+        "p99_ms": percentile(timings, 99),
+        "max_ms": timings[-1],
+        "peak_mb": peak / 2**20,
+    }
+
+
+def measure_build(name: str, build: Callable[[], Any]) -> Dict[str, Any]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    build()
+    elapsed = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "case": name, "runs": 1, "mean_ms": elapsed, "p50_ms": elapsed, "p95_ms": elapsed,
+        "p99_ms": elapsed, "max_ms": elapsed, "peak_mb": peak / 2**20,
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    dataset = SyntheticDataset(args.creators, args.brands, args.sponsorships, args.seed)
+    audiences = dataset.audience_insights
+    sponsorships = dataset.sponsorships
+    rng = random.Random(args.seed)
+    sponsorship_sample = [rng.choice(sponsorships) for _ in range(args.queries)]
+    audience_sample = [rng.choice(audiences) for _ in range(args.queries)]
+    reference_queries = max(1, min(args.queries, args.reference_queries))
+
+    results = []
+
+    # Isolation: scoring only, data already in memory
+    results.append(measure_build("build CreatorMatrix", lambda: CreatorMatrix(audiences)))
+    results.append(measure_build("build SponsorshipMatrix", lambda: SponsorshipMatrix(sponsorships)))
+    creators = CreatorMatrix(audiences)
+    sponsorship_matrix = SponsorshipMatrix(sponsorships)
+    results.append(measure(
+        "reference creators-for-brand",
+        lambda s: reference_creators_for_brand(s, audiences),
+        sponsorship_sample[:reference_queries],
+    ))
+    results.append(measure("engine creators-for-brand", creators.matches, sponsorship_sample))
+    results.append(measure(
+        "reference brands-for-creator",
+        lambda a: reference_brands_for_creator(a, sponsorships),
+        audience_sample[:reference_queries],
+    ))
+    results.append(measure("engine brands-for-creator", sponsorship_matrix.matches, audience_sample))
+    results.append(measure(
+        "engine ranked top-20 creators", lambda s: creators.ranked(s, 20), sponsorship_sample
+    ))
+    batch = sponsorships[: args.batch_size]
+    results.append(measure(
+        f"engine batch of {len(batch)} sponsorships", creators.matches_many, [batch] * 5
+    ))
+
+    # End to end through the services, with the local store in place of Supabase
+    store = LocalSupabase(dataset.tables(), latency_ms=args.latency_ms)
+    db_service.supabase = store
+    match_store.supabase = store
+    db_service.matching_engine.invalidate()
+    results.append(measure_build(
+        "e2e cold creators-for-brand (engine load)",
+        lambda: db_service.match_creators_for_brand(sponsorships[0]["id"]),
+    ))
+    results.append(measure(
+        "e2e creators-for-brand",
+        db_service.match_creators_for_brand,
+        [s["id"] for s in sponsorship_sample],
+    ))
+    results.append(measure(
+        "e2e brands-for-creator",
+        db_service.match_brands_for_creator,
+        [a["user_id"] for a in audience_sample],
+    ))
+
+    # Materialized match table lookups (what the /match routes serve)
+    store.drop_indexes(match_store.MATCH_TABLE)
+    store.tables[match_store.MATCH_TABLE] = [
+        {
+            "sponsorship_id": sponsorship_id,
+            "creator_id": match["user_id"],
+            "audience_id": match["id"],
+            "match_score": match["match_score"],
+        }
+        for sponsorship_id, matches in creators.matches_many(sponsorships).items()
+        for match in matches
+    ]
+    results.append(measure(
+        "e2e match-table creators-for-brand",
+        match_store.lookup_creators_for_brand,
+        [s["id"] for s in sponsorship_sample[: args.lookup_queries]],
+    ))
+
+    return {
+        "config": vars(args),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "results": results,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    config = report["config"]
+    print(
+        f"creators={config['creators']} sponsorships={config['sponsorships']} "
+        f"queries={config['queries']} seed={config['seed']} latency_ms={config['latency_ms']}"
+    )
+    header = f"{'case':<44}{'runs':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'peak MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in report["results"]:
+        print(
+            f"{row['case']:<44}{row['runs']:>6}{row['mean_ms']:>10.2f}{row['p50_ms']:>10.2f}"
+            f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['peak_mb']:>10.1f}"
+        )
+    print(f"max RSS: {report['max_rss_mb']:.1f} MB (times in ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the matching service")
+    parser.add_argument("--creators", type=int, default=10000)
+    parser.add_argument("--brands", type=int, default=200)
+    parser.add_argument("--sponsorships", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100, help="timed calls per case")
+    parser.add_argument("--reference-queries", type=int, default=20,
+                        help="timed calls for the slow reference loop")
+    parser.add_argument("--lookup-queries", type=int, default=20,
+                        help="timed calls against the match table")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="simulated round trip per local-store request")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+In-memory stand-in for the Supabase client.
+
+Implements the slice of the PostgREST query builder the matching code uses
+(`select`, `eq`, `in_`, `gte`, `or_` over `and(...eq...)` groups, `order`,
+`range`, `limit`, `insert`, `upsert`, `delete`, `execute`) over plain lists of rows, so the matchers can be benchmarked end
+to end without a network round trip. `latency_ms` adds a fixed delay per
+request to approximate one.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import re
+import time
+
+
+class LocalResponse:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+        self.count = None
+
+
+class LocalQuery:
+    def __init__(self, store: "LocalSupabase", table: str):
+        self.store = store
+        self.table = table
+        self.columns: Optional[List[str]] = None
+        self.filters = []
+        self.equals = []
+        self.order_by: List[Tuple[str, bool, bool]] = []
+        self.window = None
+        self.action = "select"
+        self.payload: List[Dict[str, Any]] = []
+
+    def select(self, columns: str = "*"):
+        if columns != "*":
+            self.columns = [column.strip() for column in columns.split(",")]
+        return self
+
+    def eq(self, column: str, value: Any):
+        self.equals.append((column, value))
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column: str, values: List[Any]):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def gte(self, column: str, value: Any):
+        # ISO timestamps compare correctly as strings
+        self.filters.append(lambda row: row.get(column) is not None and str(row.get(column)) >= str(value))
+        return self
+
+    def or_(self, filters: str):
+        # Only the `and(col.eq.value,...)` groups match_store deletes pairs with
+        groups = [
+            [condition.split(".eq.", 1) for condition in group.split(",")]
+            for group in re.findall(r"and\(([^)]*)\)", filters)
+        ]
+        self.filters.append(
+            lambda row: any(all(str(row.get(column)) == value for column, value in group) for group in groups)
+        )
+        return self
+
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None):
+        # Postgres puts NULLs last ascending and first descending unless told otherwise
+        self.order_by.append((column, desc, desc if nullsfirst is None else nullsfirst))
+        return self
+
+    def range(self, start: int, end: int):
+        self.window = (start, end + 1)
+        return self
+
+    def limit(self, count: int):
+        self.window = (0, count)
+        return self
+
+    def insert(self, rows):
+        self.action = "insert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict: str = "id"):
+        self.action = "upsert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        self.conflict_columns = [column.strip() for column in on_conflict.split(",")]
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        return all(check(row) for check in self.filters)
+
+    def execute(self) -> LocalResponse:
+        if self.store.latency_ms:
+            time.sleep(self.store.latency_ms / 1000)
+        rows = self.store.tables.setdefault(self.table, [])
+        if self.action != "select":
+            self.store.drop_indexes(self.table)
+        if self.action == "insert":
+            rows.extend(dict(row) for row in self.payload)
+            return LocalResponse([dict(row) for row in self.payload])
+        if self.action == "upsert":
+            index = {
+                tuple(row.get(column) for column in self.conflict_columns): i
+                for i, row in enumerate(rows)
+            }
+            for row in self.payload:
+                key = tuple(row.get(column) for column in self.conflict_columns)
+                if key in index:
+                    rows[index[key]] = dict(row)
+                else:
+                    index[key] = len(rows)
+                    rows.append(dict(row))
+            return LocalResponse([dict(row) for row in self.payload])
+        if self.action == "delete":
+            deleted = [row for row in rows if self._matches(row)]
+            rows[:] = [row for row in rows if not self._matches(row)]
+            return LocalResponse(deleted)
+
+        if self.equals:
+            # Like a primary key / foreign key index lookup in Postgres
+            column, value = self.equals[0]
+            rows = self.store.index(self.table, column).get(value, [])
+        result = [row for row in rows if self._matches(row)]
+        # Stable sorts, least significant column first
+        for column, desc, nullsfirst in reversed(self.order_by):
+            nulls = [row for row in result if row.get(column) is None]
+            values = sorted(
+                (row for row in result if row.get(column) is not None),
+                key=lambda row: str(row.get(column)),
+                reverse=desc,
+            )
+            result = nulls + values if nullsfirst else values + nulls
+        if self.window:
+            result = result[self.window[0] : self.window[1]]
+        if self.columns:
+            result = [{column: row.get(column) for column in self.columns} for row in result]
+        else:
+            result = [dict(row) for row in result]
+        return LocalResponse(result)
+
+
+class LocalSupabase:
+    def __init__(self, tables: Dict[str, List[Dict[str, Any]]], latency_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.tables = {name: [dict(row) for row in rows] for name, rows in tables.items()}
+        self._indexes: Dict[Tuple[str, str], Dict[Any, List[Dict[str, Any]]]] = {}
+
+    def index(self, table: str, column: str) -> Dict[Any, List[Dict[str, Any]]]:
+        key = (table, column)
+        if key not in self._indexes:
+            index: Dict[Any, List[Dict[str, Any]]] = {}
+            for row in self.tables.get(table, []):
+                index.setdefault(row.get(column), []).append(row)
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def drop_indexes(self, table: str):
+        for key in [key for key in self._indexes if key[0] == table]:
+            del self._indexes[key]
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
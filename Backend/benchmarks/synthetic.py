@@ -0,0 +1,156 @@
+"""
+Reproducible synthetic data for the matching benchmarks.
+
+Rows have the same shape as the `users`, `audience_insights` and
+`sponsorships` tables. Audiences skew young and concentrate in a few
+countries drawn from a Zipf-like popularity curve; engagement, price and
+budget are log-normal.
+
+Usage (writes INSERT statements in the style of sql.txt):
+    python -m benchmarks.synthetic --creators 1000 --brands 50 --sponsorships 200 > seed.sql
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+import argparse
+import json
+import random
+import uuid
+
+AGE_GROUPS = ["13-17", "18-24", "25-34", "35-44", "45-54", "55+"]
+AGE_POPULARITY = [0.10, 0.34, 0.30, 0.14, 0.08, 0.04]
+LOCATIONS = [
+    "USA", "India", "UK", "Brazil", "Indonesia", "Germany", "Mexico", "Canada",
+    "France", "Philippines", "Japan", "Turkey", "Spain", "Italy", "Nigeria",
+    "Australia", "Argentina", "Egypt", "Poland", "Netherlands", "Vietnam",
+    "Thailand", "South Korea", "Colombia", "Pakistan", "Saudi Arabia", "Sweden",
+    "Kenya", "Chile", "Ireland",
+]
+LOCATION_POPULARITY = [1 / (rank + 1) for rank in range(len(LOCATIONS))]
+CATEGORIES = ["Tech", "Fashion", "Gaming", "Travel", "Fitness", "Food", "Beauty", "Finance"]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _distribution(rng: random.Random, keys: List[str], weights: List[float], size: int) -> Dict[str, int]:
+    """Integer percentages over `size` distinct keys, summing to 100."""
+    chosen = []
+    while len(chosen) < size:
+        key = rng.choices(keys, weights=weights)[0]
+        if key not in chosen:
+            chosen.append(key)
+    shares = [rng.gammavariate(1.5, 1.0) for _ in chosen]
+    total = sum(shares)
+    percentages = [int(100 * share / total) for share in shares]
+    percentages[0] += 100 - sum(percentages)
+    return dict(zip(chosen, percentages))
+
+
+class SyntheticDataset:
+    def __init__(self, creators: int, brands: int, sponsorships: int, seed: int = 42):
+        rng = random.Random(seed)
+        base_time = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self.users: List[Dict[str, Any]] = []
+        self.audience_insights: List[Dict[str, Any]] = []
+        self.sponsorships: List[Dict[str, Any]] = []
+
+        for i in range(creators):
+            user_id = _uuid(rng)
+            self.users.append({
+                "id": user_id,
+                "username": f"creator{i}",
+                "email": f"creator{i}@example.com",
+                "role": "creator",
+                "profile_image": None,
+                "bio": f"{rng.choice(CATEGORIES)} content creator",
+                "created_at": (base_time + timedelta(minutes=i)).isoformat(),
+            })
+            self.audience_insights.append({
+                "id": _uuid(rng),
+                "user_id": user_id,
+                "audience_age_group": _distribution(rng, AGE_GROUPS, AGE_POPULARITY, rng.randint(2, 4)),
+                "audience_location": _distribution(rng, LOCATIONS, LOCATION_POPULARITY, rng.randint(2, 6)),
+                "engagement_rate": round(rng.lognormvariate(1.1, 0.45), 2),
+                "average_views": int(rng.lognormvariate(9.0, 1.2)),
+                "time_of_attention": rng.randint(15, 600),
+                "price_expectation": round(rng.lognormvariate(6.3, 0.8), 2),
+                "created_at": (base_time + timedelta(minutes=i)).isoformat(),
+            })
+
+        brand_ids = []
+        for i in range(brands):
+            brand_ids.append(_uuid(rng))
+            self.users.append({
+                "id": brand_ids[-1],
+                "username": f"brand{i}",
+                "email": f"brand{i}@example.com",
+                "role": "brand",
+                "profile_image": None,
+                "bio": f"{rng.choice(CATEGORIES)} brand",
+                "created_at": (base_time + timedelta(minutes=i)).isoformat(),
+            })
+
+        for i in range(sponsorships):
+            category = rng.choice(CATEGORIES)
+            ages = _distribution(rng, AGE_GROUPS, AGE_POPULARITY, rng.randint(1, 2))
+            locations = _distribution(rng, LOCATIONS, LOCATION_POPULARITY, rng.randint(1, 3))
+            self.sponsorships.append({
+                "id": _uuid(rng),
+                "brand_id": rng.choice(brand_ids) if brand_ids else None,
+                "title": f"{category} Sponsorship {i}",
+                "description": f"Sponsorship for {category.lower()} creators",
+                "required_audience": {"age_group": list(ages), "location": list(locations)},
+                "budget": round(rng.lognormvariate(7.0, 0.7), 2),
+                "engagement_minimum": round(rng.uniform(1.0, 6.0), 1),
+                "status": "open",
+                "created_at": (base_time + timedelta(minutes=i)).isoformat(),
+            })
+
+    def tables(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            "users": self.users,
+            "audience_insights": self.audience_insights,
+            "sponsorships": self.sponsorships,
+        }
+
+
+def _sql_value(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def to_sql(dataset: SyntheticDataset) -> str:
+    lines = []
+    for table, rows in dataset.tables().items():
+        if not rows:
+            continue
+        columns = list(rows[0])
+        lines.append(f"-- Insert into {table} table")
+        lines.append(f"INSERT INTO {table} ({', '.join(columns)}) VALUES")
+        values = [
+            "  (" + ", ".join(_sql_value(row[column]) for column in columns) + ")"
+            for row in rows
+        ]
+        lines.append(",\n".join(values) + ";")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic matching data as SQL")
+    parser.add_argument("--creators", type=int, default=1000)
+    parser.add_argument("--brands", type=int, default=50)
+    parser.add_argument("--sponsorships", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(to_sql(SyntheticDataset(args.creators, args.brands, args.sponsorships, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import os
+
+# app.db.db and services.clients build their (never connected) clients from these at import
+for name, value in (
+    ("SUPABASE_URL", "http://localhost:54321"),
+    ("SUPABASE_KEY", "test.local.key"),
+    ("user", "test"),
+    ("password", "test"),
+    ("host", "localhost"),
+    ("port", "5432"),
+    ("dbname", "test"),
+):
+    os.environ.setdefault(name, value)
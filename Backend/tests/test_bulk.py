@@ -0,0 +1,103 @@
+import asyncio
+
+from postgrest.exceptions import APIError
+
+from app.services import bulk
+
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.rows = None
+
+    def insert(self, rows, returning=None):
+        self.rows = rows
+        return self
+
+    async def execute(self):
+        self.client.requests.append(len(self.rows))
+        if self.client.error is not None:
+            raise self.client.error
+        bad = [row for row in self.rows if row.get("bad")]
+        if bad:
+            raise APIError({"message": f"violates foreign key for {bad[0]['id']}", "code": "23503"})
+        self.client.tables.setdefault(self.name, []).extend(self.rows)
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        self.requests = []
+        self.error = None
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def test_bad_rows_are_isolated_and_reported(monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_CHUNK_SIZE", 8)
+    rows = [{"id": f"row-{i}", "bad": i in (3, 12)} for i in range(20)]
+    supabase = FakeSupabase()
+
+    inserted, results = asyncio.run(bulk.bulk_insert(supabase, "items", rows))
+
+    assert [row["id"] for row in inserted] == [f"row-{i}" for i in range(20) if i not in (3, 12)]
+    assert supabase.tables["items"] == inserted
+    assert [result["index"] for result in results] == list(range(20))
+    for result in results:
+        if result["index"] in (3, 12):
+            assert result["status"] == "error"
+            assert f"row-{result['index']}" in result["error"]
+        else:
+            assert result == {"index": result["index"], "status": "created", "id": f"row-{result['index']}"}
+    # A bad row costs its chunk a few bisection steps, not one request per row
+    assert len(supabase.requests) < len(rows)
+
+
+def test_clean_chunks_take_one_request_each(monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_CHUNK_SIZE", 8)
+    supabase = FakeSupabase()
+
+    inserted, _ = asyncio.run(bulk.bulk_insert(supabase, "items", [{"id": str(i)} for i in range(20)]))
+
+    assert len(inserted) == 20
+    assert supabase.requests == [8, 8, 4]
+
+
+def test_errors_hitting_every_row_are_not_bisected(monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_CHUNK_SIZE", 8)
+    supabase = FakeSupabase()
+    supabase.error = APIError({"message": "permission denied for table items", "code": "42501"})
+
+    inserted, results = asyncio.run(bulk.bulk_insert(supabase, "items", [{"id": str(i)} for i in range(20)]))
+
+    assert inserted == []
+    assert supabase.requests == [8, 8, 4]
+    assert all(result["error"] == "permission denied for table items" for result in results)
+
+
+def test_transport_errors_become_item_errors(monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_CHUNK_SIZE", 8)
+    supabase = FakeSupabase()
+    supabase.error = ConnectionResetError("connection reset by peer")
+
+    inserted, results = asyncio.run(bulk.bulk_insert(supabase, "items", [{"id": str(i)} for i in range(20)]))
+
+    assert inserted == []
+    assert [result["status"] for result in results] == ["error"] * 20
+    assert supabase.requests == [8, 8, 4]
+
+
+def test_splitting_a_failing_chunk_is_capped(monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_CHUNK_SIZE", 64)
+    monkeypatch.setattr(bulk, "BULK_MAX_SPLITS", 4)
+    supabase = FakeSupabase()
+
+    inserted, results = asyncio.run(
+        bulk.bulk_insert(supabase, "items", [{"id": str(i), "bad": True} for i in range(64)])
+    )
+
+    assert inserted == []
+    assert [result["status"] for result in results] == ["error"] * 64
+    assert len(supabase.requests) == 1 + 2 * 4
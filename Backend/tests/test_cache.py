@@ -0,0 +1,90 @@
+import asyncio
+
+from app.services.cache import TieredCache, _SET_IF_GENERATION, _SET_MANY_IF_GENERATION
+
+
+class FakeRedis:
+    """The handful of commands TieredCache uses, over a dict."""
+
+    def __init__(self):
+        self.data = {}
+        self.published = []
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, "0")) + 1)
+        return int(self.data[key])
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    async def eval(self, script, numkeys, *args):
+        if script == _SET_MANY_IF_GENERATION:
+            generation_key, *keys = args[:numkeys]
+            generation, _, *values = args[numkeys:]
+        else:
+            assert script == _SET_IF_GENERATION
+            generation_key, key, generation, value, _ = args
+            keys, values = [key], [value]
+        if self.data.get(generation_key, "0") != generation:
+            return 0
+        self.data.update(zip(keys, values))
+        return 1
+
+
+def test_set_if_current_stores_when_nothing_was_invalidated():
+    async def scenario():
+        cache = TieredCache("test", FakeRedis())
+        generation = await cache.generation()
+        assert await cache.set_if_current("a", [1], generation)
+        assert await cache.get("a") == [1]
+
+    asyncio.run(scenario())
+
+
+def test_set_if_current_refuses_a_value_loaded_before_an_invalidation():
+    async def scenario():
+        redis = FakeRedis()
+        cache = TieredCache("test", redis)
+        generation = await cache.generation()
+        # A write lands and invalidates while the stale value is being loaded
+        await cache.invalidate("a")
+        assert not await cache.set_if_current("a", ["stale"], generation)
+        assert await cache.get("a") is None
+        assert "test:a" not in redis.data
+
+    asyncio.run(scenario())
+
+
+def test_set_if_current_without_redis_does_not_cache():
+    async def scenario():
+        cache = TieredCache("test", FakeRedis())
+        assert not await cache.set_if_current("a", [1], None)
+        assert await cache.get("a") is None
+
+    asyncio.run(scenario())
+
+
+def test_set_many_if_current_is_all_or_nothing():
+    async def scenario():
+        redis = FakeRedis()
+        cache = TieredCache("test", redis)
+        generation = await cache.generation()
+        assert await cache.set_many_if_current({"a": 1, "b": 2}, generation)
+        assert await cache.get_many(["a", "b"]) == {"a": 1, "b": 2}
+
+        generation = await cache.generation()
+        await cache.invalidate("a")
+        assert not await cache.set_many_if_current({"a": "stale", "c": "stale"}, generation)
+        assert "test:a" not in redis.data and "test:c" not in redis.data
+
+    asyncio.run(scenario())
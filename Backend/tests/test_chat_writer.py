@@ -0,0 +1,361 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+import app.models.models  # noqa: F401  (registers User for the chat relationships)
+from app.models.chat import MessageStatus
+from app.services import chat_writer
+from app.services.chat_writer import (
+    DEAD_LETTER_STREAM,
+    MESSAGE_STREAM,
+    PENDING_MESSAGE_KEY,
+    GroupCommitter,
+    StreamConsumer,
+    _encode,
+    record_pending_read,
+)
+
+
+class FakeDatabase:
+    """Chat lists keyed by their user pair, and committed messages by id.
+
+    Status updates and watermark statements run in Postgres and are not
+    modelled; inserts are.
+    """
+
+    def __init__(self):
+        self.chat_lists = {}
+        self.messages = {}
+        self.commits = 0
+        self.down = False
+
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeSession:
+    def __init__(self, database: FakeDatabase):
+        self.database = database
+        self.chat_lists = {}
+        self.messages = {}
+
+    async def __aenter__(self):
+        if self.database.down:
+            raise ConnectionRefusedError("connection refused")
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, statement, params=None):
+        table = statement.table.name
+        if table == "chat_list" and statement.is_insert and params is None:
+            # INSERT ... ON CONFLICT (user1_id, user2_id) DO UPDATE ... RETURNING id
+            values = statement.compile(dialect=postgresql.dialect()).params
+            rows = []
+            for index in range(len([key for key in values if key.startswith("id_m")])):
+                pair = (values[f"user1_id_m{index}"], values[f"user2_id_m{index}"])
+                stored = self.database.chat_lists.get(pair) or self.chat_lists.setdefault(pair, values[f"id_m{index}"])
+                rows.append(SimpleNamespace(id=stored, user1_id=pair[0], user2_id=pair[1]))
+            return rows
+        if table == "chat_messages" and statement.is_insert:
+            for message in params:
+                if message["message"] == "bad":
+                    raise IntegrityError("INSERT INTO chat_messages", message, Exception("violates check"))
+                self.messages.setdefault(message["id"], message)
+
+    async def commit(self):
+        self.database.chat_lists.update(self.chat_lists)
+        self.database.messages.update(self.messages)
+        self.database.commits += 1
+
+
+def message(text="hello", chat_list_id="chat-1", sender_id="a", receiver_id="b", **fields):
+    return {
+        "id": fields.pop("id", text + chat_list_id),
+        "sender_id": sender_id,
+        "receiver_id": receiver_id,
+        "chat_list_id": chat_list_id,
+        "message": text,
+        "status": MessageStatus.SENT,
+        "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        **fields,
+    }
+
+
+async def submit_all(committer: GroupCommitter, writes):
+    flusher = asyncio.create_task(committer.run())
+    try:
+        return await asyncio.gather(*(committer.submit(write) for write in writes), return_exceptions=True)
+    finally:
+        flusher.cancel()
+
+
+def test_concurrent_writes_share_one_commit():
+    database = FakeDatabase()
+    committer = GroupCommitter(database.session, window_ms=20, max_batch=64)
+    writes = [(None, message(f"m{i}")) for i in range(10)]
+
+    results = asyncio.run(submit_all(committer, writes))
+
+    assert results == [None] * 10
+    assert database.commits == 1
+    assert len(database.messages) == 10
+    assert committer.counters == {"messages": 10, "batches": 1, "failed": 0, "fallbacks": 0}
+
+
+def test_a_failing_batch_is_retried_one_write_at_a_time():
+    database = FakeDatabase()
+    committer = GroupCommitter(database.session, window_ms=20, max_batch=64)
+    writes = [(None, message(f"m{i}")) for i in range(4)] + [(None, message("bad"))]
+
+    results = asyncio.run(submit_all(committer, writes))
+
+    assert results[:4] == [None] * 4
+    assert isinstance(results[4], IntegrityError)
+    assert set(database.messages) == {write["id"] for _, write in writes[:4]}
+    assert committer.counters == {"messages": 4, "batches": 1, "failed": 1, "fallbacks": 1}
+
+
+def test_an_unreachable_database_fails_the_batch_and_keeps_the_committer_running():
+    database = FakeDatabase()
+    committer = GroupCommitter(database.session, window_ms=20, max_batch=64)
+
+    async def scenario():
+        flusher = asyncio.create_task(committer.run())
+        try:
+            database.down = True
+            failed = await asyncio.gather(
+                *(committer.submit((None, message(f"m{i}"))) for i in range(3)), return_exceptions=True
+            )
+            database.down = False
+            await asyncio.wait_for(committer.submit((None, message("after"))), 1)
+            return failed
+        finally:
+            flusher.cancel()
+
+    failed = asyncio.run(scenario())
+
+    assert all(isinstance(result, ConnectionRefusedError) for result in failed)
+    assert set(database.messages) == {message("after")["id"]}
+    assert committer.counters == {"messages": 1, "batches": 2, "failed": 3, "fallbacks": 0}
+
+
+def test_a_racing_new_chat_resolves_to_the_stored_one():
+    database = FakeDatabase()
+    database.chat_lists[("a", "b")] = "existing"
+    committer = GroupCommitter(database.session, window_ms=20, max_batch=64)
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    chat_list = {"id": "pending", "user1_id": "a", "user2_id": "b", "last_message_time": now}
+    writes = [
+        (chat_list, message("first", chat_list_id="pending")),
+        (chat_list, message("second", chat_list_id="pending", created_at=now + timedelta(seconds=1))),
+    ]
+
+    results = asyncio.run(submit_all(committer, writes))
+
+    assert results == [None, None]
+    assert {stored["chat_list_id"] for stored in database.messages.values()} == {"existing"}
+    assert database.chat_lists == {("a", "b"): "existing"}
+    assert committer.counters["fallbacks"] == 0
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((getattr(self.redis, name), args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        return [await command(*args, **kwargs) for command, args, kwargs in self.calls]
+
+
+class FakeRedis:
+    """Streams, strings and hashes over dicts, enough for StreamConsumer."""
+
+    def __init__(self):
+        self.streams = {}
+        self.data = {}
+        self.acked = []
+        self.delivered = set()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def xadd(self, stream, fields):
+        entries = self.streams.setdefault(stream, [])
+        entries.append((f"{len(entries) + 1}-0", dict(fields)))
+        return entries[-1][0]
+
+    async def xgroup_create(self, stream, group, id="0", mkstream=False):
+        self.streams.setdefault(stream, [])
+
+    async def xautoclaim(self, stream, group, consumer, min_idle_time, start_id="0-0", count=None):
+        # Every delivered, unacknowledged entry counts as idle
+        entries = [entry for entry in self.streams[stream] if entry[0] in self.delivered and entry[0] not in self.acked]
+        return ["0-0", entries[:count], []]
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        (stream, _), = streams.items()
+        entries = [entry for entry in self.streams[stream] if entry[0] not in self.delivered][:count]
+        if not entries:
+            await asyncio.sleep((block or 0) / 1000)
+            return []
+        self.delivered.update(entry_id for entry_id, _ in entries)
+        return [[stream, entries]]
+
+    async def xack(self, stream, group, *entry_ids):
+        self.acked.extend(entry_ids)
+
+    async def xdel(self, stream, *entry_ids):
+        self.streams[stream] = [entry for entry in self.streams[stream] if entry[0] not in entry_ids]
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def eval(self, script, numkeys, key, at, message_id, ttl):
+        # _ADVANCE_READ
+        current = self.data.get(key, {}).get("at")
+        if current and int(current) >= int(at):
+            return 0
+        self.data[key] = {"at": str(at), "message_id": message_id}
+        return 1
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    monkeypatch.setattr(chat_writer, "CHAT_WRITE_MODE", "stream")
+    online = set()
+
+    async def online_users(user_ids):
+        return online & set(user_ids)
+
+    monkeypatch.setattr(chat_writer.presence, "online", online_users)
+    redis, database = FakeRedis(), FakeDatabase()
+    return SimpleNamespace(
+        redis=redis,
+        database=database,
+        online=online,
+        consumer=StreamConsumer(redis, database.session),
+    )
+
+
+async def persist_stream(consumer: StreamConsumer, redis: FakeRedis):
+    await consumer._persist(list(redis.streams[MESSAGE_STREAM]))
+
+
+def test_rejected_entries_are_dead_lettered_and_the_rest_persisted(stream):
+    writes = [(None, message("m1")), (None, message("bad")), (None, message("m2"))]
+
+    async def scenario():
+        for write in writes:
+            await stream.consumer.append(write)
+        await persist_stream(stream.consumer, stream.redis)
+
+    asyncio.run(scenario())
+
+    assert set(stream.database.messages) == {writes[0][1]["id"], writes[2][1]["id"]}
+    dead = stream.redis.streams[DEAD_LETTER_STREAM]
+    assert len(dead) == 1 and "violates check" in dead[0][1]["error"]
+    assert dead[0][1]["message"] == _encode(writes[1])["message"]
+    # Every entry is finished with: acknowledged, removed, and no longer pending
+    assert stream.redis.acked == ["1-0", "2-0", "3-0"]
+    assert stream.redis.streams[MESSAGE_STREAM] == []
+    assert not any(key.startswith(PENDING_MESSAGE_KEY.format("")) for key in stream.redis.data)
+    assert stream.consumer.counters["persisted"] == 2
+    assert stream.consumer.counters["dead_lettered"] == 1
+    assert stream.consumer.counters["retries"] == 1
+
+
+def test_status_is_taken_when_the_message_is_persisted(stream):
+    sent_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    writes = [
+        (None, message("to carol, read", receiver_id="carol", created_at=sent_at)),
+        (None, message("to carol, unread", receiver_id="carol", created_at=sent_at + timedelta(seconds=2))),
+        (None, message("to bob", chat_list_id="chat-2", receiver_id="bob", created_at=sent_at)),
+    ]
+
+    async def scenario():
+        for write in writes:
+            await stream.consumer.append(write)
+        # Bob connects and carol reads the first message while both are queued
+        stream.online.add("bob")
+        await record_pending_read(
+            stream.redis, "chat-1", "carol", sent_at + timedelta(seconds=1), writes[0][1]["id"]
+        )
+        await persist_stream(stream.consumer, stream.redis)
+
+    asyncio.run(scenario())
+
+    statuses = {stored["message"]: stored["status"] for stored in stream.database.messages.values()}
+    assert statuses == {
+        "to carol, read": MessageStatus.SEEN,
+        "to carol, unread": MessageStatus.SENT,
+        "to bob": MessageStatus.DELIVERED,
+    }
+
+
+def test_pending_reads_only_move_forward(stream):
+    later = datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+    async def scenario():
+        await record_pending_read(stream.redis, "chat-1", "carol", later, "m2")
+        await record_pending_read(stream.redis, "chat-1", "carol", later - timedelta(days=1), "m1")
+        return await stream.redis.hgetall(chat_writer.PENDING_READ_KEY.format("chat-1", "carol"))
+
+    assert asyncio.run(scenario())["message_id"] == "m2"
+
+
+def test_the_consumer_survives_an_unreachable_database(stream, monkeypatch):
+    monkeypatch.setattr(chat_writer, "STREAM_MAX_BACKOFF_SECONDS", 0.01)
+    consumer = StreamConsumer(stream.redis, stream.database.session, block_ms=1, claim_idle_ms=0)
+    writes = [(None, message("m1")), (None, message("m2"))]
+
+    async def scenario():
+        for write in writes:
+            await consumer.append(write)
+        stream.database.down = True
+        runner = asyncio.create_task(consumer.run())
+        try:
+            await asyncio.sleep(0.05)
+            # Read, failed, and still pending for the next claim
+            assert stream.redis.delivered == {"1-0", "2-0"} and stream.redis.acked == []
+            assert not runner.done()
+            stream.database.down = False
+            for _ in range(100):
+                if stream.redis.acked:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            runner.cancel()
+
+    asyncio.run(scenario())
+
+    assert set(stream.database.messages) == {write["id"] for _, write in writes}
+    assert stream.redis.acked == ["1-0", "2-0"]
+    assert stream.redis.streams[MESSAGE_STREAM] == []
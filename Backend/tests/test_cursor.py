@@ -0,0 +1,24 @@
+import pytest
+from fastapi import HTTPException
+
+from app.services.cursor import decode_cursor, encode_cursor
+
+
+def test_round_trip():
+    values = ["2025-01-01T00:00:00+00:00", "a1b2", 0.25]
+    cursor = encode_cursor(values)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 3) == values
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24", encode_cursor({"a": 1})])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, 2)
+    assert error.value.status_code == 400
+
+
+def test_wrong_length_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(encode_cursor(["2025-01-01", "id"]), 3)
+    assert error.value.status_code == 400
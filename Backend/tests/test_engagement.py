@@ -0,0 +1,44 @@
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.models.models import EngagementDaily
+from app.services.engagement import INCREMENT_CHUNK_SIZE, aggregate, _increment, _post_day
+
+
+def test_post_day_is_the_utc_date():
+    assert _post_day({"created_at": "2025-03-01T22:30:00-05:00"}) == date(2025, 3, 2)
+    assert _post_day({"created_at": datetime(2025, 3, 1, 23, 0, tzinfo=timezone(timedelta(hours=-5)))}) == date(2025, 3, 2)
+    assert _post_day({"created_at": "2025-03-01T10:00:00"}) == date(2025, 3, 1)
+
+
+def test_post_day_falls_back_to_today():
+    assert _post_day({"created_at": "yesterday"}) == datetime.now(timezone.utc).date()
+
+
+def test_aggregate_sums_per_scope_and_day():
+    posts = [
+        {"user_id": "u1", "category": "tech", "created_at": "2025-03-01T12:00:00+00:00",
+         "engagement_metrics": {"likes": 10, "comments": "2", "shares": None}},
+        {"user_id": "u1", "category": None, "created_at": "2025-03-02T01:00:00+00:00",
+         "engagement_metrics": {"likes": "many"}},
+    ]
+    totals, daily = aggregate(posts)
+    assert totals[("user", "u1")] == {"post_count": 2, "likes": 10, "comments": 2, "shares": 0}
+    assert totals[("category", "tech")] == {"post_count": 1, "likes": 10, "comments": 2, "shares": 0}
+    assert daily[("user", "u1", date(2025, 3, 2))]["post_count"] == 1
+    assert ("category", "tech", date(2025, 3, 2)) not in daily
+
+
+def test_increment_splits_rows_under_the_parameter_limit():
+    rows = [
+        {"scope": "user", "key": f"u{i}", "day": date(2025, 3, 1), "post_count": 1, "likes": 0, "comments": 0, "shares": 0}
+        for i in range(2 * INCREMENT_CHUNK_SIZE + 1)
+    ]
+
+    statements = list(_increment(EngagementDaily, ["scope", "key", "day"], rows, {}))
+
+    assert len(statements) == 3
+    params = [len(stmt.compile(dialect=postgresql.dialect()).params) for stmt in statements]
+    assert sum(params) == 7 * len(rows)
+    assert max(params) < 32767
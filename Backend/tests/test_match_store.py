@@ -0,0 +1,76 @@
+import pytest
+
+from app.services import match_store
+from app.services.matching_engine import CreatorMatrix, MatchingEngine, latest_audiences
+from benchmarks.local_store import LocalSupabase
+from benchmarks.synthetic import SyntheticDataset
+
+
+@pytest.fixture
+def store(monkeypatch):
+    dataset = SyntheticDataset(creators=200, brands=10, sponsorships=40, seed=11)
+    store = LocalSupabase(dataset.tables())
+    engine = MatchingEngine(
+        load_creators=lambda: store.tables["audience_insights"],
+        load_sponsorships=lambda: store.tables["sponsorships"],
+    )
+    monkeypatch.setattr(match_store, "supabase", store)
+    monkeypatch.setattr(match_store, "matching_engine", engine)
+    return store
+
+
+def stored_pairs(store):
+    return {
+        (row["sponsorship_id"], row["creator_id"]): row["match_score"]
+        for row in store.tables.get(match_store.MATCH_TABLE, [])
+    }
+
+
+def expected_pairs(store):
+    creators = CreatorMatrix(latest_audiences(store.tables["audience_insights"]))
+    return {
+        (sponsorship["id"], match["user_id"]): match["match_score"]
+        for sponsorship in store.tables["sponsorships"]
+        for match in creators.matches(sponsorship)
+    }
+
+
+def test_sponsorship_batch_refresh_writes_every_pair(store):
+    match_store.refresh_sponsorship_matches(store.tables["sponsorships"])
+    assert stored_pairs(store) == expected_pairs(store)
+
+
+def test_creator_batch_refresh_replaces_stale_pairs(store):
+    match_store.refresh_sponsorship_matches(store.tables["sponsorships"])
+    audiences = store.tables["audience_insights"]
+    # Two creators stop matching anything
+    changed = [
+        {**audience, "audience_age_group": {}, "audience_location": {}, "engagement_rate": 0, "price_expectation": 10**9}
+        for audience in audiences[:2]
+    ]
+    audiences[:2] = changed
+    before = stored_pairs(store)
+
+    affected = match_store.refresh_creator_matches(changed)
+
+    creator_ids = {audience["user_id"] for audience in changed}
+    assert affected == {pair for pair in before if pair[1] in creator_ids}
+    assert not any(pair[1] in creator_ids for pair in stored_pairs(store))
+
+
+def test_pairs_use_each_creators_latest_audience_row(store):
+    current = store.tables["audience_insights"][0]
+    # An older row for the same creator that matches every sponsorship
+    store.tables["audience_insights"].append({
+        **current,
+        "id": "older-row",
+        "created_at": "2000-01-01T00:00:00+00:00",
+        "engagement_rate": 10**9,
+        "price_expectation": 0,
+    })
+
+    match_store.refresh_sponsorship_matches(store.tables["sponsorships"])
+
+    rows = [row for row in store.tables[match_store.MATCH_TABLE] if row["creator_id"] == current["user_id"]]
+    assert {row["audience_id"] for row in rows} <= {current["id"]}
+    assert stored_pairs(store) == expected_pairs(store)
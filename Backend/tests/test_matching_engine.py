@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.services.matching_engine import CreatorMatrix, SponsorshipMatrix, MATCH_THRESHOLD, latest_audiences
+from benchmarks.bench_matching import reference_score
+from benchmarks.synthetic import SyntheticDataset
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return SyntheticDataset(creators=300, brands=20, sponsorships=60, seed=7)
+
+
+def test_creator_matrix_matches_reference(dataset):
+    creators = CreatorMatrix(dataset.audience_insights)
+    for sponsorship in dataset.sponsorships:
+        expected = {
+            audience["id"]: score
+            for audience in dataset.audience_insights
+            if (score := reference_score(sponsorship, audience)) >= MATCH_THRESHOLD
+        }
+        got = {match["id"]: match["match_score"] for match in creators.matches(sponsorship)}
+        assert got == expected
+
+
+def test_sponsorship_matrix_matches_reference(dataset):
+    sponsorships = SponsorshipMatrix(dataset.sponsorships)
+    for audience in dataset.audience_insights:
+        expected = {
+            sponsorship["id"]: score
+            for sponsorship in dataset.sponsorships
+            if (score := reference_score(sponsorship, audience)) >= MATCH_THRESHOLD
+        }
+        got = {match["id"]: match["match_score"] for match in sponsorships.matches(audience)}
+        assert got == expected
+
+
+def test_score_many_matches_reference(dataset):
+    audiences, sponsorships = dataset.audience_insights, dataset.sponsorships
+    expected = np.array(
+        [[reference_score(sponsorship, audience) for sponsorship in sponsorships] for audience in audiences]
+    )
+    assert np.array_equal(CreatorMatrix(audiences).score_many(sponsorships), expected)
+    assert np.array_equal(SponsorshipMatrix(sponsorships).score_many(audiences), expected.T)
+
+
+def test_upsert_replaces_a_creator(dataset):
+    creators = CreatorMatrix(dataset.audience_insights)
+    sponsorship = dataset.sponsorships[0]
+    audience = {
+        **dataset.audience_insights[0],
+        "audience_age_group": {},
+        "audience_location": {},
+        "engagement_rate": 0,
+        "price_expectation": 10**9,
+    }
+    creators.upsert(audience)
+    assert len(creators) == len(dataset.audience_insights)
+    assert audience["id"] not in {match["id"] for match in creators.matches(sponsorship)}
+
+
+def test_current_row_is_the_latest_audience_row():
+    rows = [
+        {"id": "a-old", "user_id": "u1", "created_at": "2025-01-01T00:00:00+00:00"},
+        {"id": "a-new", "user_id": "u1", "created_at": "2025-02-01T00:00:00Z"},
+        {"id": "b", "user_id": "u2", "created_at": None},
+    ]
+    creators = CreatorMatrix(rows)
+    assert creators.current == {"u1": 1, "u2": 2}
+    assert creators.current_mask().tolist() == [False, True, True]
+    assert {row["id"] for row in latest_audiences(rows)} == {"a-new", "b"}
+
+    # Backdating the current row hands the role back to the other one
+    creators.upsert({**rows[1], "created_at": "2024-12-01T00:00:00+00:00"})
+    assert creators.current["u1"] == 0
@@ -28,9 +28,13 @@ export default function MessagesList({ messages }: { messages: Message[] }) {
           new Date(lastMarkedAsSeen).getTime()
     );
     if (unseenMessages.length > 0) {
-      unseenMessages.forEach((message) => {
-        markMessageAsSeen(message.chatListId, message.id);
-      });
+      // One read watermark covers every earlier message
+      const latest = unseenMessages.reduce((a, b) =>
+        new Date(b.createdAt).getTime() > new Date(a.createdAt).getTime()
+          ? b
+          : a
+      );
+      markMessageAsSeen(latest.chatListId, latest.id);
       setLastMarkedAsSeen(new Date().toISOString());
     }
   }, [messages]);
@@ -11,6 +11,7 @@ import {
   addMessage,
   addOldMessages,
   Message,
+  markChatAsDelivered,
   markChatAsSeen as reduxMarkChatAsSeen,
   updateUserDetails,
   markMessageAsSeen as reduxMarkMessageAsSeen,
@@ -73,6 +74,14 @@ export const ChatProvider: React.FC<{
             message: data,
           })
         );
+      } else if (data.eventType === "MESSAGES_DELIVERED") {
+        data.chats.forEach((chat: { chatListId: string }) => {
+          dispatch(
+            markChatAsDelivered({
+              chatListId: chat.chatListId,
+            })
+          );
+        });
       } else if (data.eventType === "CHAT_MESSAGES_READ") {
         dispatch(
           reduxMarkChatAsSeen({
@@ -80,12 +89,14 @@ export const ChatProvider: React.FC<{
           })
         );
       } else if (data.eventType === "MESSAGE_READ") {
-        dispatch(
-          reduxMarkMessageAsSeen({
-            chatListId: data.chatListId,
-            messageId: data.messageId,
-          })
-        );
+        (data.messageIds ?? [data.messageId]).forEach((messageId: string) => {
+          dispatch(
+            reduxMarkMessageAsSeen({
+              chatListId: data.chatListId,
+              messageId: messageId,
+            })
+          );
+        });
       }
     };
 
@@ -174,7 +185,7 @@ export const ChatProvider: React.FC<{
   const markMessageAsSeen = async (chatListId: string, messageId: string) => {
     try {
       await axios.put(
-        `${API_URL}/chat/read/${userId}/${chatListId}/${messageId}`
+        `${API_URL}/chat/read_up_to/${userId}/${chatListId}/${messageId}`
       );
     } catch (error) {
       console.error("Error marking message as seen:", error);